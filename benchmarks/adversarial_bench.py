@@ -0,0 +1,57 @@
+"""
+Worst-case scripts against the interpreter with and without the consensus
+limits: time and peak memory until the script is rejected
+
+    python -m benchmarks.adversarial_bench
+"""
+import time
+import tracemalloc
+
+from benchmarks.script_bench import no_limits
+from pybtc.script import Script
+
+
+def cases():
+    big = b'\xff' * 520
+    return (
+        # 100k cheap opcodes
+        ('dup/drop x 50000', Script([0x51] + [0x76, 0x75] * 50000)),
+        # OP_3DUP tripling the stack
+        ('3dup x 30000', Script([0x51, 0x52, 0x53] + [0x6f] * 30000)),
+        # copies of a 520 byte element kept on the stack
+        ('dup 520 bytes x 50000', Script([big] + [0x76] * 50000)),
+        # OP_HASH256 of a 520 byte element, again and again
+        ('hash 520 bytes x 20000', Script([big] + [0x76, 0xaa, 0x75] * 20000)),
+        # OP_DUP OP_MUL squaring a number
+        ('square x 16', Script([0x60] + [0x76, 0x95] * 16)),
+        # deeply nested OP_IF
+        ('nested if x 50000', Script([0x51] + [0x51, 0x63] * 50000 + [0x68] * 50000)),
+        # pushes over the script size
+        ('20000 pushes', Script([b'\x01'] * 20000)),
+    )
+
+
+def measure(script):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = script.evaluate(0)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    print('{:<24} {:>7} {:>12} {:>12} {:>7} {:>12} {:>12}'.format(
+        'script', 'limits', 'ms', 'peak KB', 'none', 'ms', 'peak KB'))
+    for name, script in cases():
+        limited = measure(script)
+        with no_limits():
+            unlimited = measure(script)
+        print('{:<24} {:>7} {:>12.2f} {:>12.1f} {:>7} {:>12.2f} {:>12.1f}'.format(
+            name, str(limited[0]), limited[1] * 1e3, limited[2] / 1e3,
+            str(unlimited[0]), unlimited[1] * 1e3, unlimited[2] / 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Sign, verify and SEC parsing with every arithmetic backend available, and
+with the Fermat inversions used before the backends for comparison
+
+    python -m benchmarks.arithmetic_bench
+"""
+import time
+
+from pybtc.arithmetic import PythonArithmetic, Gmpy2Arithmetic, gmpy2, using
+from pybtc.ecc import PrivateKey, S256Point
+
+
+class FermatArithmetic(PythonArithmetic):
+    """Inverses as pow(a, m - 2, m), the arithmetic before the backends"""
+    name = 'fermat'
+
+    def inverse(self, a, m):
+        return pow(a, m - 2, m)
+
+
+def best(function, rounds=3):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(count=10):
+    backends = [FermatArithmetic(), PythonArithmetic()]
+    if gmpy2 is not None:
+        backends.append(Gmpy2Arithmetic())
+    else:
+        print('gmpy2 is not installed')
+    key = PrivateKey(0x1234567890abcdef)
+    zs = list(range(1, count + 1))
+    sigs = [key.sign(z) for z in zs]
+    sec = key.point.sec()
+    print('{:<8} {:>10} {:>10} {:>10}'.format('backend', 'sign ms', 'verify ms', 'parse us'))
+    for backend in backends:
+        with using(backend):
+            sign = best(lambda: [key.sign(z) for z in zs]) / count
+            verify = best(lambda: [key.point.verify(z, sig) for z, sig in zip(zs, sigs)]) / count
+            parse = best(lambda: [S256Point.parse(sec) for _ in range(100)]) / 100
+        print('{:<8} {:>10.2f} {:>10.2f} {:>10.1f}'.format(backend.name, sign * 1e3, verify * 1e3, parse * 1e6))
+
+
+if __name__ == '__main__':
+    main()
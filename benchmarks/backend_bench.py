@@ -0,0 +1,86 @@
+"""
+Fetch latency and throughput of every TxFetcher backend
+
+    python -m benchmarks.backend_bench
+"""
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pybtc.backends import DirectoryBackend, HttpBackend, MemoryBackend
+from pybtc.block import BlkIndexBackend
+from pybtc.constants import NETWORK_MAGIC
+from pybtc.helper import encode_varint, int_to_little_endian
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut, TxFetcher
+from tests.stand_in import StandInServer
+
+
+def make_txs(count, outputs=20):
+    txs = {}
+    for i in range(count):
+        tx_outs = [TxOut(n, Script([0x76, 0xa9, bytes([n]) * 20, 0x88, 0xac])) for n in range(outputs)]
+        tx = Tx(1, [TxIn(i.to_bytes(32, 'big'), 0)], tx_outs, 0)
+        txs[tx.id()] = tx.serialize()
+    return txs
+
+
+def write_blk_file(path, txs, per_block=100):
+    raws = list(txs.values())
+    with open(path, 'wb') as f:
+        for i in range(0, len(raws), per_block):
+            chunk = raws[i:i + per_block]
+            block = b'\x00' * 80 + encode_varint(len(chunk)) + b''.join(chunk)
+            f.write(NETWORK_MAGIC + int_to_little_endian(len(block), 4) + block)
+
+
+def measure(backend, tx_ids, threads):
+    fetcher = TxFetcher.configure(backend=backend)
+    latencies = []
+
+    def fetch(tx_id):
+        start = time.perf_counter()
+        fetcher.fetch(tx_id)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(fetch, tx_ids))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'tx_per_s': len(tx_ids) / elapsed,
+    }
+
+
+def main(tx_count=500, threads=4, delay=0.001):
+    txs = make_txs(tx_count)
+    tx_ids = list(txs)
+    with tempfile.TemporaryDirectory() as path, StandInServer(txs, delay=delay) as server:
+        for tx_id, raw in txs.items():
+            with open(os.path.join(path, tx_id + '.bin'), 'wb') as f:
+                f.write(raw)
+        blk_path = os.path.join(path, 'blk00000.dat')
+        write_blk_file(blk_path, txs)
+        blk_backend = BlkIndexBackend()
+        blk_backend.add_file(blk_path)
+
+        backends = (
+            ('memory', MemoryBackend(txs)),
+            ('directory', DirectoryBackend(path)),
+            ('blk-index', blk_backend),
+            ('http', HttpBackend(server.url, server.url)),
+        )
+        print('{:<10} {:>9} {:>9} {:>10}'.format('backend', 'p50 ms', 'p99 ms', 'tx/s'))
+        for name, backend in backends:
+            result = measure(backend, tx_ids, threads)
+            print('{:<10} {:>9.3f} {:>9.3f} {:>10.0f}'.format(
+                name, result['p50_ms'], result['p99_ms'], result['tx_per_s']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Parse, fee and verify throughput over a generated corpus of blk files
+The corpus is written to --dir by CorpusGenerator unless it is already there,
+so a large one is generated once and reused by every later run
+A reused unsigned corpus is marked as such and never verified
+
+    python -m benchmarks.corpus_bench
+    python -m benchmarks.corpus_bench --dir corpus --blocks 2000 --txs-per-block 500 --unsigned
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+from pybtc.block import read_blk_file
+from pybtc.corpus import CorpusGenerator
+from pybtc.utxo import UtxoSet
+
+
+# written next to the blk files of an unsigned corpus, which cannot be verified
+UNSIGNED_MARKER = 'UNSIGNED'
+
+
+def corpus_paths(directory, seed, blocks, txs_per_block, sign):
+    """The blk files of the corpus, whether it is signed and how long generating it took"""
+    paths = sorted(glob.glob(os.path.join(directory, 'blk*.dat')))
+    if paths:
+        return paths, not os.path.exists(os.path.join(directory, UNSIGNED_MARKER)), None
+    start = time.perf_counter()
+    generator = CorpusGenerator(seed=seed, txs_per_block=txs_per_block, sign=sign)
+    paths = generator.write(directory, blocks)
+    if not sign:
+        open(os.path.join(directory, UNSIGNED_MARKER), 'w').close()
+    return paths, sign, time.perf_counter() - start
+
+
+def run(paths, verify):
+    parse = fees = checks = 0.0
+    txs = inputs = 0
+    utxos = UtxoSet()
+    for path in paths:
+        blocks = read_blk_file(path)
+        while True:
+            start = time.perf_counter()
+            block = next(blocks, None)
+            parse += time.perf_counter() - start
+            if block is None:
+                break
+            for tx in block.txs[1:]:
+                start = time.perf_counter()
+                tx.fee(utxos=utxos)
+                fees += time.perf_counter() - start
+                if verify:
+                    start = time.perf_counter()
+                    if not tx.verify(utxos=utxos):
+                        raise ValueError('{} does not verify'.format(tx.id()))
+                    checks += time.perf_counter() - start
+                inputs += len(tx.tx_ins)
+            txs += len(block.txs)
+            utxos.apply_block(block)
+    return parse, fees, checks, txs, inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.corpus_bench')
+    parser.add_argument('--dir', help='corpus directory, generated if it has no blk files, a temporary one by default')
+    parser.add_argument('--blocks', type=int, default=5)
+    parser.add_argument('--txs-per-block', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--unsigned', action='store_true', help='placeholder signatures, nothing is verified')
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp()
+    try:
+        paths, signed, generated = corpus_paths(directory, args.seed, args.blocks, args.txs_per_block, not args.unsigned)
+        size = sum(os.path.getsize(path) for path in paths)
+        if generated is not None:
+            print('generated {} files, {:.1f} MB in {:.1f} s'.format(len(paths), size / 1e6, generated))
+        verify = signed and not args.unsigned
+        if not signed and not args.unsigned:
+            print('{} holds an unsigned corpus, verification is skipped'.format(directory))
+        parse, fees, checks, txs, inputs = run(paths, verify)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory)
+    print('{} transactions, {} inputs, {:.1f} MB'.format(txs, inputs, size / 1e6))
+    print('parse   {:>9.3f} s {:>9.1f} MB/s'.format(parse, size / 1e6 / parse))
+    print('fee     {:>9.3f} s {:>9.1f} us per input'.format(fees, fees / max(inputs, 1) * 1e6))
+    if verify:
+        print('verify  {:>9.3f} s {:>9.1f} ms per input'.format(checks, checks / max(inputs, 1) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
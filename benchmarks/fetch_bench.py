@@ -0,0 +1,77 @@
+"""
+Multithreaded TxFetcher benchmark against a local stand-in server
+
+    python -m benchmarks.fetch_bench
+"""
+import random
+import threading
+import time
+
+import requests
+
+from pybtc.backends import HttpBackend
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut, TxFetcher
+from tests.stand_in import StandInServer
+
+
+class UnpooledBackend(HttpBackend):
+    """The previous download path: one connection per request"""
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        response = requests.get(self.get_url(tx_id, testnet), timeout=timeout or self.timeout)
+        return bytes.fromhex(response.text.strip())
+
+
+class UnpooledFetcher(TxFetcher):
+    """The previous fetcher: no coalescing of concurrent downloads"""
+
+    @classmethod
+    def fetch(cls, tx_id, testnet=False, fresh=False):
+        tx = cls.cache.get(tx_id)
+        if tx is None:
+            tx, raw = cls.load(tx_id, testnet)
+            cls.cache.add(tx_id, tx, raw)
+        return tx
+
+
+def make_txs(count):
+    txs = {}
+    for i in range(count):
+        tx = Tx(1, [TxIn(i.to_bytes(32, 'big'), 0)], [TxOut(i, Script([0x51]))], 0)
+        txs[tx.id()] = tx.serialize()
+    return txs
+
+
+def run(fetcher, tx_ids, threads, seed):
+    def worker(n):
+        order = list(tx_ids)
+        random.Random(seed + n).shuffle(order)
+        for tx_id in order:
+            fetcher.fetch(tx_id)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main(tx_count=50, threads=8, delay=0.01, seed=0):
+    txs = make_txs(tx_count)
+    variants = (
+        ('unpooled', UnpooledFetcher, UnpooledBackend),
+        ('pooled+single-flight', TxFetcher, HttpBackend),
+    )
+    for name, fetcher_class, backend_class in variants:
+        with StandInServer(txs, delay=delay) as server:
+            fetcher = fetcher_class.configure(backend=backend_class(server.url, server.url))
+            elapsed = run(fetcher, list(txs), threads, seed)
+            print('{:<22} {:>8.3f}s {:>5} downloads for {} txs x {} threads'.format(
+                name, elapsed, len(server.requests), tx_count, threads))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Time and memory of parsing many outputs that pay a small set of addresses,
+with and without the script interner
+
+    python -m benchmarks.intern_bench
+"""
+import time
+import tracemalloc
+from io import BytesIO
+from unittest import mock
+
+from pybtc.script import Script, ScriptInterner
+from pybtc.transaction import Tx, TxIn, TxOut
+
+
+def make_txs(count, outputs, addresses):
+    txs = []
+    for n in range(count):
+        tx_outs = []
+        for i in range(outputs):
+            h160 = ((n * outputs + i) % addresses).to_bytes(20, 'big')
+            tx_outs.append(TxOut(1000 + i, Script([0x76, 0xa9, h160, 0x88, 0xac])))
+        txs.append(Tx(1, [TxIn(n.to_bytes(32, 'big'), 0)], tx_outs, 0))
+    return [tx.serialize() for tx in txs]
+
+
+def parse_all(raws):
+    return [Tx.parse(BytesIO(raw)) for raw in raws]
+
+
+def measure(raws, interner):
+    with mock.patch.object(Script, 'interner', interner):
+        start = time.perf_counter()
+        parse_all(raws)
+        elapsed = time.perf_counter() - start
+        if interner is not None:
+            interner.clear()
+        tracemalloc.start()
+        txs = parse_all(raws)
+        resident = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    del txs
+    return elapsed, resident
+
+
+def main(count=5000, outputs=10, addresses=500):
+    raws = make_txs(count, outputs, addresses)
+    print('{} transactions, {} outputs each, {} distinct scriptPubKeys'.format(count, outputs, addresses))
+    print('{:<12} {:>9} {:>12}'.format('interner', 'seconds', 'resident MB'))
+    for name, interner in (('none', None), ('64 MB', ScriptInterner()), ('16 KB', ScriptInterner(16 * 1024))):
+        elapsed, resident = measure(raws, interner)
+        print('{:<12} {:>9.3f} {:>12.2f}'.format(name, elapsed, resident / 1e6))
+
+
+if __name__ == '__main__':
+    main()
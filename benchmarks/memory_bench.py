@@ -0,0 +1,59 @@
+"""
+Resident memory of a large parsed corpus: transactions with their inputs,
+outputs and scripts, and points and signatures, measured with tracemalloc
+
+    python -m benchmarks.memory_bench
+"""
+import time
+import tracemalloc
+from io import BytesIO
+
+from pybtc.corpus import CorpusGenerator
+from pybtc.ecc import PrivateKey, S256Point, Signature
+from pybtc.transaction import Tx
+
+
+def make_raw_txs(blocks, txs_per_block):
+    generator = CorpusGenerator(seed=0, keys=10, txs_per_block=txs_per_block, sign=False)
+    return [tx.serialize() for block in generator.blocks(blocks) for tx in block.txs]
+
+
+def resident(function, *args):
+    """(result, bytes still allocated by function once it returned, seconds)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def parse_txs(raws):
+    return [Tx.parse(BytesIO(raw)) for raw in raws]
+
+
+def parse_points(secs):
+    return [S256Point.parse(sec) for sec in secs]
+
+
+def parse_signatures(ders):
+    return [Signature.parse(der) for der in ders]
+
+
+def main(blocks=40, txs_per_block=500, points=20000):
+    raws = make_raw_txs(blocks, txs_per_block)
+    key = PrivateKey(12345)
+    secs = [key.point.sec(compressed=False)] * points
+    ders = [key.sign(z).der() for z in range(1, 51)] * (points // 50)
+    print('{:<14} {:>8} {:>12} {:>14} {:>9}'.format('objects', 'count', 'resident MB', 'bytes each', 'seconds'))
+    for name, function, inputs in (('transactions', parse_txs, raws), ('points', parse_points, secs),
+                                   ('signatures', parse_signatures, ders)):
+        result, size, elapsed = resident(function, inputs)
+        print('{:<14} {:>8} {:>12.2f} {:>14.0f} {:>9.3f}'.format(
+            name, len(result), size / 1e6, size / len(result), elapsed))
+        del result
+
+
+if __name__ == '__main__':
+    main()
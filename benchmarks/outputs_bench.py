@@ -0,0 +1,68 @@
+"""
+Classifying every output of a block and deriving its address: parsing the
+block into Tx and Script objects against walking the raw bytes
+
+    python -m benchmarks.outputs_bench
+"""
+import time
+from io import BytesIO
+
+from pybtc.block import Block
+from pybtc.helper import encode_varint
+from pybtc.outputs import classify_block_outputs
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+
+
+def make_block(count, outputs, addresses):
+    templates = (
+        lambda h: Script([0x76, 0xa9, h[:20], 0x88, 0xac]),
+        lambda h: Script([0xa9, h[:20], 0x87]),
+        lambda h: Script([0x00, h[:20]]),
+        lambda h: Script([0x00, h]),
+        lambda h: Script([0x51, h]),
+        lambda h: Script([0x6a, h]),
+    )
+    raws = []
+    for n in range(count):
+        tx_outs = []
+        for i in range(outputs):
+            k = (n * outputs + i) % addresses
+            script = templates[k % len(templates)](k.to_bytes(32, 'big'))
+            tx_outs.append(TxOut(1000 + i, script))
+        raws.append(Tx(1, [TxIn(n.to_bytes(32, 'big'), 0)], tx_outs, 0).serialize())
+    return b'\x00' * 80 + encode_varint(count) + b''.join(raws)
+
+
+def parsed(raw):
+    rows = []
+    block = Block.parse(BytesIO(raw))
+    for tx in block.txs:
+        tx_hash = tx.hash()
+        for i, tx_out in enumerate(tx.tx_outs):
+            script = tx_out.script_pubkey
+            rows.append((tx_hash, i, tx_out.amount, script.classify(), script.address()))
+    return rows
+
+
+def best(function, raw, rounds=3):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(raw)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(count=2000, outputs=5, addresses=2000):
+    raw = make_block(count, outputs, addresses)
+    assert parsed(raw) == classify_block_outputs(raw)
+    print('{} transactions, {} outputs each, {} distinct scriptPubKeys'.format(count, outputs, addresses))
+    print('{:<12} {:>9} {:>14}'.format('method', 'ms', 'us per output'))
+    for name, function in (('parsed', parsed), ('raw', classify_block_outputs)):
+        elapsed = best(function, raw)
+        print('{:<12} {:>9.1f} {:>14.2f}'.format(name, elapsed * 1e3, elapsed * 1e6 / (count * outputs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Evaluation time of long scripts: the previous pop(0) interpreter against
+the index-based one with the opcode dispatch table, with and without a
+profiler installed, and of the standard templates through their fast paths
+against the general interpreter
+The long scripts are over the consensus limits, which are lifted for them
+
+    python -m benchmarks.script_bench
+"""
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from pybtc.ecc import PrivateKey
+from pybtc.helper import hash160
+from pybtc.opcodes import OP_CODE_FUNCTIONS
+from pybtc.script import Script
+from pybtc.tracer import ScriptProfiler
+
+
+@contextmanager
+def no_limits():
+    """Lifts the interpreter limits, for timing scripts that would be rejected early"""
+    inf = float('inf')
+    with mock.patch.multiple('pybtc.script', MAX_OPS_PER_SCRIPT=inf, MAX_STACK_SIZE=inf, MAX_SCRIPT_SIZE=inf,
+                             MAX_SCRIPT_ELEMENT_SIZE=inf), \
+            mock.patch.multiple('pybtc.opcodes', MAX_SCRIPT_ELEMENT_SIZE=inf):
+        yield
+
+
+def previous_evaluate(script, z):
+    """The interpreter before the dispatch table, kept for comparison"""
+    cmds = script.cmds[:]
+    stack = []
+    alt_stack = []
+    while len(cmds) > 0:
+        cmd = cmds.pop(0)
+        if type(cmd) is int:
+            operation = OP_CODE_FUNCTIONS[cmd]
+            if cmd in (99, 100):
+                if not operation(stack, cmds):
+                    return False
+            elif cmd in (107, 108):
+                if not operation(stack, alt_stack):
+                    return False
+            elif cmd in (172, 173, 174, 175):
+                if not operation(stack, z):
+                    return False
+            else:
+                if not operation(stack):
+                    return False
+        else:
+            stack.append(cmd)
+    if len(stack) == 0 or stack.pop() == b'':
+        return False
+    return True
+
+
+def make_script(pairs):
+    # OP_1 then OP_DUP OP_DROP and push/OP_DROP pairs
+    cmds = [0x51]
+    for n in range(pairs):
+        if n % 2:
+            cmds += [0x76, 0x75]
+        else:
+            cmds += [b'\x01\x02', 0x75]
+    return Script(cmds)
+
+
+def best(function, repeat=5):
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+def template_scripts():
+    z = 0x1234567890abcdef
+    key = PrivateKey(8675309)
+    sig = key.sign(z).der() + b'\x01'
+    sec = key.point.sec()
+    redeem = bytes.fromhex('5121') + sec + bytes.fromhex('51ae')
+    return z, (
+        ('p2pkh', Script([sig, sec, 0x76, 0xa9, hash160(sec), 0x88, 0xac])),
+        ('p2sh', Script([sig, redeem, 0xa9, hash160(redeem), 0x87])),
+        ('p2wpkh', Script([0x00, hash160(sec)])),
+    )
+
+
+def main():
+    with no_limits():
+        long_scripts()
+    template_benchmark()
+
+
+def long_scripts():
+    print('{:>8} {:>12} {:>12} {:>8}'.format('cmds', 'previous ms', 'indexed ms', 'speedup'))
+    for pairs in (100, 1000, 10000, 50000):
+        script = make_script(pairs)
+        assert previous_evaluate(script, 0) and script.evaluate(0)
+        previous = best(lambda: previous_evaluate(script, 0))
+        indexed = best(lambda: script.evaluate(0))
+        print('{:>8} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(
+            len(script.cmds), previous * 1e3, indexed * 1e3, previous / indexed))
+
+    script = make_script(10000)
+    untraced = best(lambda: script.evaluate(0))
+    profiled = best(lambda: script.evaluate(0, ScriptProfiler()))
+    print()
+    print('{} cmds: {:.2f} ms untraced, {:.2f} ms profiled'.format(
+        len(script.cmds), untraced * 1e3, profiled * 1e3))
+
+    # OP_16 then OP_1ADD 10 OP_ADD 7 OP_SUB OP_DUP OP_DUP OP_NUMEQUAL OP_VERIFY repeated
+    script = Script([0x60] + [0x8b, 0x5a, 0x93, 0x57, 0x94, 0x76, 0x76, 0x9c, 0x69] * 2000 + [0x51])
+    assert script.evaluate(0)
+    print('{} cmds of arithmetic: {:.2f} ms'.format(len(script.cmds), best(lambda: script.evaluate(0)) * 1e3))
+
+
+def template_benchmark():
+    z, scripts = template_scripts()
+    print()
+    print('{:>8} {:>12} {:>12} {:>8}'.format('template', 'general us', 'fast us', 'speedup'))
+    for name, script in scripts:
+        assert script.interpret(z) == script.evaluate(z)
+        general = best(lambda: script.interpret(z), repeat=20)
+        fast = best(lambda: script.evaluate(z), repeat=20)
+        print('{:>8} {:>12.1f} {:>12.1f} {:>7.1f}x'.format(name, general * 1e6, fast * 1e6, general / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Peak memory and time of downloading and parsing a large transaction:
+the previous whole-body hex path against streamed hex and binary bodies
+
+    python -m benchmarks.stream_bench
+"""
+import time
+import tracemalloc
+from io import BytesIO
+
+import requests
+
+from pybtc.backends import HttpBackend
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+from tests.stand_in import StandInServer
+
+
+def make_large_tx(outputs):
+    tx_outs = [TxOut(n, Script([0x76, 0xa9, n.to_bytes(20, 'big'), 0x88, 0xac])) for n in range(outputs)]
+    return Tx(1, [TxIn(b'\x01' * 32, 0)], tx_outs, 0)
+
+
+def previous_path(url, tx_id):
+    response = requests.get('{}/tx/{}.hex'.format(url, tx_id))
+    raw = bytes.fromhex(response.text.strip())
+    return Tx.parse(BytesIO(raw))
+
+
+def streamed_path(backend, tx_id):
+    stream = backend.open(tx_id)
+    try:
+        return Tx.parse(stream)
+    finally:
+        stream.close()
+
+
+def measure(function, repeat=3):
+    """Best time of repeat runs, and the peak memory of one traced run"""
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(outputs=50000):
+    tx = make_large_tx(outputs)
+    raw = tx.serialize()
+    tx_id = tx.id()
+    with StandInServer({tx_id: raw}) as server:
+        hex_backend = HttpBackend(server.url, server.url)
+        binary_backend = HttpBackend(server.url, server.url, path='/tx/{}.bin', binary=True)
+        cases = (
+            ('previous: text + fromhex', lambda: previous_path(server.url, tx_id)),
+            ('streamed hex', lambda: streamed_path(hex_backend, tx_id)),
+            ('streamed binary', lambda: streamed_path(binary_backend, tx_id)),
+            ('raw only, previous', lambda: bytes.fromhex(requests.get(
+                '{}/tx/{}.hex'.format(server.url, tx_id)).text.strip())),
+            ('raw only, streamed hex', lambda: hex_backend.get_raw(tx_id)),
+            ('raw only, binary', lambda: binary_backend.get_raw(tx_id)),
+        )
+        server.body(tx_id, 'hex')
+        print('transaction of {:.1f} MB'.format(len(raw) / 1e6))
+        print('{:<26} {:>9} {:>12}'.format('path', 'seconds', 'peak MB'))
+        for name, function in cases:
+            elapsed, peak = measure(function)
+            print('{:<26} {:>9.3f} {:>12.2f}'.format(name, elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Timing of the hot paths on fixed inputs, written as JSON and compared against
+a stored baseline so that a slower upgrade shows up as a regression
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --save-baseline baseline.json
+    python -m benchmarks.suite --baseline baseline.json --threshold 0.2 --json results.json
+
+With --baseline the exit status is 1 when a benchmark got slower than the
+baseline by more than the threshold (0.2 is 20%)
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+from io import BytesIO
+
+from pybtc.base58 import encode_base58_checksum
+from pybtc.ecc import PrivateKey, S256Point, Signature
+from pybtc.helper import hash160, hash256
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+
+SCHEMA = 1
+
+
+def fixtures():
+    """Deterministic inputs: every run and every machine times the same work"""
+    secret = int.from_bytes(hash256(b'benchmark secret'), 'big')
+    z = int.from_bytes(hash256(b'benchmark message'), 'big')
+    key = PrivateKey(secret)
+    sig = key.sign(z)
+    sec = key.point.sec()
+    uncompressed = key.point.sec(compressed=False)
+    der = sig.der()
+    h160 = hash160(sec)
+    script_sig = Script([der + b'\x01', sec])
+    script_pubkey = Script([0x76, 0xa9, h160, 0x88, 0xac])
+    tx_ins = [TxIn(hash256(bytes([i])), i, script_sig) for i in range(5)]
+    tx_outs = [TxOut(1000 * i, script_pubkey) for i in range(10)]
+    tx = Tx(1, tx_ins, tx_outs, 0)
+    return {
+        'secret': secret,
+        'z': z,
+        'key': key,
+        'sig': sig,
+        'sec': sec,
+        'uncompressed': uncompressed,
+        'der': der,
+        'h160': h160,
+        'tx': tx,
+        'raw_tx': tx.serialize(),
+        'raw_script': script_pubkey.serialize(),
+        'combined': script_sig + script_pubkey,
+        'address_payload': b'\x00' + h160,
+    }
+
+
+def cases(f):
+    """(name, function) of every benchmark"""
+    g = PrivateKey.G
+    return (
+        ('Point.__rmul__', lambda: f['secret'] * g),
+        ('PrivateKey.sign', lambda: f['key'].sign(f['z'])),
+        ('S256Point.verify', lambda: f['key'].point.verify(f['z'], f['sig'])),
+        ('S256Point.parse compressed', lambda: S256Point.parse(f['sec'])),
+        ('S256Point.parse uncompressed', lambda: S256Point.parse(f['uncompressed'])),
+        ('Signature.parse', lambda: Signature.parse(f['der'])),
+        ('Signature.der', lambda: f['sig'].der()),
+        ('Tx.parse', lambda: Tx.parse(BytesIO(f['raw_tx']))),
+        ('Tx.serialize', lambda: f['tx'].serialize()),
+        ('Tx.hash', lambda: f['tx'].hash()),
+        ('Script.parse', lambda: Script.parse(BytesIO(f['raw_script']))),
+        ('Script.evaluate p2pkh', lambda: f['combined'].evaluate(f['z'])),
+        ('Script.interpret p2pkh', lambda: f['combined'].interpret(f['z'])),
+        ('encode_base58_checksum', lambda: encode_base58_checksum(f['address_payload'])),
+        ('hash160', lambda: hash160(f['sec'])),
+    )
+
+
+def measure(function, repeat=5, min_time=0.2):
+    """Best seconds per call over repeat rounds, each round running at least min_time"""
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number, number
+
+
+def run(only=None, repeat=5, min_time=0.2):
+    f = fixtures()
+    results = {}
+    for name, function in cases(f):
+        if only is not None and not any(word in name for word in only):
+            continue
+        seconds, number = measure(function, repeat, min_time)
+        results[name] = {'seconds': seconds, 'number': number, 'repeat': repeat}
+    return {
+        'schema': SCHEMA,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Rows of (name, baseline seconds, seconds, ratio, regressed) for the benchmarks in both"""
+    rows = []
+    for name, result in results['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+        ratio = result['seconds'] / base['seconds']
+        rows.append((name, base['seconds'], result['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('schema') != SCHEMA:
+        raise ValueError('{} is not a benchmark file of schema {}'.format(path, SCHEMA))
+    return data
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--json', help='write the results to this file, - for stdout')
+    parser.add_argument('--baseline', help='compare against the results stored in this file')
+    parser.add_argument('--save-baseline', help='store the results as a baseline in this file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown reported as a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds each round runs at least')
+    parser.add_argument('--only', nargs='*', help='run the benchmarks whose name contains one of these')
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.repeat, args.min_time)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        for name, result in results['benchmarks'].items():
+            print('{:<30} {:>12.2f} us'.format(name, result['seconds'] * 1e6))
+        if args.json:
+            save(args.json, results)
+    if args.save_baseline:
+        save(args.save_baseline, results)
+
+    if args.baseline:
+        rows = compare(results, load(args.baseline), args.threshold)
+        regressions = [row for row in rows if row[4]]
+        out = sys.stderr if args.json == '-' else sys.stdout
+        print('\n{:<30} {:>12} {:>12} {:>8}'.format('vs baseline', 'before us', 'after us', 'ratio'), file=out)
+        for name, before, after, ratio, regressed in rows:
+            print('{:<30} {:>12.2f} {:>12.2f} {:>8.2f}{}'.format(
+                name, before * 1e6, after * 1e6, ratio, '  REGRESSION' if regressed else ''), file=out)
+        if regressions:
+            print('{} regression(s) over {:.0%}'.format(len(regressions), args.threshold), file=out)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
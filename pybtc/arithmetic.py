@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+class PythonArithmetic:
+    """
+    Modular arithmetic of the field and scalar operations on Python ints
+    Inverses use pow(a, -1, m), several times faster than Fermat's pow(a, m - 2, m)
+    """
+    name = 'python'
+
+    def mul_mod(self, a, b, m):
+        return a * b % m
+
+    def inverse(self, a, m):
+        """Inverse of a modulo m, a must not be a multiple of m"""
+        return pow(a, -1, m)
+
+    def pow_mod(self, a, e, m):
+        return pow(a, e, m)
+
+    def sqrt_mod(self, a, p):
+        """A square root of a modulo a prime p = 3 mod 4, when a has one"""
+        return pow(a, (p + 1) // 4, p)
+
+
+class Gmpy2Arithmetic(PythonArithmetic):
+    """
+    Inverses and exponentiations on GMP, results are converted back to ints
+    Products stay on Python ints: for 256 bit numbers the conversions cost
+    more than GMP saves
+    """
+    name = 'gmpy2'
+
+    def inverse(self, a, m):
+        return int(gmpy2.invert(a, m))
+
+    def pow_mod(self, a, e, m):
+        return int(gmpy2.powmod(a, e, m))
+
+    def sqrt_mod(self, a, p):
+        return int(gmpy2.powmod(a, (p + 1) // 4, p))
+
+
+def default_backend():
+    """gmpy2 when it is installed, Python ints otherwise"""
+    if gmpy2 is not None:
+        return Gmpy2Arithmetic()
+    return PythonArithmetic()
+
+
+# the backend pybtc.ecc computes with
+backend = default_backend()
+
+
+def set_backend(new_backend):
+    global backend
+    backend = new_backend
+
+
+@contextmanager
+def using(new_backend):
+    """Runs the block with new_backend, e.g. to compare backends"""
+    previous = backend
+    set_backend(new_backend)
+    try:
+        yield new_backend
+    finally:
+        set_backend(previous)
@@ -0,0 +1,238 @@
+import binascii
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TxBackend:
+    """Source of raw transactions for TxFetcher"""
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        """
+        Returns the raw bytes of the transaction or None if the backend does not have it
+        timeout bounds the read in seconds, backends waiting on the network honour it
+        """
+        raise NotImplementedError
+
+    def open(self, tx_id, testnet=False, timeout=None):
+        """Returns a stream of the raw transaction or None, backends that can stream override it"""
+        raw = self.get_raw(tx_id, testnet, timeout)
+        if raw is None:
+            return None
+        return BytesIO(raw)
+
+
+class ResponseStream:
+    """
+    Reads a streamed HTTP response body chunk by chunk, decoding hex bodies
+    as they arrive so the whole body is never held as text
+    Only the current decoded chunk is kept, reads are slices of it
+    Past deadline, a time.monotonic() value, reading raises TimeoutError
+    """
+
+    def __init__(self, response, hex_body, chunk_size=64 * 1024, deadline=None):
+        self.response = response
+        self.deadline = deadline
+        self.chunks = response.iter_content(chunk_size)
+        self.hex_body = hex_body
+        self.block = b''
+        self.position = 0
+        # a hex digit left over from a chunk of odd length
+        self.carry = b''
+
+    def decode(self, chunk):
+        if not self.hex_body:
+            return chunk
+        digits = self.carry + chunk.translate(None, b' \t\r\n')
+        if len(digits) % 2:
+            self.carry = digits[-1:]
+            digits = digits[:-1]
+        else:
+            self.carry = b''
+        try:
+            return binascii.unhexlify(digits)
+        except binascii.Error:
+            raise ValueError('Unexpected response: not hex')
+
+    def next_block(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError('Download timed out: {}'.format(self.response.url))
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            if self.carry:
+                raise ValueError('Unexpected response: odd number of hex digits')
+            return None
+        return self.decode(chunk)
+
+    def read(self, n=-1):
+        end = self.position + n
+        if 0 <= n and end <= len(self.block):
+            result = self.block[self.position:end]
+            self.position = end
+            return result
+
+        parts = [self.block[self.position:]]
+        size = len(parts[0])
+        self.block = b''
+        self.position = 0
+        while n < 0 or size < n:
+            block = self.next_block()
+            if block is None:
+                break
+            if 0 <= n < size + len(block):
+                # keep the rest of this block for the next reads
+                self.position = n - size
+                self.block = block
+                parts.append(block[:self.position])
+                break
+            parts.append(block)
+            size += len(block)
+        return b''.join(parts)
+
+    def close(self):
+        self.response.close()
+
+
+class HttpBackend(TxBackend):
+    """
+    Downloads transactions from HTTP endpoints serving the hex of a transaction,
+    or its raw bytes when binary is set
+    path is formatted with the tx id, connections are pooled and shared by threads
+    """
+
+    def __init__(self, mainnet_url='http://mainnet.programmingbitcoin.com',
+                 testnet_url='http://testnet.programmingbitcoin.com', path='/tx/{}.hex', timeout=30, pool_size=16,
+                 binary=False):
+        self.mainnet_url = mainnet_url
+        self.testnet_url = testnet_url
+        self.path = path
+        self.binary = binary
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return 'HttpBackend({})'.format(self.mainnet_url)
+
+    def get_url(self, tx_id, testnet=False):
+        base_url = self.testnet_url if testnet else self.mainnet_url
+        return base_url + self.path.format(tx_id)
+
+    def get_session(self):
+        with self.lock:
+            if self.session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.session = session
+            return self.session
+
+    def open(self, tx_id, testnet=False, timeout=None):
+        url = self.get_url(tx_id, testnet)
+        deadline = None
+        if timeout is None:
+            timeout = self.timeout
+        else:
+            # a shorter timeout ends the download, not only the wait for it
+            timeout = min(timeout, self.timeout)
+            deadline = time.monotonic() + timeout
+        response = self.get_session().get(url, timeout=timeout, stream=True)
+        if response.status_code == 404:
+            response.close()
+            return None
+        if response.status_code != 200:
+            response.close()
+            raise ValueError('Unexpected response: {} {}'.format(response.status_code, url))
+        return ResponseStream(response, not self.binary, deadline=deadline)
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        stream = self.open(tx_id, testnet, timeout)
+        if stream is None:
+            return None
+        try:
+            return stream.read()
+        finally:
+            stream.close()
+
+
+class DirectoryBackend(TxBackend):
+    """Reads <tx_id>.bin (raw bytes) or <tx_id>.hex files from a local directory"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return 'DirectoryBackend({})'.format(self.path)
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        try:
+            with open(os.path.join(self.path, tx_id + '.bin'), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        try:
+            with open(os.path.join(self.path, tx_id + '.hex')) as f:
+                return bytes.fromhex(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+
+class MemoryBackend(TxBackend):
+    """Raw transactions held in a dict of tx_id to bytes"""
+
+    def __init__(self, txs=None):
+        if txs is None:
+            self.txs = {}
+        else:
+            self.txs = txs
+
+    def __repr__(self):
+        return 'MemoryBackend({} txs)'.format(len(self.txs))
+
+    def add(self, tx_id, raw):
+        self.txs[tx_id] = raw
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        return self.txs.get(tx_id)
+
+
+class ChainBackend(TxBackend):
+    """
+    Tries each backend in order, falling back to the next one when a backend
+    does not have the transaction or fails
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def __repr__(self):
+        return 'ChainBackend({})'.format(self.backends)
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        return self.first('get_raw', tx_id, testnet, timeout)
+
+    def open(self, tx_id, testnet=False, timeout=None):
+        return self.first('open', tx_id, testnet, timeout)
+
+    def first(self, method, tx_id, testnet, timeout):
+        error = None
+        for backend in self.backends:
+            try:
+                result = getattr(backend, method)(tx_id, testnet, timeout)
+            except Exception as e:
+                LOGGER.info('{} failed for {}: {!r}'.format(backend, tx_id, e))
+                error = e
+                continue
+            if result is not None:
+                return result
+        if error is not None:
+            raise error
+        return None
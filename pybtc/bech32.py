@@ -0,0 +1,52 @@
+from pybtc.constants import BECH32_ALPHABET
+
+# checksum constants of BIP173 (witness version 0) and BIP350 (versions 1 to 16)
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+GENERATOR = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+
+
+def bech32_polymod(values):
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            if (top >> i) & 1:
+                chk ^= GENERATOR[i]
+    return chk
+
+
+def hrp_expand(hrp):
+    return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
+
+
+def create_checksum(hrp, data, const):
+    polymod = bech32_polymod(hrp_expand(hrp) + data + [0] * 6) ^ const
+    return [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+
+
+def convert_bits(data, from_bits, to_bits):
+    """Regroups the bits of data, padding the last group with zeros"""
+    acc = 0
+    bits = 0
+    result = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((acc >> bits) & max_value)
+    if bits:
+        result.append((acc << (to_bits - bits)) & max_value)
+    return result
+
+
+def encode_segwit_address(version, program, testnet=False):
+    """Address of a witness program, bech32 for version 0 and bech32m after"""
+    hrp = 'tb' if testnet else 'bc'
+    data = [version] + convert_bits(program, 8, 5)
+    const = BECH32_CONST if version == 0 else BECH32M_CONST
+    return hrp + '1' + ''.join(BECH32_ALPHABET[d] for d in data + create_checksum(hrp, data, const))
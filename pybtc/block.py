@@ -0,0 +1,308 @@
+import mmap
+import os
+from contextlib import contextmanager
+
+from pybtc.backends import TxBackend
+from pybtc.constants import NETWORK_MAGIC, TESTNET_NETWORK_MAGIC
+from pybtc.helper import hash256, little_endian_to_int, int_to_little_endian, read_varint, encode_varint
+from pybtc.merkle import MerkleTree, merkle_root, partial_merkle_root
+from pybtc.outputs import classify_block_outputs
+from pybtc.transaction import Tx
+
+
+class BlockHeader:
+    def __init__(self, version, prev_block, merkle_root, timestamp, bits, nonce):
+        self.version = version
+        self.prev_block = prev_block
+        self.merkle_root = merkle_root
+        self.timestamp = timestamp
+        self.bits = bits
+        self.nonce = nonce
+
+    def __repr__(self):
+        return 'block: {}\nversion: {}\nprev_block: {}\nmerkle_root: {}\ntimestamp: {}\n'.format(
+            self.id(),
+            self.version,
+            self.prev_block.hex(),
+            self.merkle_root.hex(),
+            self.timestamp
+        )
+
+    def id(self):
+        """Human-readable hexadecimal of the block hash"""
+        return self.hash().hex()
+
+    def hash(self):
+        """Binary hash of the header"""
+        return hash256(self.serialize())[::-1]
+
+    def serialize(self):
+        """Returns the 80 byte serialization of the header"""
+        result = int_to_little_endian(self.version, 4)
+        result += self.prev_block[::-1]
+        result += self.merkle_root[::-1]
+        result += int_to_little_endian(self.timestamp, 4)
+        result += self.bits
+        result += self.nonce
+        return result
+
+    @classmethod
+    def parse(cls, stream):
+        version = little_endian_to_int(stream.read(4))
+        prev_block = stream.read(32)[::-1]
+        merkle_root = stream.read(32)[::-1]
+        timestamp = little_endian_to_int(stream.read(4))
+        bits = stream.read(4)
+        nonce = stream.read(4)
+        return cls(version, prev_block, merkle_root, timestamp, bits, nonce)
+
+
+class Block:
+    def __init__(self, header, txs):
+        self.header = header
+        self.txs = txs
+
+    def __repr__(self):
+        return '{}txs: {}\n'.format(self.header, len(self.txs))
+
+    def id(self):
+        return self.header.id()
+
+    def hash(self):
+        return self.header.hash()
+
+    def serialize(self):
+        """Returns the serialization of the block, without witness data"""
+        result = self.header.serialize()
+        result += encode_varint(len(self.txs))
+        for tx in self.txs:
+            result += tx.serialize()
+        return result
+
+    def tx_hashes(self):
+        """Binary hashes of the transactions, in block order"""
+        return [tx.hash() for tx in self.txs]
+
+    def merkle_tree(self):
+        """Merkle tree of the transactions, to serve branches or partial trees"""
+        return MerkleTree([h[::-1] for h in self.tx_hashes()])
+
+    def validate_merkle_root(self):
+        """Checks the transactions match the header's merkle root"""
+        hashes = [h[::-1] for h in self.tx_hashes()]
+        return merkle_root(hashes)[::-1] == self.header.merkle_root
+
+    @classmethod
+    def parse(cls, stream, testnet=False):
+        header = BlockHeader.parse(stream)
+        tx_qty = read_varint(stream)
+        txs = []
+        for n in range(tx_qty):
+            txs.append(Tx.parse(stream, testnet))
+        return cls(header, txs)
+
+
+class MerkleBlock:
+    def __init__(self, header, total, hashes, flags):
+        self.header = header
+        self.total = total
+        self.hashes = hashes
+        self.flags = flags
+
+    def __repr__(self):
+        return '{}total: {}\nhashes: {}\n'.format(self.header, self.total, len(self.hashes))
+
+    def serialize(self):
+        result = self.header.serialize()
+        result += int_to_little_endian(self.total, 4)
+        result += encode_varint(len(self.hashes))
+        for h in self.hashes:
+            result += h[::-1]
+        result += encode_varint(len(self.flags))
+        result += self.flags
+        return result
+
+    def matched_hashes(self):
+        """Binary hashes of the matched transactions, raises SyntaxError on a malformed tree"""
+        root, matched = partial_merkle_root(self.total, [h[::-1] for h in self.hashes], self.flags)
+        if root[::-1] != self.header.merkle_root:
+            raise SyntaxError('Partial merkle tree does not match the header')
+        return [h[::-1] for h in matched]
+
+    def is_valid(self):
+        try:
+            self.matched_hashes()
+        except SyntaxError:
+            return False
+        return True
+
+    @classmethod
+    def from_block(cls, block, indexes, tree=None):
+        """Builds the merkleblock proving the transactions at indexes, reusing tree if given"""
+        if tree is None:
+            tree = block.merkle_tree()
+        hashes, flags = tree.partial(indexes)
+        return cls(block.header, tree.total, [h[::-1] for h in hashes], flags)
+
+    @classmethod
+    def parse(cls, stream):
+        header = BlockHeader.parse(stream)
+        total = little_endian_to_int(stream.read(4))
+        hashes = [stream.read(32)[::-1] for _ in range(read_varint(stream))]
+        flags = stream.read(read_varint(stream))
+        return cls(header, total, hashes, flags)
+
+
+@contextmanager
+def map_blk_file(path):
+    """Maps a blk*.dat file read-only, yields None for an empty file"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+
+def blk_records(mm, testnet=False):
+    """
+    Yields (offset, size) of every block record of a mapped blk*.dat file
+    Each record is the network magic, a 4 byte little endian size and the block
+    """
+    magic = TESTNET_NETWORK_MAGIC if testnet else NETWORK_MAGIC
+    offset = 0
+    end = len(mm)
+    while offset + 8 <= end:
+        record_magic = mm[offset:offset + 4]
+        if record_magic == b'\x00\x00\x00\x00':
+            # Bitcoin Core preallocates blk files, the rest is zero padding
+            break
+        if record_magic != magic:
+            raise SyntaxError('Unexpected network magic at offset {}'.format(offset))
+
+        size = little_endian_to_int(mm[offset + 4:offset + 8])
+        start = offset + 8
+        if start + size > end:
+            raise SyntaxError('Truncated block at offset {}'.format(offset))
+
+        yield start, size
+        offset = start + size
+
+
+def release_pages(mm, released, offset):
+    """
+    Lets the OS drop the mapped pages between released and offset from our
+    resident set, returns the offset released up to for the next call
+    """
+    if not hasattr(mmap, 'MADV_DONTNEED'):
+        return released
+    end = offset - offset % mmap.PAGESIZE
+    if end > released:
+        mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+        return end
+    return released
+
+
+def read_blk_file(path, testnet=False):
+    """Yields the blocks of a blk*.dat file one at a time"""
+    with map_blk_file(path) as mm:
+        if mm is None:
+            return
+        released = 0
+        for start, size in blk_records(mm, testnet):
+            mm.seek(start)
+            block = Block.parse(mm, testnet)
+            if mm.tell() != start + size:
+                raise SyntaxError('Block size mismatch at offset {}'.format(start))
+            released = release_pages(mm, released, start)
+            yield block
+
+
+def read_blk_transactions(path, testnet=False):
+    """
+    Yields (header, tx) for every transaction of a blk*.dat file
+    Only one transaction is held at a time, whatever the block size
+    """
+    with map_blk_file(path) as mm:
+        if mm is None:
+            return
+        released = 0
+        for start, size in blk_records(mm, testnet):
+            mm.seek(start)
+            header = BlockHeader.parse(mm)
+            tx_qty = read_varint(mm)
+            for n in range(tx_qty):
+                tx = Tx.parse(mm, testnet)
+                position = mm.tell()
+                yield header, tx
+                mm.seek(position)
+            if mm.tell() != start + size:
+                raise SyntaxError('Block size mismatch at offset {}'.format(start))
+            released = release_pages(mm, released, start)
+
+
+def read_blk_tx_locations(path, testnet=False):
+    """Yields (tx_id, offset, size) for every transaction of a blk*.dat file"""
+    with map_blk_file(path) as mm:
+        if mm is None:
+            return
+        released = 0
+        for start, size in blk_records(mm, testnet):
+            mm.seek(start + 80)
+            tx_qty = read_varint(mm)
+            for n in range(tx_qty):
+                offset = mm.tell()
+                tx = Tx.parse(mm, testnet)
+                position = mm.tell()
+                yield tx.id(), offset, position - offset
+                mm.seek(position)
+            released = release_pages(mm, released, start)
+
+
+def read_blk_outputs(path, testnet=False):
+    """
+    Yields (block_hash, rows) for every block of a blk*.dat file, rows are the
+    classified outputs of classify_block_outputs, read without parsing the block
+    """
+    with map_blk_file(path) as mm:
+        if mm is None:
+            return
+        released = 0
+        for start, size in blk_records(mm, testnet):
+            raw = mm[start:start + size]
+            yield hash256(raw[:80])[::-1], classify_block_outputs(raw, testnet)
+            released = release_pages(mm, released, start)
+
+
+class BlkIndexBackend(TxBackend):
+    """
+    Reads transactions straight out of blk*.dat files through an index of
+    tx_id to (path, offset, size) built with add_file
+    """
+
+    def __init__(self, index=None):
+        if index is None:
+            self.index = {}
+        else:
+            self.index = index
+
+    def __repr__(self):
+        return 'BlkIndexBackend({} txs)'.format(len(self.index))
+
+    def add_file(self, path, testnet=False):
+        for tx_id, offset, size in read_blk_tx_locations(path, testnet):
+            self.index[tx_id] = (path, offset, size)
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        location = self.index.get(tx_id)
+        if location is None:
+            return None
+        path, offset, size = location
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
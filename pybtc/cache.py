@@ -0,0 +1,97 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def object_size(obj):
+    """Shallow size of an object including its attribute dict, if it has one"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+class LRUCache:
+    """
+    Mapping with a budget in bytes that evicts the least recently used entries
+    sizeof(value) returns the bytes an entry is charged for
+    Safe to share between threads
+    """
+
+    def __init__(self, max_bytes, sizeof=sys.getsizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return '{}({} entries, {}/{} bytes)'.format(
+            self.__class__.__name__, len(self.entries), self.resident_bytes, self.max_bytes
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value, self.sizeof(value))
+
+    def __delitem__(self, key):
+        with self.lock:
+            self.remove(key)
+
+    def remove(self, key):
+        value, size = self.entries.pop(key)
+        self.resident_bytes -= size
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if size > self.max_bytes:
+                # would evict everything else and still not fit
+                return
+            self.entries[key] = (value, size)
+            self.resident_bytes += size
+            while self.resident_bytes > self.max_bytes:
+                old_value, old_size = self.entries.popitem(last=False)[1]
+                self.resident_bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,172 @@
+import os
+import random
+
+from pybtc.block import Block, BlockHeader
+from pybtc.constants import NETWORK_MAGIC, TESTNET_NETWORK_MAGIC, SIGHASH_ALL
+from pybtc.ecc import PrivateKey
+from pybtc.helper import hash160, hash256, int_to_little_endian
+from pybtc.merkle import merkle_root
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+from pybtc.utxo import UtxoSet
+
+REWARD = 50 * 100000000
+# stands in for a signature when the corpus is not signed, the size of a real one
+UNSIGNED = b'\x30' + b'\x00' * 70 + SIGHASH_ALL.to_bytes(1, 'big')
+
+
+def op_number(n):
+    """OP_1 to OP_16"""
+    return 0x50 + n
+
+
+def multisig_script(m, keys):
+    return Script([op_number(m)] + [key.point.sec() for key in keys] + [op_number(len(keys)), 0xae])
+
+
+class CorpusGenerator:
+    """
+    Seeded generator of realistic signed transactions chained into blocks:
+    p2pkh, p2sh 2-of-3 multisig and bare multisig outputs, transactions with
+    several inputs and outputs spending the outputs of earlier blocks
+    The same seed and settings always give the same bytes
+    With sign=False the signatures are placeholders of the same size, for
+    parse and fee workloads that do not need them to verify
+
+        generator = CorpusGenerator(seed=1)
+        paths = generator.write('corpus', blocks=100)
+    """
+
+    def __init__(self, seed=0, keys=20, txs_per_block=50, max_inputs=4, max_outputs=4, sign=True, testnet=False):
+        self.random = random.Random(seed)
+        self.keys = [PrivateKey(int.from_bytes(hash256(b'corpus %d %d' % (seed, i)), 'big')) for i in range(keys)]
+        self.txs_per_block = txs_per_block
+        self.max_inputs = max_inputs
+        self.max_outputs = max_outputs
+        self.sign = sign
+        self.testnet = testnet
+        # outputs of earlier blocks that can be spent: (tx hash, index, amount, spend)
+        self.pool = []
+        # only signing needs the outputs being spent, the sighash commits to them
+        self.utxos = UtxoSet() if sign else None
+        self.height = 0
+        self.prev_block = b'\x00' * 32
+
+    def output(self, amount):
+        """A random output and what spending it needs: (TxOut, spend)"""
+        choice = self.random.random()
+        if choice < 0.7:
+            key = self.random.choice(self.keys)
+            script = Script([0x76, 0xa9, hash160(key.point.sec()), 0x88, 0xac])
+            return TxOut(amount, script), ('p2pkh', key)
+        keys = self.random.sample(self.keys, 3)
+        if choice < 0.9:
+            redeem_script = multisig_script(2, keys)
+            script = Script([0xa9, hash160(redeem_script.raw_serialize()), 0x87])
+            return TxOut(amount, script), ('p2sh', 2, keys, redeem_script)
+        m = self.random.randint(1, 2)
+        return TxOut(amount, multisig_script(m, keys[:m + 1])), ('multisig', m, keys[:m + 1])
+
+    def signature(self, tx, index, key, redeem_script=None):
+        if not self.sign:
+            return UNSIGNED
+        z = tx.sig_hash(index, self.utxos, redeem_script)
+        return key.sign(z).der() + SIGHASH_ALL.to_bytes(1, 'big')
+
+    def sign_input(self, tx, index, spend):
+        kind = spend[0]
+        if kind == 'p2pkh':
+            key = spend[1]
+            script_sig = Script([self.signature(tx, index, key), key.point.sec()])
+        elif kind == 'multisig':
+            m, keys = spend[1:]
+            script_sig = Script([0x00] + [self.signature(tx, index, key) for key in keys[:m]])
+        else:
+            m, keys, redeem_script = spend[1:]
+            sigs = [self.signature(tx, index, key, redeem_script) for key in keys[:m]]
+            script_sig = Script([0x00] + sigs + [redeem_script.raw_serialize()])
+        tx.tx_ins[index].script_sig = script_sig
+
+    def take(self):
+        """Removes a random output from the pool"""
+        i = self.random.randrange(len(self.pool))
+        self.pool[i], self.pool[-1] = self.pool[-1], self.pool[i]
+        return self.pool.pop()
+
+    def split(self, total, count):
+        """count random positive amounts adding up to total"""
+        count = min(count, total)
+        cuts = sorted(self.random.sample(range(1, total), count - 1))
+        return [b - a for a, b in zip([0] + cuts, cuts + [total])]
+
+    def coinbase(self, fees):
+        script_sig = Script([int_to_little_endian(self.height, 4)])
+        outputs = [self.output(amount) for amount in self.split(REWARD + fees, self.txs_per_block)]
+        tx = Tx(1, [TxIn(b'\x00' * 32, 0xffffffff, script_sig)], [tx_out for tx_out, _ in outputs], 0, self.testnet)
+        return tx, outputs
+
+    def transaction(self):
+        spent = [self.take() for _ in range(min(self.random.randint(1, self.max_inputs), len(self.pool)))]
+        total = sum(amount for _, _, amount, _ in spent)
+        fee = min(self.random.randrange(1000, 20000), total // 2)
+        outputs = [self.output(amount) for amount in self.split(total - fee, self.random.randint(1, self.max_outputs))]
+        tx_ins = [TxIn(prev_tx, prev_index) for prev_tx, prev_index, _, _ in spent]
+        tx = Tx(1, tx_ins, [tx_out for tx_out, _ in outputs], 0, self.testnet)
+        for index, (_, _, _, spend) in enumerate(spent):
+            self.sign_input(tx, index, spend)
+        return tx, fee, outputs
+
+    def block(self):
+        """The next block, spending outputs of the blocks before it"""
+        txs = []
+        created = []
+        fees = 0
+        while len(txs) < self.txs_per_block - 1 and self.pool:
+            tx, fee, outputs = self.transaction()
+            txs.append(tx)
+            created.append((tx, outputs))
+            fees += fee
+        coinbase, outputs = self.coinbase(fees)
+        txs.insert(0, coinbase)
+        created.insert(0, (coinbase, outputs))
+        if self.utxos is not None:
+            for tx in txs:
+                self.utxos.apply_tx(tx)
+        for tx, outputs in created:
+            tx_hash = tx.hash()
+            for index, (tx_out, spend) in enumerate(outputs):
+                self.pool.append((tx_hash, index, tx_out.amount, spend))
+
+        root = merkle_root([tx.hash()[::-1] for tx in txs])[::-1]
+        nonce = int_to_little_endian(self.random.getrandbits(32), 4)
+        header = BlockHeader(1, self.prev_block, root, 1231006505 + 600 * self.height, bytes.fromhex('ffff001d'), nonce)
+        self.prev_block = header.hash()
+        self.height += 1
+        return Block(header, txs)
+
+    def blocks(self, count):
+        for _ in range(count):
+            yield self.block()
+
+    def write(self, directory, blocks, max_file_size=128 * 1024 * 1024):
+        """
+        Writes blocks as blk*.dat files in directory, starting a new file past max_file_size
+        Returns the paths written, readable with read_blk_file
+        """
+        magic = TESTNET_NETWORK_MAGIC if self.testnet else NETWORK_MAGIC
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        f = None
+        try:
+            for block in self.blocks(blocks):
+                raw = block.serialize()
+                if f is None or f.tell() + len(raw) + 8 > max_file_size:
+                    if f is not None:
+                        f.close()
+                    paths.append(os.path.join(directory, 'blk{:05d}.dat'.format(len(paths))))
+                    f = open(paths[-1], 'wb')
+                f.write(magic + int_to_little_endian(len(raw), 4) + raw)
+        finally:
+            if f is not None:
+                f.close()
+        return paths
@@ -2,12 +2,15 @@ import hashlib
 import hmac
 from io import BytesIO
 
+from pybtc import arithmetic
 from pybtc.constants import *
 from pybtc.helper import hash160, big_endian_to_int
 from pybtc.base58 import encode_base58_checksum
 
 
 class FieldElement:
+    __slots__ = ('num', 'prime')
+
     def __init__(self, num, prime):
         if num >= prime or prime < 0:
             error = 'Num {} not in field range 0 to {}'.format(
@@ -46,12 +49,12 @@ class FieldElement:
         if self.prime != other.prime:
             raise TypeError('Cannot multiply two numbers in different Fields')
 
-        result = (self.num * other.num) % self.prime
+        result = arithmetic.backend.mul_mod(self.num, other.num, self.prime)
         return self.__class__(result, self.prime)
 
     def __pow__(self, exponent):
         n = exponent % (self.prime - 1)
-        num = pow(self.num, n, self.prime)
+        num = arithmetic.backend.pow_mod(self.num, n, self.prime)
 
         return self.__class__(num, self.prime)
 
@@ -62,15 +65,18 @@ class FieldElement:
         if self.prime != other.prime:
             raise TypeError('Cannot divide two numbers in different Fields')
 
-        result = self.num * pow(other.num, self.prime - 2, self.prime) % self.prime
+        backend = arithmetic.backend
+        result = backend.mul_mod(self.num, backend.inverse(other.num, self.prime), self.prime)
         return self.__class__(result, self.prime)
 
     def __rmul__(self, coefficient):
-        result = (self.num * coefficient) % self.prime
+        result = arithmetic.backend.mul_mod(self.num, coefficient, self.prime)
         return self.__class__(result, self.prime)
 
 
 class Point:
+    __slots__ = ('x', 'y', 'a', 'b')
+
     def __init__(self, x, y, a, b):
         self.a = a
         self.b = b
@@ -135,6 +141,8 @@ class Point:
 
 
 class S256Field(FieldElement):
+    __slots__ = ()
+
     def __init__(self, num, prime=None):
         super().__init__(num, P)
 
@@ -142,12 +150,19 @@ class S256Field(FieldElement):
         return '{:x}'.format(self.num).zfill(64)
 
     def sqrt(self):
-        return self ** ((P + 1) // 4)
+        return self.__class__(arithmetic.backend.sqrt_mod(self.num, P))
+
+
+# the curve constants, shared by every S256Point
+S256_A = S256Field(A)
+S256_B = S256Field(B)
 
 
 class S256Point(Point):
+    __slots__ = ()
+
     def __init__(self, x, y, a=None, b=None):
-        a, b = S256Field(A), S256Field(B)
+        a, b = S256_A, S256_B
         if type(x) is int:
             super().__init__(S256Field(x), S256Field(y), a, b)
         else:
@@ -158,8 +173,10 @@ class S256Point(Point):
         return super().__rmul__(aux_coefficient)
 
     def verify(self, z, sig):
+        if sig.s % N == 0:
+            return False
         g = S256Point(Gx, Gy)
-        s_inv = pow(sig.s, N - 2, N)
+        s_inv = arithmetic.backend.inverse(sig.s, N)
         u = z * s_inv % N
         v = sig.r * s_inv % N
         total = u * g + v * self
@@ -209,6 +226,8 @@ class S256Point(Point):
 
 
 class Signature:
+    __slots__ = ('r', 's')
+
     def __init__(self, r, s):
         self.r = r
         self.s = s
@@ -275,7 +294,7 @@ class PrivateKey:
     def sign(self, z):
         k = self.deterministic_k(z)
         r = (k * self.G).x.num
-        k_inv = pow(k, N - 2, N)
+        k_inv = arithmetic.backend.inverse(k, N)
         s = (z + r * self.secret) * k_inv % N
         if s > N / 2:
             s = N - s
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pybtc.transaction import TxFetcher
+
+
+def compute_fees(txs, testnet=False, fetcher=TxFetcher, utxos=None, concurrency=16):
+    """
+    Returns (fee, feerate) for every transaction, feerate in satoshi per vbyte
+    Every parent is resolved once: transactions of txs first, then utxos if
+    given, otherwise fetcher with up to concurrency downloads at a time
+    Coinbase transactions get (None, None)
+    """
+    in_block = {tx.hash(): tx for tx in txs}
+
+    missing = set()
+    for tx in txs:
+        if tx.is_coinbase():
+            continue
+        for tx_in in tx.tx_ins:
+            if tx_in.prev_tx not in in_block:
+                missing.add(tx_in.prev_tx)
+
+    parents = dict(in_block)
+    if utxos is None and missing:
+        missing = list(missing)
+        with ThreadPoolExecutor(concurrency) as executor:
+            fetched = executor.map(lambda prev_tx: fetcher.fetch(prev_tx.hex(), testnet), missing)
+            for prev_tx, parent in zip(missing, fetched):
+                parents[prev_tx] = parent
+
+    results = []
+    for tx in txs:
+        if tx.is_coinbase():
+            results.append((None, None))
+            continue
+
+        fee = 0
+        for tx_in in tx.tx_ins:
+            parent = parents.get(tx_in.prev_tx)
+            if parent is not None:
+                fee += parent.tx_outs[tx_in.prev_index].amount
+            else:
+                fee += utxos.amount(tx_in.prev_tx, tx_in.prev_index)
+
+        for tx_out in tx.tx_outs:
+            fee -= tx_out.amount
+
+        results.append((fee, fee / tx.vsize()))
+    return results
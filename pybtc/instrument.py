@@ -0,0 +1,157 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from pybtc import helper
+from pybtc.ecc import FieldElement, Point, S256Field, Signature
+
+
+def point_operation(point, other):
+    """Which case of Point.__add__ adding other to point takes"""
+    if point.x is None or other.x is None:
+        return 'point_infinity'
+    if point.x != other.x:
+        return 'point_add'
+    if point.y == other.y and point.y != 0 * point.x:
+        return 'point_double'
+    return 'point_infinity'
+
+
+# the counters inside a with block, replaced rather than changed so the
+# wrappers can read it without the lock
+ACTIVE = ()
+# guards ACTIVE and PATCHES, the patches are installed while a counter is active
+LOCK = threading.Lock()
+PATCHES = []
+
+
+def record(key, elapsed):
+    for counters in ACTIVE:
+        counters.record(key, elapsed)
+
+
+def wrap(function, key):
+    keyed = type(key) is str
+
+    def wrapper(*args):
+        active = ACTIVE
+        if not active:
+            return function(*args)
+        if not any(counters.timers for counters in active):
+            record(key if keyed else key(*args), None)
+            return function(*args)
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            record(key if keyed else key(*args), elapsed)
+    return wrapper
+
+
+def patch(owner, name, key):
+    original = owner.__dict__[name]
+    wrapper = wrap(original, key)
+    PATCHES.append((owner, name, original, wrapper))
+    setattr(owner, name, wrapper)
+
+
+def patch_classmethod(owner, name, key):
+    original = owner.__dict__[name]
+    wrapper = classmethod(wrap(original.__func__, key))
+    PATCHES.append((owner, name, original, wrapper))
+    setattr(owner, name, wrapper)
+
+
+def patch_function(name):
+    # modules bind helper functions by name on import, each binding is replaced
+    original = getattr(helper, name)
+    wrapper = wrap(original, name)
+    PATCHES.append((None, name, original, wrapper))
+    for module in list(sys.modules.values()):
+        if module is not None and vars(module).get(name) is original:
+            setattr(module, name, wrapper)
+
+
+def install():
+    patch(FieldElement, '__truediv__', 'field_inversion')
+    patch(Point, '__add__', point_operation)
+    patch(S256Field, 'sqrt', 'sqrt')
+    patch_classmethod(Signature, 'parse', 'signature_parse')
+    for name in ('hash256', 'hash160'):
+        patch_function(name)
+
+
+def uninstall():
+    while PATCHES:
+        owner, name, original, wrapper = PATCHES.pop()
+        if owner is not None:
+            setattr(owner, name, original)
+            continue
+        # modules imported while counting bound the wrapper, they are restored too
+        for module in list(sys.modules.values()):
+            if module is not None and vars(module).get(name) is wrapper:
+                setattr(module, name, original)
+
+
+class CryptoCounters:
+    """
+    Counts, and with timers=True times, the primitives the elliptic curve and
+    hashing code spends its time in: field inversions, point additions and
+    doublings, square roots, hash256, hash160 and signature parsing
+    The primitives are wrapped while any counter is inside its with block and
+    restored when the last one exits, nothing is left behind to slow down the
+    code when no counter is active
+    Every active counter sees the calls of every thread, whichever order the
+    counters exit in; the times of nested primitives (a point addition and its
+    inversion) overlap
+
+        with CryptoCounters() as counters:
+            point.verify(z, sig)
+        print(counters.report())
+    """
+
+    def __init__(self, timers=False):
+        self.timers = timers
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.times = defaultdict(float)
+
+    def __enter__(self):
+        global ACTIVE
+        with LOCK:
+            if not ACTIVE:
+                install()
+            ACTIVE = ACTIVE + (self,)
+        return self
+
+    def __exit__(self, *exc):
+        global ACTIVE
+        with LOCK:
+            ACTIVE = tuple(counters for counters in ACTIVE if counters is not self)
+            if not ACTIVE:
+                uninstall()
+
+    def record(self, key, elapsed):
+        with self.lock:
+            self.counts[key] += 1
+            if elapsed is not None and self.timers:
+                self.times[key] += elapsed
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.times.clear()
+
+    def report(self):
+        with self.lock:
+            lines = ['{:<18} {:>10} {:>12} {:>10}'.format('operation', 'count', 'total ms', 'mean us')]
+            for key, count in self.counts.most_common():
+                seconds = self.times.get(key)
+                if seconds is None:
+                    lines.append('{:<18} {:>10}'.format(key, count))
+                else:
+                    lines.append('{:<18} {:>10} {:>12.3f} {:>10.2f}'.format(
+                        key, count, seconds * 1e3, seconds / count * 1e6))
+        return '\n'.join(lines)
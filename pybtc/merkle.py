@@ -0,0 +1,175 @@
+from bisect import bisect_left
+
+from pybtc.helper import hash256
+
+
+def merkle_parent(hash1, hash2):
+    """Takes the binary hashes and calculates the hash256"""
+    return hash256(hash1 + hash2)
+
+
+def merkle_parent_level(level):
+    """
+    Takes a level as one bytes object of concatenated 32 byte hashes
+    and returns the level above it in the same layout
+    """
+    if len(level) % 64:
+        # an odd level pairs its last hash with itself
+        level = level + level[-32:]
+    view = memoryview(level)
+    return b''.join([hash256(view[i:i + 64]) for i in range(0, len(level), 64)])
+
+
+def merkle_root(hashes):
+    """Takes a list of binary hashes (internal byte order) and returns the root"""
+    if not hashes:
+        raise ValueError('Cannot compute the merkle root of no hashes')
+    level = b''.join(hashes)
+    while len(level) > 32:
+        level = merkle_parent_level(level)
+    return level
+
+
+def tree_width(total, height):
+    """Number of nodes at height for a tree of total leaves"""
+    return (total + (1 << height) - 1) >> height
+
+
+def verify_branch(leaf, index, branch, root):
+    """Checks a merkle branch of sibling hashes from the leaf at index up to root"""
+    current = leaf
+    for sibling in branch:
+        if index & 1:
+            current = merkle_parent(sibling, current)
+        else:
+            current = merkle_parent(current, sibling)
+        index >>= 1
+    return current == root
+
+
+class MerkleTree:
+    """
+    Every level of a merkle tree, computed once so that branches and
+    partial trees for many leaves share the same hashing work
+    levels[0] holds the leaves, levels[-1] the root
+    """
+
+    def __init__(self, hashes):
+        if not hashes:
+            raise ValueError('Cannot build a merkle tree of no hashes')
+        self.total = len(hashes)
+        level = b''.join(hashes)
+        self.levels = [level]
+        while len(level) > 32:
+            level = merkle_parent_level(level)
+            self.levels.append(level)
+
+    def __repr__(self):
+        return 'MerkleTree({} leaves, root {})'.format(self.total, self.root()[::-1].hex())
+
+    def root(self):
+        return self.levels[-1]
+
+    def node(self, height, index):
+        level = self.levels[height]
+        return level[index * 32:index * 32 + 32]
+
+    def branch(self, index):
+        """Returns the sibling hashes from the leaf at index up to the root"""
+        if not 0 <= index < self.total:
+            raise IndexError('Leaf {} not in tree of {}'.format(index, self.total))
+        result = []
+        for height in range(len(self.levels) - 1):
+            sibling = index ^ 1
+            if sibling >= tree_width(self.total, height):
+                sibling = index
+            result.append(self.node(height, sibling))
+            index >>= 1
+        return result
+
+    def partial(self, indexes):
+        """
+        Builds the BIP37 partial merkle tree matching the leaves at indexes
+        Returns (hashes, flags) with flags packed as in a merkleblock message
+        """
+        matched = sorted(set(indexes))
+        hashes = []
+        bits = []
+
+        def contains_match(height, pos):
+            first = pos << height
+            i = bisect_left(matched, first)
+            return i < len(matched) and matched[i] < min((pos + 1) << height, self.total)
+
+        def build(height, pos):
+            parent_of_match = contains_match(height, pos)
+            bits.append(parent_of_match)
+            if height == 0 or not parent_of_match:
+                hashes.append(self.node(height, pos))
+            else:
+                build(height - 1, pos * 2)
+                if pos * 2 + 1 < tree_width(self.total, height - 1):
+                    build(height - 1, pos * 2 + 1)
+
+        build(len(self.levels) - 1, 0)
+
+        flags = bytearray((len(bits) + 7) // 8)
+        for i, bit in enumerate(bits):
+            if bit:
+                flags[i // 8] |= 1 << (i % 8)
+        return hashes, bytes(flags)
+
+
+def partial_merkle_root(total, hashes, flags):
+    """
+    Walks a BIP37 partial merkle tree of total leaves (hashes in internal byte order)
+    Returns (root, matched) where matched are the leaf hashes flagged as matches
+    """
+    if total == 0:
+        raise SyntaxError('Partial merkle tree with no transactions')
+    if len(hashes) > total:
+        raise SyntaxError('More hashes than transactions')
+    if len(flags) * 8 < len(hashes):
+        raise SyntaxError('Not enough flag bits')
+
+    height = 0
+    while tree_width(total, height) > 1:
+        height += 1
+
+    matched = []
+    # positions of the next flag bit and the next hash to consume
+    position = [0, 0]
+
+    def traverse(height, pos):
+        bit_index, hash_index = position
+        if bit_index >= len(flags) * 8:
+            raise SyntaxError('Ran out of flag bits')
+        flag = flags[bit_index // 8] >> (bit_index % 8) & 1
+        position[0] += 1
+
+        if height == 0 or not flag:
+            if hash_index >= len(hashes):
+                raise SyntaxError('Ran out of hashes')
+            position[1] += 1
+            if height == 0 and flag:
+                matched.append(hashes[hash_index])
+            return hashes[hash_index]
+
+        left = traverse(height - 1, pos * 2)
+        if pos * 2 + 1 < tree_width(total, height - 1):
+            right = traverse(height - 1, pos * 2 + 1)
+            if right == left:
+                # identical siblings would let a forged tree collide (CVE-2012-2459)
+                raise SyntaxError('Duplicate hashes in partial merkle tree')
+        else:
+            right = left
+        return merkle_parent(left, right)
+
+    root = traverse(height, 0)
+
+    bit_index, hash_index = position
+    if hash_index != len(hashes):
+        raise SyntaxError('Unused hashes in partial merkle tree')
+    if (bit_index + 7) // 8 != len(flags):
+        raise SyntaxError('Unused flag bytes in partial merkle tree')
+    return root, matched
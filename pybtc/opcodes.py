@@ -1,6 +1,7 @@
 import hashlib
 from ripemd import ripemd160
 
+from pybtc.constants import MAX_PUBKEYS_PER_MULTISIG, MAX_SCRIPT_ELEMENT_SIZE
 from pybtc.helper import hash256, hash160
 from pybtc.ecc import S256Point, Signature
 
@@ -50,93 +51,120 @@ def decode_num(element):
     return result
 
 
+# Stack items are bytes, or ints for the numbers opcodes push, encoded only
+# when their bytes are needed. decode_num(encode_num(n)) == n so a number
+# behaves the same whichever form it is in.
+SMALL_NUM_ENCODINGS = {n: encode_num(n) for n in range(-1, 17)}
+SMALL_NUM_DECODINGS = {encoding: n for n, encoding in SMALL_NUM_ENCODINGS.items()}
+
+
+def as_num(element):
+    """Number value of a stack item"""
+    if type(element) is int:
+        return element
+    n = SMALL_NUM_DECODINGS.get(element)
+    if n is None:
+        return decode_num(element)
+    return n
+
+
+def as_bytes(element):
+    """Bytes of a stack item"""
+    if type(element) is int:
+        encoding = SMALL_NUM_ENCODINGS.get(element)
+        if encoding is None:
+            return encode_num(element)
+        return encoding
+    return element
+
+
 def op_0(stack):
-    stack.append(encode_num(0))
+    stack.append(0)
     return True
 
 
 def op_1negate(stack):
-    stack.append(encode_num(-1))
+    stack.append(-1)
     return True
 
 
 def op_1(stack):
-    stack.append(encode_num(1))
+    stack.append(1)
     return True
 
 
 def op_2(stack):
-    stack.append(encode_num(2))
+    stack.append(2)
     return True
 
 
 def op_3(stack):
-    stack.append(encode_num(3))
+    stack.append(3)
     return True
 
 
 def op_4(stack):
-    stack.append(encode_num(4))
+    stack.append(4)
     return True
 
 
 def op_5(stack):
-    stack.append(encode_num(5))
+    stack.append(5)
     return True
 
 
 def op_6(stack):
-    stack.append(encode_num(6))
+    stack.append(6)
     return True
 
 
 def op_7(stack):
-    stack.append(encode_num(7))
+    stack.append(7)
     return True
 
 
 def op_8(stack):
-    stack.append(encode_num(8))
+    stack.append(8)
     return True
 
 
 def op_9(stack):
-    stack.append(encode_num(9))
+    stack.append(9)
     return True
 
 
 def op_10(stack):
-    stack.append(encode_num(10))
+    stack.append(10)
     return True
 
 
 def op_11(stack):
-    stack.append(encode_num(11))
+    stack.append(11)
     return True
 
 
 def op_12(stack):
-    stack.append(encode_num(12))
+    stack.append(12)
     return True
 
 
 def op_13(stack):
-    stack.append(encode_num(13))
+    stack.append(13)
     return True
 
 
 def op_14(stack):
-    stack.append(encode_num(14))
+    stack.append(14)
     return True
 
 
 def op_15(stack):
-    stack.append(encode_num(15))
+    stack.append(15)
     return True
 
 
 def op_16(stack):
-    stack.append(encode_num(16))
+    stack.append(16)
     return True
 
 
@@ -144,12 +172,80 @@ def op_nop(stack):
     return True
 
 
+class ConditionStack:
+    """
+    Tracks the OP_IF nesting in O(1) per opcode: only the depth and the depth
+    of the first false branch are kept, not one entry per branch
+    """
+
+    def __init__(self):
+        self.size = 0
+        # depth of the outermost false branch, -1 while every branch is true
+        self.first_false = -1
+
+    def empty(self):
+        return self.size == 0
+
+    def all_true(self):
+        return self.first_false == -1
+
+    def push(self, value):
+        if self.first_false == -1 and not value:
+            self.first_false = self.size
+        self.size += 1
+
+    def pop(self):
+        self.size -= 1
+        if self.first_false == self.size:
+            self.first_false = -1
+
+    def toggle(self):
+        if self.first_false == -1:
+            self.first_false = self.size - 1
+        elif self.first_false == self.size - 1:
+            self.first_false = -1
+
+
+def op_if(stack, conditions):
+    value = False
+    if conditions.all_true():
+        if len(stack) == 0:
+            return False
+        value = as_num(stack.pop()) != 0
+    conditions.push(value)
+    return True
+
+
+def op_notif(stack, conditions):
+    value = False
+    if conditions.all_true():
+        if len(stack) == 0:
+            return False
+        value = as_num(stack.pop()) == 0
+    conditions.push(value)
+    return True
+
+
+def op_else(stack, conditions):
+    if conditions.empty():
+        return False
+    conditions.toggle()
+    return True
+
+
+def op_endif(stack, conditions):
+    if conditions.empty():
+        return False
+    conditions.pop()
+    return True
+
+
 def op_verify(stack):
     if len(stack) == 0:
         return False
 
     element = stack.pop()
-    if decode_num(element) == 0:
+    if as_num(element) == 0:
         return False
     return True
 
@@ -179,13 +275,13 @@ def op_ifdup(stack):
         return False
 
     top_of_stack = stack[-1]
-    if decode_num(top_of_stack) != 0:
+    if as_num(top_of_stack) != 0:
         stack.append(top_of_stack)
     return True
 
 
 def op_depth(stack):
-    stack.append(encode_num(len(stack)))
+    stack.append(len(stack))
     return True
 
 
@@ -228,11 +324,12 @@ def op_pick(stack):
     if len(stack) == 0:
         return False
 
-    n = decode_num(stack.pop())
-    if len(stack) < n + 1:
+    n = as_num(stack.pop())
+    if n < 0 or len(stack) < n + 1:
         return False
 
-    nth_item = stack[n]
+    # n counts down from the top of the stack
+    nth_item = stack[-n - 1]
     stack.append(nth_item)
     return True
 
@@ -241,11 +338,11 @@ def op_roll(stack):
     if len(stack) == 0:
         return False
 
-    n = decode_num(stack.pop())
-    if len(stack) < n + 1:
+    n = as_num(stack.pop())
+    if n < 0 or len(stack) < n + 1:
         return False
 
-    nth_item = stack.pop(n)
+    nth_item = stack.pop(-n - 1)
     stack.append(nth_item)
     return True
 
@@ -361,8 +458,8 @@ def op_size(stack):
     if len(stack) == 0:
         return False
 
-    string = stack[-1]
-    stack.append(encode_num(len(string)))
+    string = as_bytes(stack[-1])
+    stack.append(len(string))
     return True
 
 
@@ -370,12 +467,12 @@ def op_equal(stack):
     if len(stack) < 2:
         return False
 
-    top = stack.pop()
-    second_to_top = stack.pop()
+    top = as_bytes(stack.pop())
+    second_to_top = as_bytes(stack.pop())
     if top == second_to_top:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -387,8 +484,8 @@ def op_1add(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
-    stack.append(encode_num(element + 1))
+    element = as_num(stack.pop())
+    stack.append(element + 1)
     return True
 
 
@@ -396,8 +493,8 @@ def op_1sub(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
-    stack.append(encode_num(element - 1))
+    element = as_num(stack.pop())
+    stack.append(element - 1)
     return True
 
 
@@ -405,8 +502,8 @@ def op_negate(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
-    stack.append(encode_num(element * -1))
+    element = as_num(stack.pop())
+    stack.append(element * -1)
     return True
 
 
@@ -414,8 +511,8 @@ def op_abs(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
-    stack.append(encode_num(abs(element)))
+    element = as_num(stack.pop())
+    stack.append(abs(element))
     return True
 
 
@@ -423,11 +520,11 @@ def op_not(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
+    element = as_num(stack.pop())
     if element == 0:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -435,11 +532,11 @@ def op_0notequal(stack):
     if len(stack) == 0:
         return False
 
-    element = decode_num(stack.pop())
+    element = as_num(stack.pop())
     if element == 0:
-        stack.append(encode_num(0))
+        stack.append(0)
     else:
-        stack.append(encode_num(1))
+        stack.append(1)
     return True
 
 
@@ -447,9 +544,9 @@ def op_add(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
-    stack.append(encode_num(element1 + element2))
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
+    stack.append(element1 + element2)
     return True
 
 
@@ -457,9 +554,9 @@ def op_sub(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
-    stack.append(encode_num(element1 - element2))
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
+    stack.append(element1 - element2)
     return True
 
 
@@ -467,9 +564,13 @@ def op_mul(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
-    stack.append(encode_num(element1 * element2))
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
+    product = element1 * element2
+    if product.bit_length() >= MAX_SCRIPT_ELEMENT_SIZE * 8:
+        # repeated squaring would otherwise grow the number exponentially
+        return False
+    stack.append(product)
     return True
 
 
@@ -477,12 +578,12 @@ def op_booland(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element1 != 0 and element2 == 0:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -490,12 +591,12 @@ def op_boolor(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element1 != 0 or element2 != 0:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -503,12 +604,12 @@ def op_numequal(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element1 == element2:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -520,12 +621,12 @@ def op_numnotequal(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element1 != element2:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -533,12 +634,12 @@ def op_lessthan(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 < element1:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -546,12 +647,12 @@ def op_greaterthan(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 > element1:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -559,12 +660,12 @@ def op_lessthanorequal(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 <= element1:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -572,12 +673,12 @@ def op_greaterthanorequal(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 >= element1:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -585,12 +686,12 @@ def op_min(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 < element1:
-        stack.append(encode_num(element2))
+        stack.append(element2)
     else:
-        stack.append(encode_num(element1))
+        stack.append(element1)
     return True
 
 
@@ -598,12 +699,12 @@ def op_max(stack):
     if len(stack) < 2:
         return False
 
-    element1 = decode_num(stack.pop())
-    element2 = decode_num(stack.pop())
+    element1 = as_num(stack.pop())
+    element2 = as_num(stack.pop())
     if element2 > element1:
-        stack.append(encode_num(element2))
+        stack.append(element2)
     else:
-        stack.append(encode_num(element1))
+        stack.append(element1)
     return True
 
 
@@ -611,13 +712,13 @@ def op_within(stack):
     if len(stack) < 3:
         return False
 
-    max_value = decode_num(stack.pop())
-    min_value = decode_num(stack.pop())
-    value = decode_num(stack.pop())
+    max_value = as_num(stack.pop())
+    min_value = as_num(stack.pop())
+    value = as_num(stack.pop())
     if min_value >= value > max_value:
-        stack.append(encode_num(1))
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -625,7 +726,7 @@ def op_ripemd160(stack):
     if len(stack) == 0:
         return False
 
-    element = stack.pop()
+    element = as_bytes(stack.pop())
     hashed_element = ripemd160.new(element).digest()
     stack.append(hashed_element)
     return True
@@ -635,7 +736,7 @@ def op_sha1(stack):
     if len(stack) == 0:
         return False
 
-    element = stack.pop()
+    element = as_bytes(stack.pop())
     hashed_element = hashlib.sha1(element).digest()
     stack.append(hashed_element)
     return True
@@ -645,7 +746,7 @@ def op_sha256(stack):
     if len(stack) == 0:
         return False
 
-    element = stack.pop()
+    element = as_bytes(stack.pop())
     hashed_element = hashlib.sha256(element).digest()
     stack.append(hashed_element)
     return True
@@ -654,7 +755,7 @@ def op_sha256(stack):
 def op_hash160(stack):
     if len(stack) == 0:
         return False
-    element = stack.pop()
+    element = as_bytes(stack.pop())
     stack.append(hash160(element))
     return True
 
@@ -662,21 +763,78 @@ def op_hash160(stack):
 def op_hash256(stack):
     if len(stack) == 0:
         return False
-    element = stack.pop()
+    element = as_bytes(stack.pop())
     stack.append(hash256(element))
     return True
 
 
+def parse_sig(sig_bin):
+    """Parses a DER signature, with or without its sighash byte"""
+    if len(sig_bin) > 1 and len(sig_bin) == sig_bin[1] + 3:
+        # transaction signatures carry a trailing sighash type byte
+        sig_bin = sig_bin[:-1]
+    return Signature.parse(sig_bin)
+
+
+def parse_point(sec):
+    """The public key of a SEC binary, None when it is malformed or off the curve"""
+    try:
+        return S256Point.parse(sec)
+    except (IndexError, ValueError):
+        return None
+
+
+def check_sig(sec, sig_bin, z):
+    """
+    Verifies a DER signature, with or without its sighash byte, against a SEC public key
+    A malformed signature or public key fails the check, it does not fail the script
+    """
+    point = parse_point(sec)
+    if point is None:
+        return False
+    try:
+        sig = parse_sig(sig_bin)
+    except SyntaxError:
+        return False
+    return point.verify(z, sig)
+
+
+def check_multisig(der_signatures, sec_pubkeys, z):
+    """
+    Matches the signatures to the public keys in one forward pass, both in
+    script order. Every signature and public key is parsed at most once and
+    at most one verification is made per public key
+    A malformed signature fails the check, a malformed public key matches no signature
+    """
+    m = len(der_signatures)
+    n = len(sec_pubkeys)
+    key_index = 0
+    for sig_index, sig_bin in enumerate(der_signatures):
+        try:
+            sig = parse_sig(sig_bin)
+        except SyntaxError:
+            return False
+        while True:
+            if n - key_index < m - sig_index:
+                # not enough public keys left for the remaining signatures
+                return False
+            point = parse_point(sec_pubkeys[key_index])
+            key_index += 1
+            if point is not None and point.verify(z, sig):
+                break
+    return True
+
+
 def op_checksig(stack, z):
     if len(stack) < 2:
         return False
 
-    pub_key = S256Point.parse(stack.pop())
-    sig = Signature.parse(stack.pop())
-    if pub_key.verify(z, sig):
-        stack.append(encode_num(1))
+    sec = as_bytes(stack.pop())
+    sig_bin = as_bytes(stack.pop())
+    if check_sig(sec, sig_bin, z):
+        stack.append(1)
     else:
-        stack.append(encode_num(0))
+        stack.append(0)
     return True
 
 
@@ -684,6 +842,37 @@ def op_checksigverify(stack, z):
     return op_checksig(stack, z) and op_verify(stack)
 
 
+def op_checkmultisig(stack, z):
+    if len(stack) == 0:
+        return False
+
+    n = as_num(stack.pop())
+    if n < 0 or n > MAX_PUBKEYS_PER_MULTISIG or len(stack) < n + 1:
+        return False
+    start = len(stack) - n
+    sec_pubkeys = [as_bytes(element) for element in stack[start:]]
+    del stack[start:]
+
+    m = as_num(stack.pop())
+    if m < 0 or m > n or len(stack) < m + 1:
+        return False
+    start = len(stack) - m
+    der_signatures = [as_bytes(element) for element in stack[start:]]
+    del stack[start:]
+
+    # the original implementation pops one element too many, keep that for consensus
+    stack.pop()
+    if check_multisig(der_signatures, sec_pubkeys, z):
+        stack.append(1)
+    else:
+        stack.append(0)
+    return True
+
+
+def op_checkmultisigverify(stack, z):
+    return op_checkmultisig(stack, z) and op_verify(stack)
+
+
 OP_CODE_FUNCTIONS = {
     0x00: op_0,
     0x4f: op_1negate,
@@ -704,6 +893,10 @@ OP_CODE_FUNCTIONS = {
     0x5f: op_15,
     0x60: op_16,
     0x61: op_nop,
+    0x63: op_if,
+    0x64: op_notif,
+    0x67: op_else,
+    0x68: op_endif,
     0x69: op_verify,
     0x6a: op_return,
     0x6b: op_toaltstack,
@@ -756,8 +949,34 @@ OP_CODE_FUNCTIONS = {
     0xaa: op_hash256,
     0xac: op_checksig,
     0xad: op_checksigverify,
+    0xae: op_checkmultisig,
+    0xaf: op_checkmultisigverify,
 }
 
+# calling conventions of the opcode functions
+STACK = 0  # operation(stack)
+ALT_STACK = 1  # operation(stack, alt_stack)
+SIGHASH = 2  # operation(stack, z)
+CONTROL = 3  # operation(stack, conditions), also run inside false branches
+
+OP_CODE_CONVENTIONS = {
+    0x63: CONTROL,
+    0x64: CONTROL,
+    0x67: CONTROL,
+    0x68: CONTROL,
+    0x6b: ALT_STACK,
+    0x6c: ALT_STACK,
+    0xac: SIGHASH,
+    0xad: SIGHASH,
+    0xae: SIGHASH,
+    0xaf: SIGHASH,
+}
+
+# (operation, convention) indexed by opcode, None for opcodes we do not support
+OP_CODE_TABLE = [None] * 256
+for op_code, operation in OP_CODE_FUNCTIONS.items():
+    OP_CODE_TABLE[op_code] = (operation, OP_CODE_CONVENTIONS.get(op_code, STACK))
+
 OP_CODE_NAMES = {
     0x00: 'OP_O',
     0x4f: 'OP_1NEGATE',
@@ -778,6 +997,10 @@ OP_CODE_NAMES = {
     0x5f: 'OP_15',
     0x60: 'OP_16',
     0x61: 'OP_NOP',
+    0x63: 'OP_IF',
+    0x64: 'OP_NOTIF',
+    0x67: 'OP_ELSE',
+    0x68: 'OP_ENDIF',
     0x69: 'OP_VERIFY',
     0x6a: 'OP_RETURN',
     0x6b: 'OP_TOALTSTACK',
@@ -829,4 +1052,7 @@ OP_CODE_NAMES = {
     0xa9: 'OP_HASH160',
     0xaa: 'OP_HASH256',
     0xac: 'OP_CHECKSIG',
+    0xad: 'OP_CHECKSIGVERIFY',
+    0xae: 'OP_CHECKMULTISIG',
+    0xaf: 'OP_CHECKMULTISIGVERIFY',
 }
@@ -0,0 +1,182 @@
+from pybtc.base58 import encode_base58_checksum
+from pybtc.bech32 import encode_segwit_address
+from pybtc.helper import hash256, little_endian_to_int
+
+P2PKH_PREFIX = b'\x00'
+P2SH_PREFIX = b'\x05'
+TESTNET_P2PKH_PREFIX = b'\x6f'
+TESTNET_P2SH_PREFIX = b'\xc4'
+
+WITNESS_VERSIONS = {'p2wpkh': 0, 'p2wsh': 0, 'p2tr': 1}
+
+
+def is_push_only(raw, offset):
+    """Whether raw[offset:] is a well formed run of data pushes and small integers"""
+    end = len(raw)
+    while offset < end:
+        op = raw[offset]
+        offset += 1
+        if op > 0x60:
+            return False
+        if 0 < op < 0x4c:
+            offset += op
+        elif op == 0x4c:
+            if offset + 1 > end:
+                return False
+            offset += 1 + raw[offset]
+        elif op == 0x4d:
+            if offset + 2 > end:
+                return False
+            offset += 2 + little_endian_to_int(raw[offset:offset + 2])
+        elif op == 0x4e:
+            if offset + 4 > end:
+                return False
+            offset += 4 + little_endian_to_int(raw[offset:offset + 4])
+    return offset == end
+
+
+def multisig_keys(raw):
+    """The keys of a bare m-of-n multisig scriptPubKey, None if raw is not one"""
+    m = raw[0] - 0x50
+    n = raw[-2] - 0x50
+    if not 1 <= m <= n <= 16:
+        return None
+    keys = []
+    offset = 1
+    end = len(raw) - 2
+    while offset < end:
+        size = raw[offset]
+        if size != 33 and size != 65:
+            return None
+        keys.append(raw[offset + 1:offset + 1 + size])
+        offset += 1 + size
+    if offset != end or len(keys) != n:
+        return None
+    return keys
+
+
+def classify_script_pubkey(raw):
+    """
+    Standard type of a raw scriptPubKey and what it pays to, without building a Script
+    Returns (type, payload) with the same types as Script.classify, the payload is the
+    hash, witness program or key, the list of keys of a multisig, the data after
+    OP_RETURN of a nulldata output and None for a nonstandard one
+    """
+    n = len(raw)
+    if n == 0:
+        return 'nonstandard', None
+    first = raw[0]
+    if n == 25 and first == 0x76 and raw[1] == 0xa9 and raw[2] == 20 and raw[23] == 0x88 and raw[24] == 0xac:
+        return 'p2pkh', raw[3:23]
+    if n == 23 and first == 0xa9 and raw[1] == 20 and raw[22] == 0x87:
+        return 'p2sh', raw[2:22]
+    if n == 22 and first == 0 and raw[1] == 20:
+        return 'p2wpkh', raw[2:]
+    if n == 34 and first == 0 and raw[1] == 32:
+        return 'p2wsh', raw[2:]
+    if n == 34 and first == 0x51 and raw[1] == 32:
+        return 'p2tr', raw[2:]
+    if first == 0x6a:
+        if is_push_only(raw, 1):
+            return 'nulldata', raw[1:]
+        return 'nonstandard', None
+    if (n == 35 or n == 67) and first == n - 2 and raw[-1] == 0xac:
+        return 'p2pk', raw[1:-1]
+    if raw[-1] == 0xae and n >= 37:
+        keys = multisig_keys(raw)
+        if keys is not None:
+            return 'multisig', keys
+    return 'nonstandard', None
+
+
+def payload_address(kind, payload, testnet=False):
+    """Address of a classified output, None for the types that have none"""
+    if kind == 'p2pkh':
+        return encode_base58_checksum((TESTNET_P2PKH_PREFIX if testnet else P2PKH_PREFIX) + payload)
+    if kind == 'p2sh':
+        return encode_base58_checksum((TESTNET_P2SH_PREFIX if testnet else P2SH_PREFIX) + payload)
+    version = WITNESS_VERSIONS.get(kind)
+    if version is not None:
+        return encode_segwit_address(version, payload, testnet)
+    return None
+
+
+def script_pubkey_address(raw, testnet=False):
+    """Address of a raw scriptPubKey, None if it has none"""
+    return payload_address(*classify_script_pubkey(raw), testnet)
+
+
+def varint_at(data, offset):
+    """Reads the varint at offset of data, returns it with the offset after it"""
+    i = data[offset]
+    if i < 0xfd:
+        return i, offset + 1
+    if i == 0xfd:
+        return little_endian_to_int(data[offset + 1:offset + 3]), offset + 3
+    if i == 0xfe:
+        return little_endian_to_int(data[offset + 1:offset + 5]), offset + 5
+    return little_endian_to_int(data[offset + 1:offset + 9]), offset + 9
+
+
+def block_outputs(raw):
+    """
+    Yields (tx_hash, index, amount, script_pubkey) for every output of a serialized block
+    The bytes are walked in place, no Tx, TxOut or Script objects are built
+    tx_hash is the binary hash of Tx.hash, script_pubkey the raw bytes
+    """
+    end = len(raw)
+    tx_qty, offset = varint_at(raw, 80)
+    for _ in range(tx_qty):
+        start = offset
+        offset += 4
+        segwit = raw[offset] == 0
+        if segwit:
+            # skip the marker and flag
+            offset += 2
+        body = offset
+        input_qty, offset = varint_at(raw, offset)
+        for _ in range(input_qty):
+            size, offset = varint_at(raw, offset + 36)
+            offset += size + 4
+        output_qty, offset = varint_at(raw, offset)
+        outputs = []
+        for index in range(output_qty):
+            amount = little_endian_to_int(raw[offset:offset + 8])
+            size, offset = varint_at(raw, offset + 8)
+            outputs.append((index, amount, raw[offset:offset + size]))
+            offset += size
+        body_end = offset
+        if segwit:
+            for _ in range(input_qty):
+                items, offset = varint_at(raw, offset)
+                for _ in range(items):
+                    size, offset = varint_at(raw, offset)
+                    offset += size
+        offset += 4
+        if offset > end:
+            raise SyntaxError('Truncated transaction at offset {}'.format(start))
+        if segwit:
+            tx_hash = hash256(raw[start:start + 4] + raw[body:body_end] + raw[offset - 4:offset])[::-1]
+        else:
+            tx_hash = hash256(raw[start:offset])[::-1]
+        for index, amount, script_pubkey in outputs:
+            yield tx_hash, index, amount, script_pubkey
+    if offset != end:
+        raise SyntaxError('Block size mismatch: {} bytes left'.format(end - offset))
+
+
+def classify_block_outputs(raw, testnet=False):
+    """
+    Classifies every output of a serialized block in one pass
+    Returns a list of (tx_hash, index, amount, type, address), address is None for
+    outputs without one. Outputs repeating a scriptPubKey reuse its classification
+    """
+    seen = {}
+    rows = []
+    for tx_hash, index, amount, script_pubkey in block_outputs(raw):
+        result = seen.get(script_pubkey)
+        if result is None:
+            kind, payload = classify_script_pubkey(script_pubkey)
+            result = seen[script_pubkey] = (kind, payload_address(kind, payload, testnet))
+        rows.append((tx_hash, index, amount, result[0], result[1]))
+    return rows
@@ -1,31 +1,66 @@
 import logging
+from time import perf_counter
 
+from pybtc.cache import LRUCache, object_size
+from pybtc.constants import MAX_OPS_PER_SCRIPT, MAX_PUBKEYS_PER_MULTISIG, MAX_SCRIPT_ELEMENT_SIZE, \
+    MAX_SCRIPT_SIZE, MAX_STACK_SIZE
 from pybtc.helper import read_varint, little_endian_to_int, int_to_little_endian, encode_varint
-from pybtc.opcodes import OP_CODE_FUNCTIONS, OP_CODE_NAMES
+from pybtc.outputs import classify_script_pubkey, script_pubkey_address
+from pybtc.opcodes import OP_CODE_TABLE, OP_CODE_NAMES, STACK, ALT_STACK, SIGHASH, CONTROL, ConditionStack, as_bytes, \
+    as_num
+from pybtc.templates import evaluate_template
 
 LOGGER = logging.getLogger(__name__)
 
+# reasons a script fails, as reported to tracers
+FAIL_SCRIPT_SIZE = 'script size'
+FAIL_PUSH_SIZE = 'push size'
+FAIL_OP_COUNT = 'op count'
+FAIL_STACK_SIZE = 'stack size'
+FAIL_BAD_OP = 'bad op'
+FAIL_UNBALANCED = 'unbalanced conditional'
+
+
+def fail(tracer, pc, reason, message):
+    """Logs why a script failed and reports it to the tracer, returns False"""
+    LOGGER.info(message)
+    if tracer is not None:
+        tracer.fail(pc, reason, message)
+    return False
+
 
 class Script:
+    __slots__ = ('cmds', 'raw', 'boundary')
+
+    # ScriptInterner shared by the parses that ask for it, None to parse every script
+    interner = None
+    # ScriptTracer called by every evaluation in this process, None for no tracing
+    tracer = None
+
     def __init__(self, cmds=None):
         if cmds is None:
             self.cmds = []
         else:
             self.cmds = cmds
+        self.raw = None
+        # index of the first script_pubkey command when built by adding a script_sig
+        self.boundary = None
 
     def raw_serialize(self):
+        if self.raw is not None:
+            return self.raw
         result = b''
         for cmd in self.cmds:
             if type(cmd) is int:
                 result += int_to_little_endian(cmd, 1)
             else:
                 length = len(cmd)
-                if length < 75:
+                if length <= 75:
                     result += int_to_little_endian(length, 1)
-                elif 75 < length < 0x100:
+                elif length < 0x100:
                     result += int_to_little_endian(76, 1)
                     result += int_to_little_endian(length, 1)
-                elif 0x100 < length < 520:
+                elif length <= 0xffff:
                     result += int_to_little_endian(77, 1)
                     result += int_to_little_endian(length, 2)
                 else:
@@ -39,65 +74,305 @@ class Script:
         return encode_varint(total) + result
 
     def __add__(self, other):
-        return Script(self.cmds + other.cmds)
+        script = Script([*self.cmds, *other.cmds])
+        script.boundary = len(self.cmds)
+        return script
+
+    def size_error(self):
+        """Why the script, or either part of a joined script, is over the size limit, None if it is not"""
+        cmds = self.cmds
+        if self.boundary is None:
+            if self.raw is not None:
+                parts = (self.raw,)
+            else:
+                parts = (cmds,)
+        else:
+            parts = (cmds[:self.boundary], cmds[self.boundary:])
+        for part in parts:
+            # every command takes at least a byte
+            size = len(part)
+            if type(part) is not bytes and size <= MAX_SCRIPT_SIZE:
+                for cmd in part:
+                    if type(cmd) is not int:
+                        size += push_size(cmd) - 1
+                        if size > MAX_SCRIPT_SIZE:
+                            break
+            if size > MAX_SCRIPT_SIZE:
+                return 'Script of over {} bytes'.format(MAX_SCRIPT_SIZE)
+        return None
+
+    def static_error(self):
+        """
+        Why the script fails whatever the stack and signature hash, found
+        without running it, or None. Besides size_error it finds oversized
+        pushes, too many opcodes, unbalanced conditionals and OP_RETURN or
+        unknown opcodes outside of any conditional
+        """
+        cmds = self.cmds
+        split = -1 if self.boundary is None else self.boundary
+        depth = 0
+        op_count = 0
+        for pc, cmd in enumerate(cmds):
+            if pc == split:
+                op_count = 0
+            if type(cmd) is not int:
+                if len(cmd) > MAX_SCRIPT_ELEMENT_SIZE:
+                    return 'Push of {} bytes at {} is over the {} byte limit'.format(
+                        len(cmd), pc, MAX_SCRIPT_ELEMENT_SIZE)
+                continue
+            if cmd <= 0x60:
+                continue
+            op_count += 1
+            if op_count > MAX_OPS_PER_SCRIPT:
+                return 'Over {} opcodes at {}'.format(MAX_OPS_PER_SCRIPT, pc)
+            if cmd == 0x63 or cmd == 0x64:
+                depth += 1
+            elif cmd == 0x67:
+                if depth == 0:
+                    return 'OP_ELSE outside of a conditional at {}'.format(pc)
+            elif cmd == 0x68:
+                if depth == 0:
+                    return 'OP_ENDIF outside of a conditional at {}'.format(pc)
+                depth -= 1
+            elif depth == 0 and (cmd == 0x6a or OP_CODE_TABLE[cmd] is None):
+                return '{} always fails at {}'.format(OP_CODE_NAMES.get(cmd, cmd), pc)
+        if depth != 0:
+            return 'Unbalanced conditional'
+        return None
+
+    def sigop_count(self, accurate=False):
+        """
+        Signature operations of the script. OP_CHECKMULTISIG counts 20 or, when
+        accurate, the number of keys given by the OP_1 to OP_16 before it
+        """
+        count = 0
+        previous = None
+        for cmd in self.cmds:
+            if type(cmd) is int:
+                if cmd == 0xac or cmd == 0xad:
+                    count += 1
+                elif cmd == 0xae or cmd == 0xaf:
+                    if accurate and type(previous) is int and 0x51 <= previous <= 0x60:
+                        count += previous - 0x50
+                    else:
+                        count += MAX_PUBKEYS_PER_MULTISIG
+            previous = cmd
+        return count
+
+    def is_push_only(self):
+        """Whether the script only pushes data, as a script_sig should"""
+        return all(type(cmd) is not int or cmd <= 0x60 for cmd in self.cmds)
+
+    def is_unspendable(self):
+        """Whether an output with this scriptPubKey can never be spent"""
+        return (len(self.cmds) > 0 and self.cmds[0] == 0x6a) or self.size_error() is not None
+
+    def classify(self):
+        """Standard type of the scriptPubKey: p2pk, p2pkh, p2sh, p2wpkh, p2wsh, p2tr, multisig, nulldata or nonstandard"""
+        return classify_script_pubkey(self.raw_serialize())[0]
+
+    def address(self, testnet=False):
+        """Address the scriptPubKey pays to, None if it has none"""
+        return script_pubkey_address(self.raw_serialize(), testnet)
+
+    def evaluate(self, z, tracer=None):
+        if tracer is None:
+            tracer = self.tracer
+        if tracer is not None:
+            return self.trace(z, tracer)
+        reason = self.size_error()
+        if reason is None:
+            result = evaluate_template(self.cmds, z)
+            if result is not None:
+                return result
+            # reject what cannot succeed before running any signature check
+            reason = self.static_error()
+        if reason is not None:
+            LOGGER.info(reason)
+            return False
+        return self.run(z)
+
+    def interpret(self, z, tracer=None):
+        """Runs the commands one opcode at a time, failing as soon as a limit is exceeded"""
+        reason = self.size_error()
+        if reason is not None:
+            return fail(tracer, None, FAIL_SCRIPT_SIZE, reason)
+        return self.run(z, tracer)
+
+    def trace(self, z, tracer):
+        """interpret with the tracer hooks called around every command"""
+        result = False
+        tracer.start(self, z)
+        try:
+            result = self.interpret(z, tracer)
+            return result
+        finally:
+            tracer.finish(self, result)
 
-    def evaluate(self, z):
-        cmds = self.cmds[:]
+    def run(self, z, tracer=None):
+        """
+        The interpreter loop, for scripts that passed size_error
+        With a tracer its step and done hooks are called around every command
+        """
+        cmds = self.cmds
         stack = []
         alt_stack = []
-        while len(cmds) > 0:
-            cmd = cmds.pop(0)
-            if type(cmd) is int:
-                operation = OP_CODE_FUNCTIONS[cmd]
-
-                if cmd in (99, 100):
-                    if not operation(stack, cmds):
-                        LOGGER.info('Bad OP: {}'.format(OP_CODE_NAMES[cmd]))
-                        return False
-                elif cmd in (107, 108):
-                    if not operation(stack, alt_stack):
-                        LOGGER.info('Bad OP: {}'.format(OP_CODE_NAMES[cmd]))
-                        return False
-                elif cmd in (172, 173, 174, 175):
-                    if not operation(stack, z):
-                        LOGGER.info('Bad OP: {}'.format(OP_CODE_NAMES[cmd]))
-                        return False
-                else:
-                    if not operation(stack):
-                        LOGGER.info('Bad OP: {}'.format(OP_CODE_NAMES[cmd]))
-                        return False
+        conditions = ConditionStack()
+        executing = True
+        op_count = 0
+        op_limit = MAX_OPS_PER_SCRIPT
+        element_limit = MAX_SCRIPT_ELEMENT_SIZE
+        # elements the stack can hold next to the alt stack
+        stack_limit = MAX_STACK_SIZE
+        start = 0
+        pc = 0
+        end = len(cmds)
+        # the opcode limit applies to the script_sig and script_pubkey separately
+        split = -1 if self.boundary is None else self.boundary
+        while pc < end:
+            if pc == split:
+                op_count = 0
+            cmd = cmds[pc]
+            if tracer is not None:
+                tracer.step(pc, cmd, stack, alt_stack)
+                start = perf_counter()
+            if type(cmd) is not int:
+                if len(cmd) > element_limit:
+                    return fail(tracer, pc, FAIL_PUSH_SIZE, 'Push of {} bytes at {} is over the {} byte limit'.format(
+                        len(cmd), pc, MAX_SCRIPT_ELEMENT_SIZE))
+                if executing:
+                    stack.append(cmd)
+                ok = True
             else:
-                stack.append(cmd)
+                if cmd > 0x60:
+                    op_count += 1
+                    if op_count > op_limit:
+                        return fail(tracer, pc, FAIL_OP_COUNT, 'Over {} opcodes at {}'.format(MAX_OPS_PER_SCRIPT, pc))
+                entry = OP_CODE_TABLE[cmd]
+                if entry is None:
+                    # unknown opcodes only fail when they run
+                    ok = not executing
+                elif not executing and entry[1] != CONTROL:
+                    ok = True
+                else:
+                    operation, convention = entry
+                    if convention == STACK:
+                        ok = operation(stack)
+                    elif convention == SIGHASH:
+                        if cmd >= 0xae:
+                            op_count += multisig_keys(stack)
+                            if op_count > op_limit:
+                                return fail(tracer, pc, FAIL_OP_COUNT,
+                                            'Over {} opcodes at {}'.format(MAX_OPS_PER_SCRIPT, pc))
+                        ok = operation(stack, z)
+                    elif convention == ALT_STACK:
+                        ok = operation(stack, alt_stack)
+                        stack_limit = MAX_STACK_SIZE - len(alt_stack)
+                    else:
+                        ok = operation(stack, conditions)
+                        executing = conditions.all_true()
+            if tracer is not None:
+                tracer.done(pc, cmd, perf_counter() - start, ok, stack, alt_stack)
+            if not ok:
+                return fail(tracer, pc, FAIL_BAD_OP, 'Bad OP: {}'.format(OP_CODE_NAMES.get(cmd, cmd)))
+            if len(stack) > stack_limit:
+                return fail(tracer, pc, FAIL_STACK_SIZE, 'Stack over {} elements at {}'.format(MAX_STACK_SIZE, pc))
+            pc += 1
 
-        if len(stack) == 0 or stack.pop() == b'':
-            return False
-        return True
+        if not conditions.empty():
+            return fail(tracer, None, FAIL_UNBALANCED, 'Unbalanced conditional')
+        return len(stack) > 0 and as_bytes(stack.pop()) != b''
 
     @classmethod
-    def parse(cls, s):
+    def parse(cls, s, intern=False):
         length = read_varint(s)
+        raw = s.read(length)
+        if len(raw) != length:
+            raise SyntaxError('Parsing script failed')
+        return cls.parse_raw(raw, intern)
+
+    @classmethod
+    def parse_raw(cls, raw, intern=False):
+        """Parses script bytes without their length prefix, sharing them through Script.interner if intern is set"""
+        if intern and cls.interner is not None:
+            return cls.interner.parse(raw)
+
         cmds = []
-        count = 0
-        while count < length:
-            current = s.read(1)
-            count += 1
-            current_byte = current[0]
+        length = len(raw)
+        minimal = True
+        i = 0
+        while i < length:
+            current_byte = raw[i]
+            i += 1
             if 1 <= current_byte <= 75:
-                n = current_byte
-                cmds.append(s.read(n))
-                count += n
+                cmds.append(raw[i:i + current_byte])
+                i += current_byte
             elif current_byte == 76:
-                data_length = little_endian_to_int(s.read(1))
-                cmds.append(s.read(data_length))
-                count += data_length + 1
+                data_length = little_endian_to_int(raw[i:i + 1])
+                cmds.append(raw[i + 1:i + 1 + data_length])
+                i += data_length + 1
+                minimal = minimal and data_length > 75
             elif current_byte == 77:
-                data_length = little_endian_to_int(s.read(2))
-                cmds.append(s.read(data_length))
-                count += data_length + 2
+                data_length = little_endian_to_int(raw[i:i + 2])
+                cmds.append(raw[i + 2:i + 2 + data_length])
+                i += data_length + 2
+                minimal = minimal and data_length >= 0x100
             else:
-                op_code = current_byte
-                cmds.append(op_code)
+                cmds.append(current_byte)
 
-        if count != length:
-            raise SyntaxError('Parsing script failed')
-        return cls(cmds)
+        script = cls(cmds)
+        if i != length or not minimal:
+            # coinbase and some non-standard scripts do not parse as pushes and
+            # opcodes, or push with a longer encoding than needed, keep their
+            # bytes so they serialize and classify unchanged
+            script.raw = raw
+        return script
+
+
+def push_size(data):
+    """Serialized size of a push of data"""
+    length = len(data)
+    if length <= 75:
+        return length + 1
+    if length < 0x100:
+        return length + 2
+    if length <= 0xffff:
+        return length + 3
+    return length + 5
+
+
+def multisig_keys(stack):
+    """Public keys an OP_CHECKMULTISIG on this stack counts towards the opcode limit"""
+    if len(stack) == 0:
+        return 0
+    n = as_num(stack[-1])
+    if 0 <= n <= MAX_PUBKEYS_PER_MULTISIG:
+        return n
+    return 0
+
+
+def script_size(script):
+    """Estimates the memory held by a parsed script"""
+    return object_size(script) + object_size(script.cmds) + sum(object_size(cmd) for cmd in script.cmds)
+
+
+class ScriptInterner(LRUCache):
+    """
+    Parsed scripts keyed by their raw bytes, so repeated scripts (the same
+    addresses, the same multisig templates) are parsed once and shared
+    Interned scripts must not be changed: cmds is a tuple and the raw bytes
+    are kept so serialize does no work
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        super().__init__(max_bytes, script_size)
+
+    def parse(self, raw):
+        script = self.get(raw)
+        if script is None:
+            script = Script.parse_raw(raw)
+            script.cmds = tuple(script.cmds)
+            script.raw = raw
+            # the key is the raw bytes the script already holds
+            self.put(raw, script, script_size(script) + object_size(raw))
+        return script
@@ -0,0 +1,112 @@
+"""
+Fast paths for the standard script templates
+
+Script.evaluate runs over the script_sig and script_pubkey commands joined
+together. When they follow one of the shapes below, the result is computed
+directly (a hash comparison and the signature checks) instead of going
+through the opcode functions. The results are those of the general
+interpreter, anything else returns None and falls back to it.
+"""
+from pybtc.constants import MAX_SCRIPT_ELEMENT_SIZE, MAX_STACK_SIZE
+from pybtc.helper import hash160
+from pybtc.opcodes import check_sig, check_multisig
+
+OP_0 = 0x00
+OP_DUP = 0x76
+OP_EQUAL = 0x87
+OP_EQUALVERIFY = 0x88
+OP_HASH160 = 0xa9
+OP_CHECKSIG = 0xac
+OP_CHECKMULTISIG = 0xae
+
+
+def is_push(cmd):
+    # longer pushes fail the element size limit, the interpreter reports them
+    return type(cmd) is not int and len(cmd) <= MAX_SCRIPT_ELEMENT_SIZE
+
+
+def small_int(cmd):
+    """Value of OP_1 to OP_16, None for anything else"""
+    if type(cmd) is int and 0x51 <= cmd <= 0x60:
+        return cmd - 0x50
+    return None
+
+
+def is_multisig(cmds):
+    # OP_0 <sig>... OP_m <sec>... OP_n OP_CHECKMULTISIG
+    n = small_int(cmds[-2])
+    if n is None or cmds[0] != OP_0 or len(cmds) < n + 5:
+        return False
+    m = small_int(cmds[-n - 3])
+    return m is not None and m <= n and len(cmds) == m + n + 4 \
+        and all(is_push(cmd) for cmd in cmds[1:m + 1]) and all(is_push(cmd) for cmd in cmds[-n - 2:-2])
+
+
+def match_template(cmds):
+    """Name of the template the joined commands follow, or None"""
+    n = len(cmds)
+    if n == 0:
+        return None
+    last = cmds[-1]
+    if last == OP_CHECKSIG:
+        # <sig> <sec> OP_CHECKSIG
+        if n == 3 and is_push(cmds[0]) and is_push(cmds[1]):
+            return 'p2pk'
+        # <sig> <sec> OP_DUP OP_HASH160 <hash> OP_EQUALVERIFY OP_CHECKSIG
+        if n == 7 and cmds[2] == OP_DUP and cmds[3] == OP_HASH160 and cmds[5] == OP_EQUALVERIFY \
+                and is_push(cmds[0]) and is_push(cmds[1]) and is_push(cmds[4]):
+            return 'p2pkh'
+    elif last == OP_CHECKMULTISIG:
+        if n >= 5 and is_multisig(cmds):
+            return 'multisig'
+    elif last == OP_EQUAL:
+        # <push>... <redeem script> OP_HASH160 <hash> OP_EQUAL
+        if 4 <= n <= MAX_STACK_SIZE and cmds[-3] == OP_HASH160 and is_push(cmds[-2]) and all(is_push(cmd) for cmd in cmds[:-3]):
+            return 'p2sh'
+    elif n == 2 and cmds[0] == OP_0 and is_push(last) and len(last) == 20:
+        # OP_0 <20 byte hash>
+        return 'p2wpkh'
+    return None
+
+
+def verify_p2pk(cmds, z):
+    return check_sig(cmds[1], cmds[0], z)
+
+
+def verify_p2pkh(cmds, z):
+    if hash160(cmds[1]) != cmds[4]:
+        return False
+    return check_sig(cmds[1], cmds[0], z)
+
+
+def verify_multisig(cmds, z):
+    n = small_int(cmds[-2])
+    m = small_int(cmds[-n - 3])
+    return check_multisig(cmds[1:m + 1], cmds[-n - 2:-2], z)
+
+
+def verify_p2sh(cmds, z):
+    # like the general interpreter, only the hash of the redeem script is checked
+    return hash160(cmds[-4]) == cmds[-2]
+
+
+def verify_p2wpkh(cmds, z):
+    # witness programs are not interpreted, the pushed hash is left on top of the stack
+    return True
+
+
+TEMPLATE_VERIFIERS = {
+    'p2pk': verify_p2pk,
+    'p2pkh': verify_p2pkh,
+    'multisig': verify_multisig,
+    'p2sh': verify_p2sh,
+    'p2wpkh': verify_p2wpkh,
+}
+
+
+def evaluate_template(cmds, z):
+    """True or False for a standard template, None when the general interpreter is needed"""
+    name = match_template(cmds)
+    if name is None:
+        return None
+    return TEMPLATE_VERIFIERS[name](cmds, z)
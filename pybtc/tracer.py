@@ -0,0 +1,121 @@
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+
+from pybtc.opcodes import OP_CODE_NAMES
+
+# key the profiler uses for data pushes
+PUSH = 'PUSH'
+
+SIGNATURE_OPS = (0xac, 0xad, 0xae, 0xaf)
+
+
+def op_name(key):
+    if key == PUSH:
+        return PUSH
+    return OP_CODE_NAMES.get(key, hex(key))
+
+
+class ScriptTracer:
+    """
+    Hooks of the script interpreter, pass one to Script.evaluate or set Script.tracer
+    Traced scripts always run through the general interpreter, one command at a time
+    Every method does nothing, subclasses override the ones they need
+    """
+
+    def start(self, script, z):
+        """Called before the first command"""
+
+    def step(self, pc, cmd, stack, alt_stack):
+        """Called before the command at pc runs"""
+
+    def done(self, pc, cmd, elapsed, ok, stack, alt_stack):
+        """Called after the command at pc ran for elapsed seconds, ok is False when it failed"""
+
+    def fail(self, pc, reason, message):
+        """
+        Called when the script fails, reason is one of the FAIL_ constants of
+        pybtc.script, pc is None when the failure is not at one command
+        """
+
+    def finish(self, script, result):
+        """Called with the result of the evaluation, also when an opcode raised"""
+
+
+class ScriptProfiler(ScriptTracer):
+    """
+    Per-opcode counts and cumulative time, stack depth high-water mark,
+    signature checks and the slowest scripts seen
+    Safe to share between threads
+    """
+
+    def __init__(self, slowest=10):
+        self.lock = threading.Lock()
+        self.run = threading.local()
+        self.counts = Counter()
+        self.times = defaultdict(float)
+        self.scripts = 0
+        self.failures = 0
+        self.failure_reasons = Counter()
+        self.sig_checks = 0
+        self.max_depth = 0
+        self.keep = slowest
+        # min-heap of (elapsed, order, script) keeping the slowest scripts
+        self.slowest = []
+
+    def start(self, script, z):
+        run = self.run
+        run.counts = Counter()
+        run.times = defaultdict(float)
+        run.max_depth = 0
+        run.started = time.perf_counter()
+
+    def done(self, pc, cmd, elapsed, ok, stack, alt_stack):
+        run = self.run
+        key = cmd if type(cmd) is int else PUSH
+        run.counts[key] += 1
+        run.times[key] += elapsed
+        depth = len(stack) + len(alt_stack)
+        if depth > run.max_depth:
+            run.max_depth = depth
+
+    def fail(self, pc, reason, message):
+        with self.lock:
+            self.failure_reasons[reason] += 1
+
+    def finish(self, script, result):
+        run = self.run
+        elapsed = time.perf_counter() - run.started
+        with self.lock:
+            self.scripts += 1
+            if not result:
+                self.failures += 1
+            self.counts.update(run.counts)
+            for key, seconds in run.times.items():
+                self.times[key] += seconds
+            self.sig_checks += sum(run.counts[op] for op in SIGNATURE_OPS)
+            self.max_depth = max(self.max_depth, run.max_depth)
+            entry = (elapsed, self.scripts, script)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif self.keep:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slowest_scripts(self):
+        """(seconds, script) of the slowest scripts, slowest first"""
+        with self.lock:
+            return [(elapsed, script) for elapsed, _, script in sorted(self.slowest, reverse=True)]
+
+    def report(self):
+        with self.lock:
+            lines = [
+                'scripts: {} failed: {} signature checks: {} max stack depth: {}'.format(
+                    self.scripts, self.failures, self.sig_checks, self.max_depth),
+                '{:<22} {:>10} {:>12} {:>10}'.format('op', 'count', 'total ms', 'mean us'),
+            ]
+            for key, seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+                count = self.counts[key]
+                lines.append('{:<22} {:>10} {:>12.3f} {:>10.2f}'.format(
+                    op_name(key), count, seconds * 1e3, seconds / count * 1e6))
+        return '\n'.join(lines)
@@ -1,17 +1,30 @@
-import requests
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
 from io import BytesIO
 
+from pybtc.backends import HttpBackend
+from pybtc.cache import LRUCache, object_size
+from pybtc.constants import SIGHASH_ALL
 from pybtc.helper import *
 from pybtc.script import *
+from pybtc.verify import first_invalid_input
+
+LOGGER = logging.getLogger(__name__)
 
 
 class Tx:
-    def __init__(self, version, tx_ins, tx_outs, lock_time, testnet=False):
+    __slots__ = ('version', 'tx_ins', 'tx_outs', 'lock_time', 'testnet', 'segwit')
+
+    def __init__(self, version, tx_ins, tx_outs, lock_time, testnet=False, segwit=False):
         self.version = version
         self.tx_ins = tx_ins
         self.tx_outs = tx_outs
         self.lock_time = lock_time
         self.testnet = testnet
+        self.segwit = segwit
 
     def __repr__(self):
         tx_ins = ''
@@ -53,23 +66,123 @@ class Tx:
         result += int_to_little_endian(self.lock_time, 4)
         return result
 
-    def fee(self, testnet=False):
+    def vsize(self):
+        """Virtual size in vbytes, the legacy size plus a quarter of the witness data"""
+        base_size = len(self.serialize())
+        if not self.segwit:
+            return base_size
+        # marker and flag, then per input the item count and the items
+        witness_size = 2
+        for tx_in in self.tx_ins:
+            witness = tx_in.witness or []
+            witness_size += len(encode_varint(len(witness)))
+            for item in witness:
+                witness_size += len(encode_varint(len(item))) + len(item)
+        return (base_size * 4 + witness_size + 3) // 4
+
+    def fee(self, testnet=False, utxos=None):
+        fee = 0
+
+        for tx_in in self.tx_ins:
+            fee += tx_in.value(testnet, utxos)
+
+        for tx_out in self.tx_outs:
+            fee -= tx_out.amount
+
+        return fee
+
+    async def prefetch_inputs(self, testnet=False, concurrency=16, timeout=None):
+        """Fetches every previous transaction at once, returns a dict of tx_id to Tx"""
+        tx_ids = [tx_in.prev_tx.hex() for tx_in in self.tx_ins]
+        return await TxFetcher.fetch_many(tx_ids, testnet, concurrency, timeout)
+
+    async def fee_async(self, testnet=False, concurrency=16, timeout=None):
+        prev_txs = await self.prefetch_inputs(testnet, concurrency, timeout)
         fee = 0
 
         for tx_in in self.tx_ins:
-            fee += tx_in.value(testnet)
+            fee += prev_txs[tx_in.prev_tx.hex()].tx_outs[tx_in.prev_index].amount
 
         for tx_out in self.tx_outs:
             fee -= tx_out.amount
 
         return fee
 
+    def is_coinbase(self):
+        if len(self.tx_ins) != 1:
+            return False
+        first_input = self.tx_ins[0]
+        return first_input.prev_tx == b'\x00' * 32 and first_input.prev_index == 0xffffffff
+
+    def sig_hash(self, input_index, utxos=None, redeem_script=None):
+        """
+        Returns the integer hash that needs to be signed for the input at input_index
+        For a p2sh input the redeem script stands in for the ScriptPubKey
+        """
+        result = int_to_little_endian(self.version, 4)
+
+        result += encode_varint(len(self.tx_ins))
+        for i, tx_in in enumerate(self.tx_ins):
+            if i == input_index:
+                if redeem_script is None:
+                    script_sig = tx_in.script_pubkey(self.testnet, utxos)
+                else:
+                    script_sig = redeem_script
+            else:
+                script_sig = None
+            result += TxIn(tx_in.prev_tx, tx_in.prev_index, script_sig, tx_in.sequence).serialize()
+
+        result += encode_varint(len(self.tx_outs))
+        for tx_out in self.tx_outs:
+            result += tx_out.serialize()
+
+        result += int_to_little_endian(self.lock_time, 4)
+        result += int_to_little_endian(SIGHASH_ALL, 4)
+        return big_endian_to_int(hash256(result))
+
+    def verification_job(self, input_index, utxos=None):
+        """
+        Returns the (script_sig, script_pubkey, z) material needed to verify an input
+        The scripts are serialized so the job is cheap to send to another process
+        """
+        tx_in = self.tx_ins[input_index]
+        script_pubkey = tx_in.script_pubkey(self.testnet, utxos)
+        return tx_in.script_sig.serialize(), script_pubkey.serialize(), self.sig_hash(input_index, utxos)
+
+    def verify_input(self, input_index, utxos=None):
+        tx_in = self.tx_ins[input_index]
+        script_pubkey = tx_in.script_pubkey(self.testnet, utxos)
+        z = self.sig_hash(input_index, utxos)
+        combined = tx_in.script_sig + script_pubkey
+        return combined.evaluate(z)
+
+    def verify(self, parallel=None, utxos=None):
+        """
+        Verifies the fee and every input of the transaction
+        parallel is None to run serially, a worker count, or an Executor to reuse
+        utxos is an optional UtxoSet used instead of fetching previous transactions
+        """
+        if self.fee(self.testnet, utxos) < 0:
+            return False
+
+        bad = first_invalid_input([self], parallel, utxos)
+        if bad is not None:
+            LOGGER.info('Bad input: {}:{}'.format(self.id(), bad[1]))
+            return False
+        return True
+
     @classmethod
     def parse(cls, stream, testnet=False):
         serialized_version = stream.read(4)
         version = little_endian_to_int(serialized_version)
 
         input_qty = read_varint(stream)
+        segwit = input_qty == 0
+        if segwit:
+            # 0x00 was the segwit marker, skip the flag and read the real count
+            stream.read(1)
+            input_qty = read_varint(stream)
+
         tx_ins = []
         for n in range(input_qty):
             tx_ins.append(TxIn.parse(stream, testnet))
@@ -79,14 +192,21 @@ class Tx:
         for n in range(output_qty):
             tx_outs.append(TxOut.parse(stream, testnet))
 
+        if segwit:
+            for tx_in in tx_ins:
+                items = read_varint(stream)
+                tx_in.witness = [stream.read(read_varint(stream)) for _ in range(items)]
+
         serialized_lock_time = stream.read(4)
         lock_time = little_endian_to_int(serialized_lock_time)
 
-        return Tx(version, tx_ins, tx_outs, lock_time)
+        return Tx(version, tx_ins, tx_outs, lock_time, testnet, segwit)
 
 
 class TxIn:
-    def __init__(self, prev_tx, prev_index, script_sig=None, sequence=0xffffffff):
+    __slots__ = ('prev_tx', 'prev_index', 'script_sig', 'sequence', 'witness')
+
+    def __init__(self, prev_tx, prev_index, script_sig=None, sequence=0xffffffff, witness=None):
         self.prev_tx = prev_tx
         self.prev_index = prev_index
         if script_sig is None:
@@ -94,6 +214,7 @@ class TxIn:
         else:
             self.script_sig = script_sig
         self.sequence = sequence
+        self.witness = witness
 
     def __repr__(self):
         return '{}:{}'.format(self.prev_tx.hex(), self.prev_index)
@@ -109,19 +230,23 @@ class TxIn:
     def fetch_tx(self, testnet=False):
         return TxFetcher.fetch(self.prev_tx.hex(), testnet)
 
-    def value(self, testnet=False):
+    def value(self, testnet=False, utxos=None):
         """
-        Get the output value by looking up the tx hash
+        Get the output value by looking up the tx hash, or the outpoint in utxos
         Returns the amount in satoshi
         """
+        if utxos is not None:
+            return utxos.amount(self.prev_tx, self.prev_index)
         tx = self.fetch_tx(testnet)
         return tx.tx_outs[self.prev_index].amount
 
-    def script_pubkey(self, testnet=False):
+    def script_pubkey(self, testnet=False, utxos=None):
         """
-        Get the ScriptPubKey by looking up the tx hash
+        Get the ScriptPubKey by looking up the tx hash, or the outpoint in utxos
         Returns a Script object
         """
+        if utxos is not None:
+            return utxos.script_pubkey(self.prev_tx, self.prev_index)
         tx = self.fetch_tx(testnet)
         return tx.tx_outs[self.prev_index].script_pubkey
 
@@ -141,6 +266,8 @@ class TxIn:
 
 
 class TxOut:
+    __slots__ = ('amount', 'script_pubkey')
+
     def __init__(self, amount, script_pubkey):
         self.amount = amount
         self.script_pubkey = script_pubkey
@@ -159,41 +286,192 @@ class TxOut:
         serialized_amount = stream.read(8)
         amount = little_endian_to_int(serialized_amount)
 
-        script_pubkey = Script.parse(stream)
+        script_pubkey = Script.parse(stream, intern=True)
 
         return TxOut(amount, script_pubkey)
 
 
+def tx_size(tx):
+    """Estimates the memory held by a parsed transaction and its inputs, outputs and scripts"""
+    size = object_size(tx) + object_size(tx.tx_ins) + object_size(tx.tx_outs)
+    for tx_in in tx.tx_ins:
+        size += object_size(tx_in) + object_size(tx_in.prev_tx) + script_size(tx_in.script_sig)
+        if tx_in.witness is not None:
+            size += object_size(tx_in.witness) + sum(object_size(item) for item in tx_in.witness)
+    for tx_out in tx.tx_outs:
+        size += object_size(tx_out) + script_size(tx_out.script_pubkey)
+    return size
+
+
+class TxCache(LRUCache):
+    """
+    TxFetcher cache with a budget in bytes and LRU eviction
+    With store_raw the raw bytes are kept and parsed again on every hit,
+    trading CPU for a much smaller resident size than parsed Tx objects
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, store_raw=False):
+        super().__init__(max_bytes, tx_size)
+        self.store_raw = store_raw
+
+    def get(self, tx_id, default=None):
+        value = super().get(tx_id)
+        if value is None:
+            return default
+        if self.store_raw:
+            return Tx.parse(BytesIO(value))
+        return value
+
+    def __setitem__(self, tx_id, tx):
+        self.add(tx_id, tx)
+
+    def add(self, tx_id, tx, raw=None):
+        """Caches tx, raw avoids serializing it again when storing raw bytes"""
+        if self.store_raw:
+            if raw is None:
+                raw = tx.serialize()
+            self.put(tx_id, raw, object_size(raw))
+        else:
+            self.put(tx_id, tx, tx_size(tx))
+
+
 class TxFetcher:
-    cache = {}
+    cache = TxCache()
+    # where transactions come from, e.g. a ChainBackend of local sources and HTTP
+    backend = HttpBackend()
+    # optional TxStore checked before the backend and written through to
+    store = None
+    # downloads in progress, so concurrent callers wait instead of downloading again
+    in_flight = {}
+    lock = threading.Lock()
 
     @classmethod
-    def get_url(cls, testnet=False):
-        if testnet:
-            return 'http://testnet.programmingbitcoin.com'
-        else:
-            return 'http://mainnet.programmingbitcoin.com'
+    def configure(cls, backend=None, cache=None, store=None):
+        """
+        Returns a fetcher with its own cache and, if given, its own backend and store
+        Use it in place of TxFetcher to keep several sources apart
+        """
+        attributes = {'cache': TxCache() if cache is None else cache}
+        if backend is not None:
+            attributes['backend'] = backend
+        if store is not None:
+            attributes['store'] = store
+        return type(cls.__name__, (cls,), attributes)
+
+    @classmethod
+    def fetch_raw(cls, tx_id, testnet=False, timeout=None):
+        """Reads the raw bytes of a transaction from the backend"""
+        raw = cls.backend.get_raw(tx_id, testnet, timeout)
+        if raw is None:
+            raise ValueError('Transaction not found: {}'.format(tx_id))
+        return raw
+
+    @classmethod
+    def parse_raw(cls, tx_id, raw, testnet=False):
+        return cls.check_id(tx_id, Tx.parse(BytesIO(raw), testnet))
+
+    @staticmethod
+    def check_id(tx_id, tx):
+        if tx.id() != tx_id:
+            raise ValueError('Not the same id: {} vs {}'.format(tx.id(), tx_id))
+        return tx
+
+    @classmethod
+    def load(cls, tx_id, testnet=False, fresh=False, timeout=None):
+        """
+        Reads a transaction from the store or the backend, bypassing the cache
+        Returns (tx, raw), raw is None when the transaction was parsed while streaming
+        timeout bounds the download in seconds
+        """
+        if cls.store is not None and not fresh:
+            raw = cls.store.get(tx_id)
+            if raw is not None:
+                return cls.parse_raw(tx_id, raw, testnet), raw
+
+        if cls.store is None and not cls.cache.store_raw:
+            # nothing needs the raw bytes, parse straight from the backend
+            stream = cls.backend.open(tx_id, testnet, timeout)
+            if stream is None:
+                raise ValueError('Transaction not found: {}'.format(tx_id))
+            with closing(stream):
+                return cls.check_id(tx_id, Tx.parse(stream, testnet)), None
+
+        raw = cls.fetch_raw(tx_id, testnet, timeout)
+        tx = cls.parse_raw(tx_id, raw, testnet)
+        if cls.store is not None and not cls.store.readonly:
+            cls.store.put(tx_id, raw)
+        return tx, raw
 
     @classmethod
     def fetch(cls, tx_id, testnet=False, fresh=False):
-        if fresh or (tx_id not in cls.cache):
-            url = '{}/tx/{}.hex'.format(cls.get_url(testnet), tx_id)
-            response = requests.get(url)
-            try:
-                raw = bytes.fromhex(response.text.strip())
-            except ValueError:
-                raise ValueError('Unexpected response: {}'.format(response.text))
-
-            if raw[4] == 0:
-                raw = raw[:4] + raw[6:]
-                tx = Tx.parse(BytesIO(raw), testnet)
-                tx.lock_time = little_endian_to_int(raw[-4:])
-            else:
-                tx = Tx.parse(BytesIO(raw), testnet)
+        tx = None
+        if not fresh:
+            tx = cls.cache.get(tx_id)
 
-            if tx.id() != tx_id:
-                raise ValueError('Not the same id: {} vs {}'.format(tx.id(), tx_id))
+        if tx is None:
+            tx = cls.fetch_once(tx_id, testnet, fresh)
+        tx.testnet = testnet
+        return tx
 
-            cls.cache[tx_id] = tx
-        cls.cache[tx_id].testnet = testnet
-        return cls.cache[tx_id]
+    @classmethod
+    def fetch_once(cls, tx_id, testnet=False, fresh=False, timeout=None):
+        """
+        Loads a transaction into the cache, downloading it only once
+        however many threads ask for it at the same time
+        timeout bounds the download, or the wait for another thread's download
+        """
+        key = (cls, tx_id, testnet)
+        with cls.lock:
+            future = cls.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                cls.in_flight[key] = future
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            tx = None
+            if not fresh and tx_id in cls.cache:
+                # another download finished between our cache miss and now
+                tx = cls.cache.get(tx_id)
+            if tx is None:
+                tx, raw = cls.load(tx_id, testnet, fresh, timeout)
+                cls.cache.add(tx_id, tx, raw)
+            future.set_result(tx)
+            return tx
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with cls.lock:
+                del cls.in_flight[key]
+
+    @classmethod
+    async def fetch_many(cls, tx_ids, testnet=False, concurrency=16, timeout=None):
+        """
+        Fetches transactions concurrently, at most concurrency downloads at a time
+        timeout bounds each download in seconds, the backend gets it too so a
+        download that timed out stops instead of running on in its thread
+        Returns a dict of tx_id to Tx
+        """
+        loop = asyncio.get_running_loop()
+        # a pool of our own: the default executor may have fewer workers than concurrency
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_one(tx_id):
+            tx = cls.cache.get(tx_id)
+            if tx is None:
+                async with semaphore:
+                    download = loop.run_in_executor(executor, cls.fetch_once, tx_id, testnet, False, timeout)
+                    tx = await asyncio.wait_for(download, timeout)
+            tx.testnet = testnet
+            return tx
+
+        unique_ids = list(dict.fromkeys(tx_ids))
+        try:
+            txs = await asyncio.gather(*[fetch_one(tx_id) for tx_id in unique_ids])
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return dict(zip(unique_ids, txs))
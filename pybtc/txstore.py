@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class TxStore:
+    """
+    Raw transactions persisted in an SQLite file, keyed by tx hash
+    The file can be shared between processes: one writer opens it normally
+    and workers open it with readonly=True
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        if readonly:
+            uri = '{}?mode=ro'.format(Path(path).absolute().as_uri())
+            self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            # write-ahead logging lets readers in other processes run during writes
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS txs (tx_hash BLOB PRIMARY KEY, raw BLOB NOT NULL) WITHOUT ROWID'
+            )
+            self.connection.commit()
+
+    def __repr__(self):
+        return 'TxStore({}{})'.format(self.path, ', readonly' if self.readonly else '')
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM txs').fetchone()[0]
+
+    def __contains__(self, tx_id):
+        return self.get(tx_id) is not None
+
+    def get(self, tx_id):
+        """Returns the raw bytes of the transaction or None if it is not stored"""
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT raw FROM txs WHERE tx_hash = ?', (bytes.fromhex(tx_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def put(self, tx_id, raw):
+        if self.readonly:
+            raise PermissionError('{} is read-only'.format(self))
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO txs (tx_hash, raw) VALUES (?, ?)', (bytes.fromhex(tx_id), raw)
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,112 @@
+from pybtc.helper import little_endian_to_int, int_to_little_endian
+from pybtc.script import Script
+
+OP_RETURN = 0x6a
+
+
+class UtxoSet:
+    """
+    Unspent outputs keyed by outpoint (previous tx hash followed by the
+    4 byte little endian index). Every entry is a single bytes object holding
+    the 8 byte amount followed by the raw scriptPubKey, so the set carries no
+    per-output Tx, TxOut or Script objects.
+    Pass it as utxos to Tx.fee, Tx.verify or TxIn.value to avoid any fetching.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def __repr__(self):
+        return 'UtxoSet({} outputs)'.format(len(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, outpoint):
+        return self.key(*outpoint) in self.entries
+
+    @staticmethod
+    def key(prev_tx, prev_index):
+        return prev_tx + int_to_little_endian(prev_index, 4)
+
+    def get(self, prev_tx, prev_index):
+        """Returns the raw entry of an outpoint, raises KeyError if it is not unspent"""
+        try:
+            return self.entries[self.key(prev_tx, prev_index)]
+        except KeyError:
+            raise KeyError('Unknown outpoint {}:{}'.format(prev_tx.hex(), prev_index))
+
+    def amount(self, prev_tx, prev_index):
+        """Returns the amount in satoshi of an unspent output"""
+        return little_endian_to_int(self.get(prev_tx, prev_index)[:8])
+
+    def script_pubkey(self, prev_tx, prev_index):
+        """Returns the ScriptPubKey of an unspent output as a Script object"""
+        return Script.parse_raw(self.get(prev_tx, prev_index)[8:], intern=True)
+
+    def add_tx(self, tx):
+        """Adds the spendable outputs of tx"""
+        tx_hash = tx.hash()
+        for i, tx_out in enumerate(tx.tx_outs):
+            raw_script = tx_out.script_pubkey.raw_serialize()
+            if raw_script[:1] == bytes([OP_RETURN]):
+                continue
+            self.entries[self.key(tx_hash, i)] = int_to_little_endian(tx_out.amount, 8) + raw_script
+
+    def apply_tx(self, tx):
+        """
+        Spends the outputs tx consumes and adds the ones it creates
+        Returns the undo data: the (key, entry) pairs that were spent
+        """
+        spent = []
+        if not tx.is_coinbase():
+            for tx_in in tx.tx_ins:
+                key = self.key(tx_in.prev_tx, tx_in.prev_index)
+                entry = self.entries.pop(key, None)
+                if entry is None:
+                    # put back what this transaction already spent
+                    self.restore(spent)
+                    raise KeyError('Missing or spent outpoint {}:{}'.format(
+                        tx_in.prev_tx.hex(), tx_in.prev_index))
+                spent.append((key, entry))
+        self.add_tx(tx)
+        return spent
+
+    def apply_block(self, block):
+        """
+        Applies every transaction of a block
+        Returns the undo data of the block, one list of spent pairs per transaction
+        """
+        undo = []
+        for tx in block.txs:
+            try:
+                undo.append(self.apply_tx(tx))
+            except KeyError:
+                self.undo_txs(block.txs[:len(undo)], undo)
+                raise
+        return undo
+
+    def undo_block(self, block, undo):
+        """Reverts apply_block using the undo data it returned"""
+        self.undo_txs(block.txs, undo)
+
+    def undo_txs(self, txs, undo):
+        # newest first, so outputs created and spent inside the block disappear
+        for tx, spent in zip(reversed(txs), reversed(undo)):
+            tx_hash = tx.hash()
+            for i in range(len(tx.tx_outs)):
+                self.entries.pop(self.key(tx_hash, i), None)
+            self.restore(spent)
+
+    def restore(self, spent):
+        for key, entry in spent:
+            self.entries[key] = entry
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Builds the set by streaming blocks, e.g. from read_blk_file"""
+        utxos = cls()
+        for block in blocks:
+            for tx in block.txs:
+                utxos.apply_tx(tx)
+        return utxos
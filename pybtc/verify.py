@@ -0,0 +1,141 @@
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from io import BytesIO
+
+from pybtc.script import Script
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of chunks handed to each worker, small enough to keep the workers
+# busy and large enough that a bad input cancels most of the remaining work
+CHUNKS_PER_WORKER = 4
+
+
+def check_job(job):
+    """Evaluates a (script_sig, script_pubkey, z) verification job"""
+    script_sig, script_pubkey, z = job
+    try:
+        combined = Script.parse(BytesIO(script_sig)) + Script.parse(BytesIO(script_pubkey))
+        return combined.evaluate(z)
+    except Exception as e:
+        LOGGER.info('Script raised: {!r}'.format(e))
+        return False
+
+
+def fails_statically(job):
+    """Whether the job fails without running its scripts, see Script.static_error"""
+    script_sig, script_pubkey, z = job
+    try:
+        combined = Script.parse(BytesIO(script_sig)) + Script.parse(BytesIO(script_pubkey))
+    except Exception as e:
+        LOGGER.info('Script raised: {!r}'.format(e))
+        return True
+    reason = combined.size_error() or combined.static_error()
+    if reason is not None:
+        LOGGER.info(reason)
+        return True
+    return False
+
+
+def check_chunk(start, jobs):
+    """Returns the index of the first invalid job of the chunk or None"""
+    for i, job in enumerate(jobs):
+        if not check_job(job):
+            return start + i
+    return None
+
+
+def first_invalid_job(jobs, parallel=None):
+    """
+    Returns the index of the first invalid job or None if every job is valid
+    parallel is None to run serially, a worker count, or an Executor to reuse
+    The lowest invalid index is always the one reported, whatever the order
+    in which the workers finish
+    Jobs that fail statically are found first, without any signature check,
+    so only the jobs before the first of them are run
+    """
+    for i, job in enumerate(jobs):
+        if fails_statically(job):
+            bad = run_jobs(jobs[:i], parallel)
+            return i if bad is None else bad
+    return run_jobs(jobs, parallel)
+
+
+def run_jobs(jobs, parallel=None):
+    """Runs the jobs serially or in a pool, returns the index of the first invalid one or None"""
+    if not parallel or parallel == 1 or len(jobs) < 2:
+        return check_chunk(0, jobs)
+
+    if isinstance(parallel, Executor):
+        executor = parallel
+        workers = os.cpu_count()
+    else:
+        workers = os.cpu_count() if parallel is True else parallel
+        executor = ProcessPoolExecutor(workers)
+
+    size = max(1, -(-len(jobs) // (workers * CHUNKS_PER_WORKER)))
+    try:
+        futures = {}
+        for start in range(0, len(jobs), size):
+            futures[executor.submit(check_chunk, start, jobs[start:start + size])] = start
+
+        first_bad = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                bad = future.result()
+                if bad is not None and (first_bad is None or bad < first_bad):
+                    first_bad = bad
+
+            if first_bad is not None:
+                # chunks starting after the bad job cannot report a lower index
+                for future in [f for f in pending if futures[f] > first_bad]:
+                    future.cancel()
+                    pending.discard(future)
+        return first_bad
+    finally:
+        if executor is not parallel:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def first_invalid_input(txs, parallel=None, utxos=None):
+    """
+    Returns (tx_index, input_index) of the first input that fails verification
+    or None if every input of every transaction is valid
+    """
+    jobs = []
+    locations = []
+    for tx_index, tx in enumerate(txs):
+        if tx.is_coinbase():
+            continue
+        for input_index in range(len(tx.tx_ins)):
+            jobs.append(tx.verification_job(input_index, utxos))
+            locations.append((tx_index, input_index))
+
+    bad = first_invalid_job(jobs, parallel)
+    if bad is None:
+        return None
+    return locations[bad]
+
+
+def verify_transactions(txs, parallel=None, utxos=None):
+    """
+    Verifies the fee and every input of a list of transactions, e.g. a block
+    Inputs of all the transactions are evaluated together in one pool, coinbase
+    transactions are skipped
+    """
+    for tx in txs:
+        if tx.is_coinbase():
+            continue
+        if tx.fee(tx.testnet, utxos) < 0:
+            LOGGER.info('Negative fee: {}'.format(tx.id()))
+            return False
+
+    bad = first_invalid_input(txs, parallel, utxos)
+    if bad is not None:
+        tx_index, input_index = bad
+        LOGGER.info('Bad input: {}:{}'.format(txs[tx_index].id(), input_index))
+        return False
+    return True
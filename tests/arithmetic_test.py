@@ -0,0 +1,65 @@
+import random
+from unittest import TestCase
+
+from pybtc import arithmetic
+from pybtc.arithmetic import *
+from pybtc.constants import N, P
+from pybtc.ecc import PrivateKey, S256Field, S256Point, Signature
+
+
+def backends():
+    result = [PythonArithmetic()]
+    if gmpy2 is not None:
+        result.append(Gmpy2Arithmetic())
+    return result
+
+
+class ArithmeticTest(TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.values = [1, 2, 3, P - 1, N - 1] + [rng.randrange(1, P) for _ in range(200)]
+
+    def test_against_definitions(self):
+        for backend in backends():
+            for prime in (P, N, 223):
+                for value in self.values:
+                    a = value % prime or 1
+                    b = (value * 7919) % prime
+                    self.assertEqual(backend.mul_mod(a, b, prime), a * b % prime)
+                    self.assertEqual(backend.inverse(a, prime), pow(a, prime - 2, prime))
+                    self.assertEqual(backend.pow_mod(a, b, prime), pow(a, b, prime))
+                    self.assertIs(type(backend.inverse(a, prime)), int)
+
+    def test_sqrt_mod(self):
+        for backend in backends():
+            for value in self.values:
+                square = value * value % P
+                root = backend.sqrt_mod(square, P)
+                self.assertIs(type(root), int)
+                self.assertEqual(root * root % P, square)
+
+    def test_backends_agree(self):
+        # signatures, keys and points from every backend are identical
+        results = []
+        for backend in backends():
+            with using(backend):
+                key = PrivateKey(0xdeadbeef12345)
+                sig = key.sign(0xcafe)
+                point = S256Point.parse(key.point.sec())
+                self.assertTrue(point.verify(0xcafe, sig))
+                self.assertFalse(point.verify(0xcafd, sig))
+                results.append((key.point.sec(False), sig.der(), (S256Field(4) / S256Field(3)).num))
+        self.assertEqual(len(set(results)), 1)
+
+    def test_default_backend(self):
+        expected = 'python' if gmpy2 is None else 'gmpy2'
+        self.assertEqual(default_backend().name, expected)
+        previous = arithmetic.backend
+        with using(PythonArithmetic()) as python:
+            self.assertIs(arithmetic.backend, python)
+        self.assertIs(arithmetic.backend, previous)
+
+    def test_zero_s(self):
+        point = PrivateKey(5).point
+        self.assertFalse(point.verify(1, Signature(1, 0)))
+        self.assertFalse(point.verify(1, Signature(1, N)))
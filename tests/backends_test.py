@@ -0,0 +1,80 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from pybtc.backends import *
+from tests.stand_in import StandInServer
+from tests.txstore_test import RAW_TX, TX_ID
+
+
+class FailingBackend(TxBackend):
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        raise ConnectionError('node is down')
+
+
+class ChunkedResponse:
+    def __init__(self, body, chunk_size):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class BackendsTest(TestCase):
+    def test_memory(self):
+        backend = MemoryBackend()
+        self.assertIsNone(backend.get_raw(TX_ID))
+        backend.add(TX_ID, RAW_TX)
+        self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as path:
+            backend = DirectoryBackend(path)
+            self.assertIsNone(backend.get_raw(TX_ID))
+            with open(os.path.join(path, TX_ID + '.hex'), 'w') as f:
+                f.write(RAW_TX.hex() + '\n')
+            self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+            os.remove(os.path.join(path, TX_ID + '.hex'))
+            with open(os.path.join(path, TX_ID + '.bin'), 'wb') as f:
+                f.write(RAW_TX)
+            self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+
+    def test_http(self):
+        with StandInServer({TX_ID: RAW_TX}) as server:
+            backend = HttpBackend(server.url, server.url)
+            self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+            self.assertIsNone(backend.get_raw('00' * 32))
+
+    def test_http_binary(self):
+        with StandInServer({TX_ID: RAW_TX}) as server:
+            backend = HttpBackend(server.url, server.url, path='/tx/{}.bin', binary=True)
+            self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+            stream = backend.open(TX_ID)
+            self.assertEqual(stream.read(4), RAW_TX[:4])
+            self.assertEqual(stream.read(), RAW_TX[4:])
+            stream.close()
+
+    def test_response_stream(self):
+        body = (RAW_TX.hex() + '\n').encode()
+        for chunk_size in (1, 3, 7, 64):
+            response = ChunkedResponse(body, chunk_size)
+            stream = ResponseStream(response, hex_body=True)
+            self.assertEqual(stream.read(5), RAW_TX[:5])
+            self.assertEqual(stream.read(100), RAW_TX[5:105])
+            self.assertEqual(stream.read(), RAW_TX[105:])
+            self.assertEqual(stream.read(1), b'')
+        with self.assertRaises(ValueError):
+            ResponseStream(ChunkedResponse(b'abc', 2), hex_body=True).read()
+        with self.assertRaises(ValueError):
+            ResponseStream(ChunkedResponse(b'zz', 2), hex_body=True).read()
+
+    def test_chain(self):
+        backend = ChainBackend([MemoryBackend(), FailingBackend(), MemoryBackend({TX_ID: RAW_TX})])
+        self.assertEqual(backend.get_raw(TX_ID), RAW_TX)
+        self.assertEqual(backend.open(TX_ID).read(), RAW_TX)
+        with self.assertRaises(ConnectionError):
+            backend.get_raw('00' * 32)
+        self.assertIsNone(ChainBackend([MemoryBackend()]).get_raw(TX_ID))
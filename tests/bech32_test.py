@@ -0,0 +1,18 @@
+from unittest import TestCase
+
+from pybtc.bech32 import *
+
+
+class Bech32Test(TestCase):
+    def test_encode_segwit_address(self):
+        # BIP173 and BIP350 test vectors
+        program = bytes.fromhex('751e76e8199196d454941c45d1b3a323f1433bd6')
+        self.assertEqual(encode_segwit_address(0, program), 'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4')
+        program = bytes.fromhex('1863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262')
+        self.assertEqual(encode_segwit_address(0, program, testnet=True),
+                         'tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7')
+        program = bytes.fromhex('79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798')
+        self.assertEqual(encode_segwit_address(1, program),
+                         'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0')
+        program = bytes.fromhex('751e')
+        self.assertEqual(encode_segwit_address(16, program), 'bc1sw50qgdz25j')
@@ -0,0 +1,89 @@
+import mmap
+import os
+import tempfile
+from unittest import TestCase, mock, skipUnless
+from io import BytesIO
+
+from pybtc.block import *
+from pybtc.constants import NETWORK_MAGIC
+from pybtc.helper import int_to_little_endian
+
+GENESIS_BLOCK = bytes.fromhex(
+    '0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e67768f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c01'
+    '01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000')
+GENESIS_ID = '000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f'
+GENESIS_TX_ID = '4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b'
+
+
+class BlockTest(TestCase):
+    def test_parse_header(self):
+        header = BlockHeader.parse(BytesIO(GENESIS_BLOCK))
+        self.assertEqual(header.version, 1)
+        self.assertEqual(header.prev_block, b'\x00' * 32)
+        self.assertEqual(header.merkle_root.hex(), GENESIS_TX_ID)
+        self.assertEqual(header.timestamp, 1231006505)
+        self.assertEqual(header.bits, bytes.fromhex('ffff001d'))
+        self.assertEqual(header.serialize(), GENESIS_BLOCK[:80])
+        self.assertEqual(header.id(), GENESIS_ID)
+
+    def test_parse(self):
+        block = Block.parse(BytesIO(GENESIS_BLOCK))
+        self.assertEqual(block.id(), GENESIS_ID)
+        self.assertEqual(len(block.txs), 1)
+        self.assertEqual(block.txs[0].id(), GENESIS_TX_ID)
+        self.assertEqual(block.txs[0].tx_outs[0].amount, 5000000000)
+
+
+class BlkFileTest(TestCase):
+    def setUp(self):
+        record = NETWORK_MAGIC + int_to_little_endian(len(GENESIS_BLOCK), 4) + GENESIS_BLOCK
+        fd, self.path = tempfile.mkstemp(suffix='.dat')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(record * 3 + b'\x00' * 4096)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_read_blk_file(self):
+        blocks = list(read_blk_file(self.path))
+        self.assertEqual(len(blocks), 3)
+        for block in blocks:
+            self.assertEqual(block.id(), GENESIS_ID)
+
+    def test_read_blk_transactions(self):
+        txs = list(read_blk_transactions(self.path))
+        self.assertEqual(len(txs), 3)
+        for header, tx in txs:
+            self.assertEqual(header.id(), GENESIS_ID)
+            self.assertEqual(tx.id(), GENESIS_TX_ID)
+
+    @skipUnless(hasattr(mmap, 'MADV_DONTNEED'), 'madvise is not available')
+    def test_release_pages(self):
+        page = mmap.PAGESIZE
+        mm = mock.Mock()
+        self.assertEqual(release_pages(mm, 0, 100), 0)
+        self.assertEqual(release_pages(mm, 0, 2 * page + 100), 2 * page)
+        # only the pages past what was released already
+        self.assertEqual(release_pages(mm, 2 * page, 2 * page + 200), 2 * page)
+        self.assertEqual(release_pages(mm, 2 * page, 3 * page), 3 * page)
+        self.assertEqual(mm.madvise.call_args_list, [mock.call(mmap.MADV_DONTNEED, 0, 2 * page),
+                                                     mock.call(mmap.MADV_DONTNEED, 2 * page, page)])
+
+    def test_bad_magic(self):
+        with open(self.path, 'r+b') as f:
+            f.write(b'\x0b\x11\x09\x07')
+        with self.assertRaises(SyntaxError):
+            list(read_blk_file(self.path))
+
+    def test_blk_index_backend(self):
+        backend = BlkIndexBackend()
+        backend.add_file(self.path)
+        self.assertEqual(len(backend.index), 1)
+        raw = backend.get_raw(GENESIS_TX_ID)
+        self.assertEqual(raw, GENESIS_BLOCK[81:])
+        self.assertIsNone(backend.get_raw('00' * 32))
+
+    def test_empty_file(self):
+        with open(self.path, 'wb'):
+            pass
+        self.assertEqual(list(read_blk_file(self.path)), [])
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from pybtc.cache import *
+
+
+class LRUCacheTest(TestCase):
+    def test_eviction(self):
+        cache = LRUCache(10, len)
+        cache['a'] = b'1234'
+        cache['b'] = b'1234'
+        self.assertEqual(cache['a'], b'1234')
+        cache['c'] = b'1234'
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertEqual(cache.resident_bytes, 8)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_too_large(self):
+        cache = LRUCache(10, len)
+        cache['a'] = b'1234'
+        cache['b'] = b'x' * 11
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+
+    def test_replace(self):
+        cache = LRUCache(10, len)
+        cache['a'] = b'1234'
+        cache['a'] = b'12'
+        self.assertEqual(cache.resident_bytes, 2)
+        del cache['a']
+        self.assertEqual(cache.resident_bytes, 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        cache = LRUCache(10, len)
+        cache['a'] = b'1'
+        cache.get('a')
+        cache.get('b')
+        with self.assertRaises(KeyError):
+            cache['b']
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['resident_bytes'], 1)
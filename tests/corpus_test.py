@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pybtc.block import read_blk_file
+from pybtc.corpus import *
+from pybtc.utxo import UtxoSet
+
+
+class CorpusGeneratorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.paths = CorpusGenerator(seed=7, keys=4, txs_per_block=4).write(cls.directory, 4)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_deterministic(self):
+        first = [block.serialize() for block in CorpusGenerator(seed=3, keys=3, txs_per_block=3, sign=False).blocks(3)]
+        second = [block.serialize() for block in CorpusGenerator(seed=3, keys=3, txs_per_block=3, sign=False).blocks(3)]
+        other = [block.serialize() for block in CorpusGenerator(seed=4, keys=3, txs_per_block=3, sign=False).blocks(3)]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        # unsigned corpora keep no UTXO set
+        self.assertIsNone(CorpusGenerator(sign=False).utxos)
+
+    def test_blocks_verify(self):
+        blocks = [block for path in self.paths for block in read_blk_file(path)]
+        self.assertEqual(len(blocks), 4)
+        utxos = UtxoSet()
+        prev_block = b'\x00' * 32
+        spent = set()
+        for block in blocks:
+            self.assertEqual(block.header.prev_block, prev_block)
+            self.assertTrue(block.validate_merkle_root())
+            for tx in block.txs[1:]:
+                self.assertTrue(tx.verify(utxos=utxos))
+                self.assertGreater(tx.fee(utxos=utxos), 0)
+                spent.update(utxos.script_pubkey(tx_in.prev_tx, tx_in.prev_index).classify() for tx_in in tx.tx_ins)
+            for tx in block.txs:
+                utxos.apply_tx(tx)
+            prev_block = block.hash()
+        self.assertGreater(len(blocks[3].txs), 1)
+        # every kind of output the generator creates is spent and verified
+        self.assertEqual(spent, {'p2pkh', 'p2sh', 'multisig'})
+
+    def test_file_rotation(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = CorpusGenerator(seed=1, keys=3, txs_per_block=3, sign=False).write(directory, 4, 1000)
+            self.assertGreater(len(paths), 1)
+            self.assertEqual(sum(len(list(read_blk_file(path))) for path in paths), 4)
+        finally:
+            shutil.rmtree(directory)
@@ -263,6 +263,15 @@ class S256PointTest(TestCase):
         self.assertEqual(g.sec(), b'\x02' + Gx.to_bytes(32, 'big'))
         self.assertFalse(p.sec() == b'\x03' + px.to_bytes(32, 'big'))
 
+    def test_shared_curve(self):
+        g = S256Point(Gx, Gy)
+        p = 2 * g
+        self.assertIs(p.a, g.a)
+        self.assertIs(p.b, S256_B)
+        self.assertFalse(hasattr(p, '__dict__'))
+        with self.assertRaises(AttributeError):
+            p.z = 1
+
 
 class SignatureTest(TestCase):
     def test_der(self):
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from pybtc.backends import MemoryBackend
+from pybtc.fees import *
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+from pybtc.utxo import UtxoSet
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self, txs):
+        super().__init__(txs)
+        self.requests = []
+
+    def get_raw(self, tx_id, testnet=False, timeout=None):
+        self.requests.append(tx_id)
+        return super().get_raw(tx_id, testnet, timeout)
+
+
+class ComputeFeesTest(TestCase):
+    def setUp(self):
+        self.parent = Tx(1, [TxIn(b'\x01' * 32, 0)], [TxOut(5000, Script([0x51])), TxOut(7000, Script([0x51]))], 0)
+        self.coinbase = Tx(1, [TxIn(b'\x00' * 32, 0xffffffff, Script([b'\x01']))], [TxOut(50, Script([0x51]))], 0)
+        self.spend = Tx(1, [TxIn(self.parent.hash(), 0), TxIn(self.parent.hash(), 1)],
+                        [TxOut(11000, Script([0x51]))], 0)
+        self.child = Tx(1, [TxIn(self.spend.hash(), 0), TxIn(self.parent.hash(), 0)],
+                        [TxOut(15000, Script([0x51]))], 0)
+        self.block_txs = [self.coinbase, self.spend, self.child]
+
+    def test_compute_fees(self):
+        backend = CountingBackend({self.parent.id(): self.parent.serialize()})
+        fetcher = TxFetcher.configure(backend=backend)
+        fees = compute_fees(self.block_txs, fetcher=fetcher)
+        self.assertEqual(fees[0], (None, None))
+        self.assertEqual(fees[1], (1000, 1000 / self.spend.vsize()))
+        self.assertEqual(fees[2][0], 1000)
+        self.assertEqual(backend.requests, [self.parent.id()])
+
+    def test_compute_fees_utxos(self):
+        utxos = UtxoSet()
+        utxos.add_tx(self.parent)
+        fees = compute_fees(self.block_txs, utxos=utxos)
+        self.assertEqual([fee for fee, feerate in fees], [None, 1000, 1000])
+
+    def test_vsize(self):
+        self.assertEqual(self.spend.vsize(), len(self.spend.serialize()))
+        self.spend.segwit = True
+        self.spend.tx_ins[0].witness = [b'\x00' * 71, b'\x02' * 33]
+        self.spend.tx_ins[1].witness = []
+        witness_size = 2 + 1 + 1 + 71 + 1 + 33 + 1
+        expected = (len(self.spend.serialize()) * 4 + witness_size + 3) // 4
+        self.assertEqual(self.spend.vsize(), expected)
@@ -0,0 +1,90 @@
+import sys
+import types
+from unittest import TestCase
+
+from pybtc import helper
+from pybtc.ecc import FieldElement, PrivateKey, S256Point, Signature
+from pybtc.helper import hash256
+from pybtc.instrument import *
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+
+
+class CryptoCountersTest(TestCase):
+    def test_point_operations(self):
+        with CryptoCounters() as counters:
+            5 * PrivateKey.G
+        # 5 is 101 in binary: three doublings, one addition and one addition to infinity
+        self.assertEqual(counters.counts['point_double'], 3)
+        self.assertEqual(counters.counts['point_add'], 1)
+        self.assertEqual(counters.counts['point_infinity'], 1)
+        self.assertEqual(counters.counts['field_inversion'], 4)
+
+    def test_verify(self):
+        key = PrivateKey(12345)
+        z = 0xabcdef
+        der = key.sign(z).der()
+        with CryptoCounters(timers=True) as counters:
+            point = S256Point.parse(key.point.sec())
+            self.assertTrue(point.verify(z, Signature.parse(der)))
+            key.point.hash160()
+        self.assertEqual(counters.counts['sqrt'], 1)
+        self.assertEqual(counters.counts['signature_parse'], 1)
+        self.assertEqual(counters.counts['hash160'], 1)
+        self.assertGreater(counters.counts['point_double'], 250)
+        self.assertEqual(counters.counts['field_inversion'],
+                         counters.counts['point_add'] + counters.counts['point_double'])
+        self.assertGreater(counters.times['point_double'], 0)
+        self.assertIn('point_double', counters.report())
+
+    def test_hash_bindings(self):
+        tx = Tx(1, [TxIn(b'\x00' * 32, 0)], [TxOut(1, Script([0x51]))], 0)
+        with CryptoCounters() as counters:
+            tx.hash()
+            hash256(b'')
+        self.assertEqual(counters.counts['hash256'], 2)
+
+    def test_restored(self):
+        truediv = FieldElement.__truediv__
+        parse = Signature.parse
+        with CryptoCounters():
+            with CryptoCounters() as inner:
+                self.assertIsNot(FieldElement.__truediv__, truediv)
+                PrivateKey.G + PrivateKey.G
+            self.assertEqual(inner.counts['point_double'], 1)
+        self.assertIs(FieldElement.__truediv__, truediv)
+        self.assertEqual(Signature.parse, parse)
+        self.assertIs(hash256, helper.hash256)
+        with CryptoCounters() as counters:
+            PrivateKey.G + PrivateKey.G
+        counters.reset()
+        self.assertEqual(sum(counters.counts.values()), 0)
+
+    def test_out_of_order(self):
+        truediv = FieldElement.__truediv__
+        first = CryptoCounters()
+        second = CryptoCounters()
+        first.__enter__()
+        second.__enter__()
+        PrivateKey.G + PrivateKey.G
+        first.__exit__(None, None, None)
+        PrivateKey.G + PrivateKey.G
+        second.__exit__(None, None, None)
+        self.assertEqual(first.counts['point_double'], 1)
+        self.assertEqual(second.counts['point_double'], 2)
+        self.assertIs(FieldElement.__truediv__, truediv)
+        PrivateKey.G + PrivateKey.G
+        self.assertEqual(first.counts['point_double'], 1)
+
+    def test_imported_while_counting(self):
+        module = types.ModuleType('imported_while_counting')
+        sys.modules[module.__name__] = module
+        try:
+            with CryptoCounters() as counters:
+                # from pybtc.helper import hash256 inside the block binds the wrapper
+                module.hash256 = helper.hash256
+                module.hash256(b'')
+            self.assertEqual(counters.counts['hash256'], 1)
+            self.assertIs(module.hash256, hash256)
+        finally:
+            del sys.modules[module.__name__]
@@ -0,0 +1,86 @@
+from unittest import TestCase
+from io import BytesIO
+
+from pybtc.block import Block, BlockHeader, MerkleBlock
+from pybtc.helper import hash256
+from pybtc.merkle import *
+
+
+def naive_merkle_root(hashes):
+    if len(hashes) == 1:
+        return hashes[0]
+    if len(hashes) % 2:
+        hashes = hashes + [hashes[-1]]
+    return naive_merkle_root([hash256(hashes[i] + hashes[i + 1]) for i in range(0, len(hashes), 2)])
+
+
+def leaves(n):
+    return [hash256(bytes([i])) for i in range(n)]
+
+
+class MerkleTest(TestCase):
+    def test_merkle_parent(self):
+        hash1 = leaves(1)[0]
+        hash2 = leaves(2)[1]
+        self.assertEqual(merkle_parent(hash1, hash2), hash256(hash1 + hash2))
+
+    def test_merkle_root(self):
+        for n in range(1, 20):
+            hashes = leaves(n)
+            self.assertEqual(merkle_root(hashes), naive_merkle_root(hashes))
+        with self.assertRaises(ValueError):
+            merkle_root([])
+
+    def test_genesis_merkle_root(self):
+        from tests.block_test import GENESIS_BLOCK
+        block = Block.parse(BytesIO(GENESIS_BLOCK))
+        self.assertTrue(block.validate_merkle_root())
+        block.header.merkle_root = b'\x00' * 32
+        self.assertFalse(block.validate_merkle_root())
+
+    def test_branch(self):
+        for n in range(1, 12):
+            hashes = leaves(n)
+            tree = MerkleTree(hashes)
+            self.assertEqual(tree.root(), naive_merkle_root(hashes))
+            for i in range(n):
+                branch = tree.branch(i)
+                self.assertTrue(verify_branch(hashes[i], i, branch, tree.root()))
+                self.assertFalse(verify_branch(hashes[(i + 1) % n] + b'\x00', i, branch, tree.root()))
+        with self.assertRaises(IndexError):
+            tree.branch(n)
+
+    def test_partial(self):
+        hashes = leaves(11)
+        tree = MerkleTree(hashes)
+        for indexes in ([0], [10], [3, 4, 9], list(range(11)), []):
+            partial_hashes, flags = tree.partial(indexes)
+            root, matched = partial_merkle_root(11, partial_hashes, flags)
+            self.assertEqual(root, tree.root())
+            self.assertEqual(matched, [hashes[i] for i in indexes])
+
+    def test_partial_malformed(self):
+        tree = MerkleTree(leaves(5))
+        partial_hashes, flags = tree.partial([2])
+        with self.assertRaises(SyntaxError):
+            partial_merkle_root(5, partial_hashes[:-1], flags)
+        with self.assertRaises(SyntaxError):
+            partial_merkle_root(5, partial_hashes + [partial_hashes[0]], flags)
+        with self.assertRaises(SyntaxError):
+            partial_merkle_root(0, [], b'')
+
+
+class MerkleBlockTest(TestCase):
+    def test_parse(self):
+        hashes = leaves(7)
+        tree = MerkleTree(hashes)
+        header = BlockHeader(1, b'\x00' * 32, tree.root()[::-1], 0, b'\xff\xff\x00\x1d', b'\x00' * 4)
+        block = Block(header, [])
+        merkle_block = MerkleBlock.from_block(block, [1, 5], tree)
+        parsed = MerkleBlock.parse(BytesIO(merkle_block.serialize()))
+        self.assertEqual(parsed.total, 7)
+        self.assertTrue(parsed.is_valid())
+        self.assertEqual(parsed.matched_hashes(), [hashes[1][::-1], hashes[5][::-1]])
+
+        parsed.header.merkle_root = b'\x00' * 32
+        self.assertFalse(parsed.is_valid())
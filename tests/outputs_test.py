@@ -0,0 +1,138 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from pybtc.block import read_blk_outputs
+from pybtc.constants import NETWORK_MAGIC
+from pybtc.ecc import PrivateKey
+from pybtc.helper import hash160, hash256, int_to_little_endian, encode_varint
+from pybtc.outputs import *
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+
+SEC = PrivateKey(1).point.sec()
+H160 = hash160(SEC)
+PROGRAM = bytes.fromhex('1863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262')
+TAPROOT = bytes.fromhex('79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798')
+
+SCRIPTS = {
+    'p2pkh': Script([0x76, 0xa9, H160, 0x88, 0xac]),
+    'p2sh': Script([0xa9, bytes.fromhex('74d691da1574e6b3c192ecfb52cc8984ee7b6c56'), 0x87]),
+    'p2wpkh': Script([0x00, bytes.fromhex('751e76e8199196d454941c45d1b3a323f1433bd6')]),
+    'p2wsh': Script([0x00, PROGRAM]),
+    'p2tr': Script([0x51, TAPROOT]),
+    'p2pk': Script([SEC, 0xac]),
+    'multisig': Script([0x51, SEC, PrivateKey(2).point.sec(compressed=False), 0x52, 0xae]),
+    'nulldata': Script([0x6a, b'hello', 0x51]),
+}
+
+
+def segwit_serialize(tx, witnesses):
+    """Serialization of tx with marker, flag and the witness of each input"""
+    legacy = tx.serialize()
+    result = legacy[:4] + b'\x00\x01' + legacy[4:-4]
+    for witness in witnesses:
+        result += encode_varint(len(witness))
+        for item in witness:
+            result += encode_varint(len(item)) + item
+    return result + legacy[-4:]
+
+
+class ClassifyTest(TestCase):
+    def test_classify_script_pubkey(self):
+        for kind, script in SCRIPTS.items():
+            self.assertEqual(classify_script_pubkey(script.raw_serialize())[0], kind)
+        self.assertEqual(classify_script_pubkey(SCRIPTS['p2pkh'].raw_serialize())[1], H160)
+        self.assertEqual(classify_script_pubkey(SCRIPTS['p2tr'].raw_serialize())[1], TAPROOT)
+        self.assertEqual(len(classify_script_pubkey(SCRIPTS['multisig'].raw_serialize())[1]), 2)
+
+    def test_nonstandard(self):
+        for raw in (b'', b'\x51', b'\x6a\x4c', b'\x6a\xac', b'\x00\x13' + b'\x00' * 19,
+                    b'\x51\x21' + SEC + b'\x52\xae', b'\x52\x21' + SEC + b'\x51\xae', b'\x21' + SEC):
+            self.assertEqual(classify_script_pubkey(raw), ('nonstandard', None))
+
+    def test_agrees_with_script_classify(self):
+        scripts = list(SCRIPTS.values()) + [
+            Script([0x51, PROGRAM]),
+            Script([0x52, TAPROOT]),
+            Script([0x6a]),
+            Script([0x6a, 0x76]),
+            Script([0x76, 0xa9, H160, 0x88]),
+            Script([0x53, SEC, SEC, 0x52, 0xae]),
+        ]
+        raws = [script.raw_serialize() for script in scripts] + [
+            # hashes and keys pushed with OP_PUSHDATA1
+            b'\x76\xa9\x4c\x14' + H160 + b'\x88\xac',
+            b'\xa9\x4c\x14' + H160 + b'\x87',
+            b'\x00\x4c\x14' + H160,
+            b'\x4c\x21' + SEC + b'\xac',
+            b'\x51\x4c\x21' + SEC + b'\x51\xae',
+            b'\x6a\x4c\x05hello',
+            b'\x6a\x4d\x05\x00hello',
+            # truncated pushes
+            bytes.fromhex('6a4c'),
+            bytes.fromhex('6a05ab'),
+            bytes.fromhex('6a4d01'),
+            b'\xa9\x14' + H160[:10],
+            b'\x76\xa9\x14' + H160 + b'\x88',
+        ]
+        for raw in raws:
+            script = Script.parse_raw(raw)
+            self.assertEqual(classify_script_pubkey(raw)[0], script.classify(), raw.hex())
+            self.assertEqual(script.raw_serialize(), raw)
+
+    def test_addresses(self):
+        self.assertEqual(script_pubkey_address(SCRIPTS['p2pkh'].raw_serialize()), PrivateKey(1).point.address())
+        self.assertEqual(SCRIPTS['p2pkh'].address(testnet=True), PrivateKey(1).point.address(testnet=True))
+        self.assertEqual(SCRIPTS['p2sh'].address(), '3CLoMMyuoDQTPRD3XYZtCvgvkadrAdvdXh')
+        self.assertEqual(SCRIPTS['p2sh'].address(testnet=True), '2N3u1R6uwQfuobCqbCgBkpsgBxvr1tZpe7B')
+        self.assertEqual(SCRIPTS['p2wpkh'].address(), 'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4')
+        self.assertEqual(SCRIPTS['p2wsh'].address(testnet=True),
+                         'tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7')
+        self.assertEqual(SCRIPTS['p2tr'].address(), 'bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0')
+        for kind in ('p2pk', 'multisig', 'nulldata'):
+            self.assertIsNone(SCRIPTS[kind].address())
+
+
+class BlockOutputsTest(TestCase):
+    def setUp(self):
+        coinbase = Tx(1, [TxIn(b'\x00' * 32, 0xffffffff, Script([b'\x01\x02']))],
+                      [TxOut(5000000000, SCRIPTS['p2pkh']), TxOut(0, SCRIPTS['nulldata'])], 0)
+        spend = Tx(2, [TxIn(coinbase.hash(), 0), TxIn(coinbase.hash(), 1)],
+                   [TxOut(amount, script) for amount, script in enumerate(SCRIPTS.values())], 0, segwit=True)
+        # the same output twice, its classification is reused
+        reuse = Tx(1, [TxIn(spend.hash(), 0)], [TxOut(1, SCRIPTS['p2tr']), TxOut(2, SCRIPTS['p2tr'])], 7)
+        self.txs = [coinbase, spend, reuse]
+        raw_txs = [coinbase.serialize(), segwit_serialize(spend, [[b'\x30' * 71, SEC], []]), reuse.serialize()]
+        self.raw = b'\x01' * 80 + encode_varint(len(self.txs)) + b''.join(raw_txs)
+
+    def test_block_outputs(self):
+        expected = [(tx.hash(), i, tx_out.amount, tx_out.script_pubkey.raw_serialize())
+                    for tx in self.txs for i, tx_out in enumerate(tx.tx_outs)]
+        self.assertEqual(list(block_outputs(self.raw)), expected)
+
+    def test_classify_block_outputs(self):
+        rows = classify_block_outputs(self.raw)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0], (self.txs[0].hash(), 0, 5000000000, 'p2pkh', PrivateKey(1).point.address()))
+        self.assertEqual([row[3] for row in rows[2:10]], list(SCRIPTS))
+        self.assertEqual(rows[10][4], rows[11][4])
+        self.assertEqual(rows[11][:3], (self.txs[2].hash(), 1, 2))
+
+    def test_truncated(self):
+        with self.assertRaises(SyntaxError):
+            list(block_outputs(self.raw[:-2]))
+        with self.assertRaises(SyntaxError):
+            list(block_outputs(self.raw + b'\x00'))
+
+    def test_read_blk_outputs(self):
+        fd, path = tempfile.mkstemp(suffix='.dat')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write((NETWORK_MAGIC + int_to_little_endian(len(self.raw), 4) + self.raw) * 2)
+            blocks = list(read_blk_outputs(path))
+        finally:
+            os.remove(path)
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(blocks[0][0], hash256(self.raw[:80])[::-1])
+        self.assertEqual(blocks[1][1], classify_block_outputs(self.raw))
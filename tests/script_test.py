@@ -1,7 +1,11 @@
-from unittest import TestCase
+from unittest import TestCase, mock
+from io import BytesIO
 
 from pybtc.script import *
-from pybtc.ecc import S256Point, Signature
+from pybtc.ecc import PrivateKey, S256Point, Signature
+from pybtc.helper import hash160
+from pybtc.opcodes import ConditionStack, as_bytes, as_num, decode_num, encode_num
+from pybtc.tracer import ScriptProfiler, ScriptTracer
 
 
 class ScriptTest(TestCase):
@@ -33,3 +37,313 @@ class ScriptTest(TestCase):
         script_sig_3 = Script([0x53, 0x8f])
         combined_script_3 = script_sig_3 + script_pubkey_2
         self.assertTrue(combined_script_3.evaluate(z))
+
+    def test_parse_malformed(self):
+        raw = bytes.fromhex('044c05aabb')
+        script = Script.parse(BytesIO(raw))
+        self.assertEqual(script.serialize(), raw)
+
+    def test_evaluate_unknown_op(self):
+        self.assertFalse(Script([0x51, 0xba]).evaluate(0))
+        self.assertFalse(Script([0x51, 0xad]).evaluate(0))
+
+    def test_evaluate_long(self):
+        # OP_1 followed by OP_DUP OP_DROP pairs, up to the opcode limit
+        self.assertTrue(Script([0x51] + [0x76, 0x75] * 100).evaluate(0))
+        self.assertFalse(Script([0x51] + [0x76, 0x75] * 5000).evaluate(0))
+
+    def test_parse_raw(self):
+        raw = bytes.fromhex('76a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac')
+        script = Script.parse_raw(raw)
+        self.assertEqual(script.cmds, [0x76, 0xa9, raw[3:23], 0x88, 0xac])
+        self.assertIsNone(script.raw)
+        self.assertEqual(script.raw_serialize(), raw)
+        pushdata = bytes.fromhex('4c03aabbcc4d0200ddee')
+        self.assertEqual(Script.parse_raw(pushdata).cmds, [bytes.fromhex('aabbcc'), bytes.fromhex('ddee')])
+
+
+class ScriptInternerTest(TestCase):
+    raw = bytes.fromhex('76a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac')
+
+    def test_parse(self):
+        interner = ScriptInterner()
+        script = interner.parse(self.raw)
+        self.assertIs(interner.parse(bytes(self.raw)), script)
+        self.assertEqual(script.cmds, (0x76, 0xa9, self.raw[3:23], 0x88, 0xac))
+        self.assertEqual(script.raw_serialize(), self.raw)
+        self.assertEqual(interner.stats()['hits'], 1)
+
+    def test_max_bytes(self):
+        interner = ScriptInterner(max_bytes=1000)
+        for n in range(20):
+            interner.parse(bytes([0x14]) + n.to_bytes(20, 'big'))
+        self.assertLessEqual(interner.resident_bytes, 1000)
+        self.assertGreater(interner.stats()['evictions'], 0)
+
+    def test_intern(self):
+        stream = BytesIO(bytes([len(self.raw)]) + self.raw)
+        self.assertIsInstance(Script.parse(stream, intern=True).cmds, list)
+        interner = ScriptInterner()
+        with mock.patch.object(Script, 'interner', interner):
+            first = Script.parse(BytesIO(bytes([len(self.raw)]) + self.raw), intern=True)
+            second = Script.parse(BytesIO(bytes([len(self.raw)]) + self.raw), intern=True)
+            not_interned = Script.parse(BytesIO(bytes([len(self.raw)]) + self.raw))
+        self.assertIs(first, second)
+        self.assertIsNot(first, not_interned)
+        combined = Script([b'\x01']) + first
+        self.assertEqual(combined.cmds, [b'\x01', 0x76, 0xa9, self.raw[3:23], 0x88, 0xac])
+
+
+class LimitTest(TestCase):
+    def failure(self, script):
+        profiler = ScriptProfiler()
+        self.assertFalse(script.evaluate(0, profiler))
+        self.assertFalse(script.evaluate(0))
+        return list(profiler.failure_reasons)
+
+    def test_script_size(self):
+        push = b'\x01' * 500
+        self.assertEqual(self.failure(Script([push, 0x75] * 20 + [0x51])), [FAIL_SCRIPT_SIZE])
+        # the script_sig and script_pubkey are limited separately
+        script = Script([push, 0x75] * 19) + Script([push, 0x75] * 19 + [0x51])
+        self.assertTrue(script.evaluate(0))
+        self.assertIsNone(script.size_error())
+
+    def test_size_checked_once(self):
+        script = Script([0x51] + [0x76, 0x75] * 10)
+        with mock.patch.object(Script, 'size_error', autospec=True, return_value=None) as size_error:
+            self.assertTrue(script.evaluate(0))
+            self.assertTrue(script.evaluate(0, ScriptTracer()))
+        self.assertEqual(size_error.call_count, 2)
+
+    def test_push_size(self):
+        self.assertEqual(self.failure(Script([b'\x01' * 521])), [FAIL_PUSH_SIZE])
+        # even when not executed
+        self.assertEqual(self.failure(Script([0x00, 0x63, b'\x01' * 521, 0x68, 0x51])), [FAIL_PUSH_SIZE])
+        self.assertTrue(Script([b'\x01' * 520]).evaluate(0))
+
+    def test_op_count(self):
+        self.assertEqual(self.failure(Script([0x51] + [0x61] * 202)), [FAIL_OP_COUNT])
+        self.assertTrue(Script([0x51] + [0x61] * 201).evaluate(0))
+        # unexecuted opcodes count too
+        self.assertEqual(self.failure(Script([0x00, 0x63] + [0x61] * 200 + [0x68, 0x51])), [FAIL_OP_COUNT])
+        # and the keys of a multisig: 10 x (OP_CHECKMULTISIG + 20 keys) is over 201
+        multisig = [0x00, 0x00] + [b'\x02'] * 20 + [b'\x14', 0xae, 0x75]
+        self.assertEqual(self.failure(Script(multisig * 10 + [0x51])), [FAIL_OP_COUNT])
+        # the limit applies to the script_sig and script_pubkey separately
+        script = Script([0x61] * 150) + Script([0x51] + [0x61] * 150)
+        self.assertTrue(script.evaluate(0))
+
+    def test_stack_size(self):
+        # OP_3DUP repeated
+        self.assertEqual(self.failure(Script([0x51] * 500 + [0x6f] * 200)), [FAIL_STACK_SIZE])
+        # the alt stack counts too
+        self.assertEqual(self.failure(Script([0x51, 0x6b] * 200 + [0x51] * 801)), [FAIL_STACK_SIZE])
+        self.assertTrue(Script([0x51] * 1000).evaluate(0))
+        self.assertEqual(self.failure(Script([0x51] * 1001)), [FAIL_STACK_SIZE])
+
+    def test_mul(self):
+        # squaring again and again stops at the element size
+        self.assertEqual(self.failure(Script([0x60] + [0x76, 0x95] * 20)), [FAIL_BAD_OP])
+        self.assertTrue(Script([0x60] + [0x76, 0x95] * 5).evaluate(0))
+
+    def test_template(self):
+        # pushes over the element size skip the fast paths and fail
+        sec = b'\x02' + b'\x01' * 600
+        self.assertFalse(Script([b'\x30', sec, 0xac]).evaluate(0))
+
+
+class NumberTest(TestCase):
+    def test_as_num(self):
+        for n in list(range(-300, 300)) + [2 ** 31 - 1, -2 ** 31 + 1]:
+            self.assertEqual(as_bytes(n), encode_num(n))
+            self.assertEqual(as_num(encode_num(n)), n)
+            self.assertEqual(decode_num(as_bytes(n)), n)
+        self.assertEqual(as_num(b'\x05'), 5)
+        self.assertEqual(as_bytes(b'\x05'), b'\x05')
+
+    def test_arithmetic(self):
+        # 16 * 16 is compared with its encoding, the 2 + 3 + 4 sum with OP_NUMEQUAL
+        self.assertTrue(Script([0x60, 0x60, 0x95, encode_num(256), 0x87]).evaluate(0))
+        self.assertTrue(Script([0x52, 0x53, 0x93, 0x54, 0x93, b'\x09', 0x9c]).evaluate(0))
+        # results pushed as numbers are hashed and sized as their encoding
+        self.assertTrue(Script([0x60, 0x8b, 0xa9, hash160(encode_num(17)), 0x87]).evaluate(0))
+        self.assertTrue(Script([0x60, 0x60, 0x95, 0x82, 0x53, 0x87]).evaluate(0))
+        # the final element is checked as bytes, so 0 fails
+        self.assertFalse(Script([0x51, 0x8c]).evaluate(0))
+
+
+class PickRollTest(TestCase):
+    def test_pick(self):
+        # OP_2 OP_3 OP_4 then OP_2 OP_PICK copies the OP_2 from the top
+        self.assertTrue(Script([0x52, 0x53, 0x54, 0x52, 0x79, 0x52, 0x87]).evaluate(0))
+        self.assertTrue(Script([0x52, 0x53, 0x54, 0x00, 0x79, 0x54, 0x87]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x52, 0x79]).evaluate(0))
+        self.assertFalse(Script([0x51, b'\x85', 0x79]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x4f, 0x79]).evaluate(0))
+
+    def test_roll(self):
+        # OP_2 OP_3 OP_4 then OP_2 OP_ROLL moves the OP_2 to the top, leaving 3 4
+        self.assertTrue(Script([0x52, 0x53, 0x54, 0x52, 0x7a, 0x52, 0x88, 0x54, 0x88, 0x53, 0x87]).evaluate(0))
+        self.assertTrue(Script([0x52, 0x53, 0x51, 0x7a, 0x52, 0x88, 0x53, 0x87]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x52, 0x7a]).evaluate(0))
+        self.assertFalse(Script([0x51, b'\x85', 0x7a]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x4f, 0x7a]).evaluate(0))
+
+
+class ConditionalTest(TestCase):
+    def test_if(self):
+        # OP_1 OP_IF OP_2 OP_ELSE OP_3 OP_ENDIF OP_2 OP_EQUAL
+        self.assertTrue(Script([0x51, 0x63, 0x52, 0x67, 0x53, 0x68, 0x52, 0x87]).evaluate(0))
+        self.assertFalse(Script([0x00, 0x63, 0x52, 0x67, 0x53, 0x68, 0x52, 0x87]).evaluate(0))
+        self.assertTrue(Script([0x00, 0x64, 0x52, 0x67, 0x53, 0x68, 0x52, 0x87]).evaluate(0))
+
+    def test_nested(self):
+        # the inner branches, the push and OP_RETURN of an unexecuted branch are skipped
+        cmds = [0x00, 0x63, 0x51, 0x63, 0x6a, 0x68, b'\x05', 0x67, 0x52, 0x63, 0x55, 0x67, 0x6a, 0x68, 0x68]
+        script = Script(cmds + [0x55, 0x87])
+        self.assertTrue(script.evaluate(0))
+        self.assertTrue(script.evaluate(0, ScriptTracer()))
+        # OP_ELSE can be repeated, every one flips the branch
+        self.assertTrue(Script([0x51, 0x63, 0x67, 0x6a, 0x67, 0x51, 0x68]).evaluate(0))
+
+    def test_unbalanced(self):
+        self.assertFalse(Script([0x51, 0x63, 0x51]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x68]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x67, 0x51]).evaluate(0))
+        self.assertFalse(Script([0x63, 0x51, 0x68]).evaluate(0))
+        self.assertFalse(Script([0x51, 0x63, 0x51]).evaluate(0, ScriptTracer()))
+
+    def test_condition_stack(self):
+        conditions = ConditionStack()
+        conditions.push(True)
+        conditions.push(False)
+        conditions.push(True)
+        self.assertFalse(conditions.all_true())
+        conditions.pop()
+        conditions.toggle()
+        self.assertTrue(conditions.all_true())
+        conditions.pop()
+        conditions.pop()
+        self.assertTrue(conditions.empty())
+
+
+class MultisigTest(TestCase):
+    z = 0x1234
+    keys = [PrivateKey(n) for n in (11, 12, 13)]
+    secs = [key.point.sec() for key in keys]
+    sigs = [key.sign(0x1234).der() + b'\x01' for key in keys]
+
+    def script(self, sigs, m=2, verify=False):
+        cmds = [0x00] + sigs + [0x50 + m] + self.secs + [0x53, 0xaf if verify else 0xae]
+        if verify:
+            cmds.append(0x51)
+        return Script(cmds)
+
+    def test_checkmultisig(self):
+        self.assertTrue(self.script([self.sigs[0], self.sigs[2]]).evaluate(self.z))
+        self.assertTrue(self.script([self.sigs[1], self.sigs[2]]).interpret(self.z))
+        self.assertTrue(self.script([self.sigs[0], self.sigs[1]], verify=True).interpret(self.z))
+        self.assertFalse(self.script([self.sigs[2], self.sigs[0]]).interpret(self.z))
+        self.assertFalse(self.script([self.sigs[0], self.sigs[0]]).interpret(self.z))
+        self.assertFalse(self.script([self.sigs[2], self.sigs[0]], verify=True).interpret(self.z))
+        # too few elements for the dummy
+        self.assertFalse(Script([self.sigs[0], 0x51, self.secs[0], 0x51, 0xae]).interpret(self.z))
+
+    def test_single_pass(self):
+        # the first signature matches the last key: every key is parsed and verified once
+        with mock.patch('pybtc.opcodes.S256Point.parse', wraps=S256Point.parse) as parse:
+            self.assertTrue(self.script([self.sigs[2]], m=1).interpret(self.z))
+        self.assertEqual(parse.call_count, 3)
+        # the second signature cannot match once the first used up the last key
+        with mock.patch('pybtc.opcodes.S256Point.parse', wraps=S256Point.parse) as parse:
+            self.assertFalse(self.script([self.sigs[2], self.sigs[1]]).interpret(self.z))
+        self.assertEqual(parse.call_count, 2)
+
+
+class MalformedSigTest(TestCase):
+    z = 0x1234
+    key = PrivateKey(8675309)
+    sec = key.point.sec()
+    sig = key.sign(0x1234).der() + b'\x01'
+    # no point on the curve has x = 5
+    off_curve = b'\x02' + (5).to_bytes(32, 'big')
+    out_of_range = b'\x04' + b'\xff' * 64
+
+    def assertFails(self, cmds):
+        # the check pushes false, OP_NOT turns it into a success
+        self.assertFalse(Script(cmds).evaluate(self.z))
+        self.assertTrue(Script(cmds + [0x91]).evaluate(self.z))
+        self.assertTrue(Script(cmds + [0x91]).interpret(self.z))
+
+    def test_checksig(self):
+        self.assertTrue(Script([self.sig, self.sec, 0xac]).evaluate(self.z))
+        self.assertFails([b'', self.sec, 0xac])
+        self.assertFails([self.sig[:20], self.sec, 0xac])
+        self.assertFails([self.sig, b'', 0xac])
+        self.assertFails([self.sig, self.off_curve, 0xac])
+        self.assertFails([self.sig, self.out_of_range, 0xac])
+        self.assertFails([b'', self.sec, 0x76, 0xa9, hash160(self.sec), 0x88, 0xac])
+        self.assertFalse(Script([b'', self.sec, 0xad, 0x51]).evaluate(self.z))
+
+    def test_checkmultisig(self):
+        self.assertFails([0x00, b'', 0x51, self.sec, 0x51, 0xae])
+        self.assertFails([0x00, self.sig[:20], 0x51, self.sec, 0x51, 0xae])
+        self.assertFails([0x00, self.sig, 0x51, b'', 0x51, 0xae])
+        # a malformed key is skipped, the signature still matches a later key
+        self.assertTrue(Script([0x00, self.sig, 0x51, self.off_curve, self.sec, 0x52, 0xae]).evaluate(self.z))
+        self.assertTrue(Script([0x00, self.sig, 0x51, b'', self.out_of_range, self.sec, 0x53, 0xae]).evaluate(self.z))
+
+
+class StaticTest(TestCase):
+    sec = PrivateKey(21).point.sec()
+    p2pkh = Script([0x76, 0xa9, b'\x01' * 20, 0x88, 0xac])
+
+    def test_sigop_count(self):
+        multisig = Script([0x52, self.sec, self.sec, self.sec, 0x53, 0xae])
+        self.assertEqual(self.p2pkh.sigop_count(), 1)
+        self.assertEqual(multisig.sigop_count(), 20)
+        self.assertEqual(multisig.sigop_count(accurate=True), 3)
+        self.assertEqual(Script([0xac, 0xad, 0x00, 0xaf]).sigop_count(accurate=True), 22)
+
+    def test_push_only(self):
+        self.assertTrue(Script([b'\x30', self.sec, 0x00, 0x51, 0x60]).is_push_only())
+        self.assertFalse(Script([b'\x30', 0x76]).is_push_only())
+
+    def test_unspendable(self):
+        self.assertTrue(Script([0x6a, b'hello']).is_unspendable())
+        self.assertTrue(Script([b'\x01' * 500, 0x75] * 20).is_unspendable())
+        self.assertFalse(self.p2pkh.is_unspendable())
+
+    def test_classify(self):
+        self.assertEqual(self.p2pkh.classify(), 'p2pkh')
+        self.assertEqual(Script([0xa9, b'\x01' * 20, 0x87]).classify(), 'p2sh')
+        self.assertEqual(Script([0x00, b'\x01' * 20]).classify(), 'p2wpkh')
+        self.assertEqual(Script([0x00, b'\x01' * 32]).classify(), 'p2wsh')
+        self.assertEqual(Script([self.sec, 0xac]).classify(), 'p2pk')
+        self.assertEqual(Script([0x51, self.sec, self.sec, 0x52, 0xae]).classify(), 'multisig')
+        self.assertEqual(Script([0x53, self.sec, self.sec, 0x52, 0xae]).classify(), 'nonstandard')
+        self.assertEqual(Script([0x6a, b'hello']).classify(), 'nulldata')
+        self.assertEqual(Script([0x6a, b'\x01' * 600]).classify(), 'nulldata')
+        self.assertEqual(Script([0x51]).classify(), 'nonstandard')
+        self.assertEqual(Script().classify(), 'nonstandard')
+
+    def test_static_error(self):
+        self.assertIsNone(self.p2pkh.static_error())
+        # OP_RETURN is only skipped inside a conditional
+        self.assertIsNone(Script([0x00, 0x63, 0x6a, 0x68, 0x51]).static_error())
+        self.assertIsNotNone(Script([0x51, 0x6a]).static_error())
+        self.assertIsNotNone(Script([0x51, 0xba]).static_error())
+        self.assertIsNotNone(Script([0x51, 0x68]).static_error())
+        self.assertIsNotNone(Script([0x51, 0x67]).static_error())
+        self.assertIsNotNone(Script([0x51, 0x63]).static_error())
+        self.assertIsNotNone(Script([0x61] * 202).static_error())
+        self.assertIsNotNone(Script([b'\x01' * 521]).static_error())
+        # conditionals may open in the script_sig and close in the script_pubkey
+        self.assertIsNone((Script([0x51, 0x63]) + Script([0x51, 0x68])).static_error())
+
+    def test_rejected_before_signature_checks(self):
+        script = Script([b'\x30', self.sec, 0xac, 0x6a])
+        with mock.patch('pybtc.opcodes.check_sig') as check_sig:
+            self.assertFalse(script.evaluate(0))
+        check_sig.assert_not_called()
@@ -0,0 +1,73 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInServer:
+    """
+    Local stand-in for the transaction HTTP endpoints, serving
+    /tx/<id>.hex and /tx/<id>.bin from a dict of tx_id -> raw bytes
+    delay adds latency to every response
+    """
+
+    def __init__(self, txs, delay=0):
+        self.txs = txs
+        self.delay = delay
+        self.requests = []
+        self.encoded = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                if server.delay:
+                    time.sleep(server.delay)
+                tx_id, _, extension = self.path.rsplit('/', 1)[-1].partition('.')
+                body = server.body(tx_id, extension)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if extension == 'hex':
+                    content_type = 'text/plain'
+                else:
+                    content_type = 'application/octet-stream'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # the default backlog of 5 drops concurrent connects, retried a second later
+            request_queue_size = 128
+
+        self.httpd = Server(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def body(self, tx_id, extension):
+        raw = self.txs.get(tx_id)
+        if raw is None or extension not in ('hex', 'bin'):
+            return None
+        if extension == 'bin':
+            return raw
+        # encoded once so serving does not show up in memory measurements
+        if (tx_id, extension) not in self.encoded:
+            self.encoded[(tx_id, extension)] = raw.hex().encode()
+        return self.encoded[(tx_id, extension)]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
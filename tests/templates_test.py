@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+from pybtc.ecc import PrivateKey
+from pybtc.helper import hash160
+from pybtc.script import Script
+from pybtc.templates import *
+
+
+def run_general(cmds, z):
+    try:
+        return Script(cmds).interpret(z)
+    except Exception as e:
+        return type(e)
+
+
+def run_template(cmds, z):
+    try:
+        return evaluate_template(cmds, z)
+    except Exception as e:
+        return type(e)
+
+
+class TemplateTest(TestCase):
+    z = 0x1234567890abcdef
+    key = PrivateKey(8675309)
+    other = PrivateKey(12345)
+    sig = key.sign(z).der() + b'\x01'
+    sec = key.point.sec()
+    bad_sig = other.sign(z).der() + b'\x01'
+    redeem_script = bytes.fromhex('5121') + other.point.sec() + bytes.fromhex('51ae')
+    other_sig = other.sign(z).der() + b'\x01'
+    secs = [PrivateKey(n).point.sec() for n in (1, 2)]
+
+    def cases(self):
+        sig, sec = self.sig, self.sec
+        h160 = hash160(sec)
+        redeem = self.redeem_script
+        return [
+            ('p2pk', [sig, sec, 0xac]),
+            ('p2pk', [self.bad_sig, sec, 0xac]),
+            ('p2pk', [sig[:-1], sec, 0xac]),
+            ('p2pkh', [sig, sec, 0x76, 0xa9, h160, 0x88, 0xac]),
+            ('p2pkh', [self.bad_sig, sec, 0x76, 0xa9, h160, 0x88, 0xac]),
+            ('p2pkh', [sig, sec, 0x76, 0xa9, hash160(b'other'), 0x88, 0xac]),
+            ('p2pkh', [sig, self.other.point.sec(), 0x76, 0xa9, h160, 0x88, 0xac]),
+            ('p2sh', [sig, redeem, 0xa9, hash160(redeem), 0x87]),
+            ('p2sh', [redeem, 0xa9, hash160(redeem), 0x87]),
+            ('p2sh', [sig, redeem, 0xa9, h160, 0x87]),
+            ('p2wpkh', [0x00, h160]),
+            ('multisig', [0x00, sig, self.other_sig, 0x52, self.secs[0], sec, self.other.point.sec(), 0x53, 0xae]),
+            ('multisig', [0x00, self.other_sig, sig, 0x52, sec, self.other.point.sec(), 0x52, 0xae]),
+            ('multisig', [0x00, sig, 0x51, self.secs[0], self.secs[1], 0x52, 0xae]),
+            ('multisig', [0x00, sig, 0x51, sec, 0x51, 0xae]),
+            (None, [0x00, sig, 0x53, sec, 0x52, 0xae]),
+            (None, [0x00, 0x00, sec, 0x51, 0xae]),
+            (None, [0xa9, hash160(b''), 0x87]),
+            (None, [0x00, redeem, 0xa9, hash160(redeem), 0x87]),
+            (None, [sig, sec, 0x76, 0xa9, h160, 0x87, 0xac]),
+            (None, [sec, 0xac]),
+            (None, [0x00, sec]),
+            (None, [0x52, 0x76, 0x93, 0x54, 0x87]),
+            (None, []),
+        ]
+
+    def test_match(self):
+        for name, cmds in self.cases():
+            self.assertEqual(match_template(cmds), name, cmds)
+
+    def test_same_result(self):
+        for name, cmds in self.cases():
+            if name is None:
+                self.assertIsNone(evaluate_template(cmds, self.z))
+            else:
+                self.assertEqual(run_template(cmds, self.z), run_general(cmds, self.z), cmds)
+
+    def test_evaluate(self):
+        h160 = hash160(self.sec)
+        script_pubkey = Script([0x76, 0xa9, h160, 0x88, 0xac])
+        self.assertTrue((Script([self.sig, self.sec]) + script_pubkey).evaluate(self.z))
+        self.assertFalse((Script([self.bad_sig, self.sec]) + script_pubkey).evaluate(self.z))
@@ -0,0 +1,90 @@
+from unittest import TestCase, mock
+
+from pybtc.ecc import PrivateKey
+from pybtc.helper import hash160
+from pybtc.script import Script
+from pybtc.tracer import *
+
+
+class RecordingTracer(ScriptTracer):
+    def __init__(self):
+        self.events = []
+
+    def start(self, script, z):
+        self.events.append('start')
+
+    def step(self, pc, cmd, stack, alt_stack):
+        self.events.append((pc, cmd, len(stack)))
+
+    def finish(self, script, result):
+        self.events.append(result)
+
+
+class TracerTest(TestCase):
+    def test_steps(self):
+        tracer = RecordingTracer()
+        self.assertTrue(Script([0x52, 0x76, 0x93, 0x54, 0x87]).evaluate(0, tracer))
+        self.assertEqual(tracer.events, ['start', (0, 0x52, 0), (1, 0x76, 1), (2, 0x93, 2),
+                                         (3, 0x54, 1), (4, 0x87, 2), True])
+
+    def test_failure(self):
+        tracer = RecordingTracer()
+        self.assertFalse(Script([0x51, 0xba]).evaluate(0, tracer))
+        self.assertEqual(tracer.events[-1], False)
+        tracer = RecordingTracer()
+        self.assertFalse(Script([b'\x30\x00', b'\x02' + b'\x00' * 32, 0xac]).evaluate(0, tracer))
+        self.assertEqual(tracer.events[-1], False)
+
+    def test_install(self):
+        tracer = RecordingTracer()
+        with mock.patch.object(Script, 'tracer', tracer):
+            Script([0x51]).evaluate(0)
+        Script([0x51]).evaluate(0)
+        self.assertEqual(tracer.events, ['start', (0, 0x51, 0), True])
+
+    def test_same_result(self):
+        z = 0x1234
+        key = PrivateKey(8675309)
+        sig = key.sign(z).der() + b'\x01'
+        sec = key.point.sec()
+        scripts = [
+            [sig, sec, 0xac],
+            [sig, sec, 0x76, 0xa9, hash160(sec), 0x88, 0xac],
+            [0x00, sig, 0x51, sec, 0x51, 0xae],
+            [sig[:10], sec, 0xac],
+            [sig, b'', 0xac, 0x91],
+            [0x52, 0x76, 0x93, 0x54, 0x87],
+            [0x51, 0x63, 0x52, 0x67, 0x53, 0x68, 0x52, 0x87],
+            [0x00, 0x63, 0xba, 0x68, 0x51],
+            [0x51, 0x63, 0x51],
+            [0x51, 0xba],
+            [0x51] + [0x61] * 202,
+            [0x51] * 1001,
+            [b'\x01' * 521],
+            [0x00],
+            [],
+        ]
+        for cmds in scripts:
+            self.assertEqual(Script(cmds).evaluate(z), Script(cmds).evaluate(z, ScriptTracer()), cmds)
+
+
+class ScriptProfilerTest(TestCase):
+    def test_profile(self):
+        z = 0x1234
+        key = PrivateKey(8675309)
+        sig = key.sign(z).der() + b'\x01'
+        sec = key.point.sec()
+        profiler = ScriptProfiler(slowest=2)
+        self.assertTrue(Script([sig, sec, 0xac]).evaluate(z, profiler))
+        self.assertTrue(Script([0x51, 0x76, 0x76, 0x75, 0x75]).evaluate(z, profiler))
+        self.assertFalse(Script([0x00]).evaluate(z, profiler))
+        self.assertEqual(profiler.scripts, 3)
+        self.assertEqual(profiler.failures, 1)
+        self.assertEqual(profiler.sig_checks, 1)
+        self.assertEqual(profiler.max_depth, 3)
+        self.assertEqual(profiler.counts[PUSH], 2)
+        self.assertEqual(profiler.counts[0x76], 2)
+        slowest = profiler.slowest_scripts()
+        self.assertEqual(len(slowest), 2)
+        self.assertEqual(slowest[0][1].cmds, [sig, sec, 0xac])
+        self.assertIn('OP_CHECKSIG', profiler.report())
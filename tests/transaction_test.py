@@ -1,7 +1,14 @@
-from unittest import TestCase
+import asyncio
+import threading
+import time
+from unittest import TestCase, mock
 
+from pybtc.backends import HttpBackend, MemoryBackend, TxBackend
+from pybtc.ecc import PrivateKey
 from pybtc.transaction import *
 from pybtc.script import *
+from pybtc.verify import check_job, first_invalid_input, first_invalid_job, verify_transactions
+from tests.stand_in import StandInServer
 
 
 class TransactionTest(TestCase):
@@ -88,3 +95,246 @@ class TransactionTest(TestCase):
         stream = BytesIO(raw_transaction)
         transaction = Tx.parse(stream)
         self.assertEqual(transaction.id(), '452c629d67e41baec3ac6f04fe744b4b9617f8f859c63b3002f8684e7a4fee03')
+
+    def test_parse_segwit(self):
+        raw_legacy = bytes.fromhex(
+            '0100000001813f79011acb80925dfe69b3def355fe914bd1d96a3f5f71bf8303c6a989c7d1000000006b483045022100ed81ff192e75a3fd2304004dcadb746fa5e24c5031ccfcf21320b0277457c98f02207a986d955c6e0cb35d446a89d3f56100f4d7f67801c31967743a9c8e10615bed01210349fc4e631e3624a545de3f89f5d8684c7b8138bd94bdd531d2e213bf016b278afeffffff02a135ef01000000001976a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac99c39800000000001976a9141c4bc762dd5423e332166702cb75f40df79fea1288ac19430600')
+        witness = b'\x02' + b'\x03abc' + b'\x01\xff'
+        raw_segwit = raw_legacy[:4] + b'\x00\x01' + raw_legacy[4:-4] + witness + raw_legacy[-4:]
+        transaction = Tx.parse(BytesIO(raw_segwit))
+        self.assertTrue(transaction.segwit)
+        self.assertEqual(transaction.tx_ins[0].witness, [b'abc', b'\xff'])
+        self.assertEqual(transaction.lock_time, little_endian_to_int(raw_legacy[-4:]))
+        self.assertEqual(transaction.serialize(), raw_legacy)
+        self.assertEqual(transaction.id(), '452c629d67e41baec3ac6f04fe744b4b9617f8f859c63b3002f8684e7a4fee03')
+
+
+class TxCacheTest(TestCase):
+    def setUp(self):
+        raw_transaction = bytes.fromhex(
+            '0100000001813f79011acb80925dfe69b3def355fe914bd1d96a3f5f71bf8303c6a989c7d1000000006b483045022100ed81ff192e75a3fd2304004dcadb746fa5e24c5031ccfcf21320b0277457c98f02207a986d955c6e0cb35d446a89d3f56100f4d7f67801c31967743a9c8e10615bed01210349fc4e631e3624a545de3f89f5d8684c7b8138bd94bdd531d2e213bf016b278afeffffff02a135ef01000000001976a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac99c39800000000001976a9141c4bc762dd5423e332166702cb75f40df79fea1288ac19430600')
+        self.raw = raw_transaction
+        self.tx = Tx.parse(BytesIO(raw_transaction))
+
+    def test_parsed(self):
+        cache = TxCache()
+        cache.add(self.tx.id(), self.tx, self.raw)
+        self.assertIs(cache.get(self.tx.id()), self.tx)
+        self.assertGreater(cache.resident_bytes, len(self.raw))
+
+    def test_store_raw(self):
+        cache = TxCache(store_raw=True)
+        cache.add(self.tx.id(), self.tx, self.raw)
+        cached = cache.get(self.tx.id())
+        self.assertIsNot(cached, self.tx)
+        self.assertEqual(cached.serialize(), self.raw)
+        self.assertLess(cache.resident_bytes, len(self.raw) * 2)
+
+        cache[self.tx.id()] = self.tx
+        self.assertEqual(cache.get(self.tx.id()).id(), self.tx.id())
+
+    def test_budget(self):
+        cache = TxCache(max_bytes=len(self.raw) * 3, store_raw=True)
+        for i in range(5):
+            cache.add(str(i), self.tx, self.raw)
+        self.assertLessEqual(cache.resident_bytes, cache.max_bytes)
+        self.assertEqual(cache.stats()['evictions'], 3)
+        self.assertIsNone(cache.get('0'))
+        self.assertIsNotNone(cache.get('4'))
+
+    def test_fetch_fresh(self):
+        downloads = []
+        raw = self.raw
+
+        class CountingFetcher(TxFetcher):
+            cache = TxCache(store_raw=True)
+
+            @classmethod
+            def fetch_raw(cls, tx_id, testnet=False, timeout=None):
+                downloads.append(tx_id)
+                return raw
+
+        CountingFetcher.fetch(self.tx.id())
+        CountingFetcher.fetch(self.tx.id())
+        self.assertEqual(len(downloads), 1)
+        CountingFetcher.fetch(self.tx.id(), fresh=True)
+        self.assertEqual(len(downloads), 2)
+        self.assertEqual(CountingFetcher.cache.stats()['hits'], 1)
+
+
+class FetcherTestCase(TestCase):
+    def setUp(self):
+        self.prev_txs = []
+        for i in range(5):
+            tx_outs = [TxOut(1000 * (i + 1), Script([0x51])), TxOut(1, Script([0x51]))]
+            self.prev_txs.append(Tx(1, [TxIn(bytes([i]) * 32, 0)], tx_outs, 0))
+        tx_ins = [TxIn(prev_tx.hash(), 0) for prev_tx in self.prev_txs]
+        tx_ins.append(TxIn(self.prev_txs[0].hash(), 1))
+        self.tx = Tx(1, tx_ins, [TxOut(10000, Script([0x51]))], 0)
+        self.raw_txs = {prev_tx.id(): prev_tx.serialize() for prev_tx in self.prev_txs}
+
+    def patch_fetcher(self, url):
+        return mock.patch.multiple(TxFetcher, backend=HttpBackend(url, url), cache=TxCache())
+
+
+class AsyncFetchTest(FetcherTestCase):
+    def test_fetch_many(self):
+        with StandInServer(self.raw_txs) as server, self.patch_fetcher(server.url):
+            tx_ids = list(self.raw_txs) + list(self.raw_txs)
+            txs = asyncio.run(TxFetcher.fetch_many(tx_ids, concurrency=3))
+            self.assertEqual(sorted(txs), sorted(self.raw_txs))
+            for tx_id, tx in txs.items():
+                self.assertEqual(tx.id(), tx_id)
+            self.assertEqual(len(server.requests), 5)
+
+            asyncio.run(TxFetcher.fetch_many(tx_ids))
+            self.assertEqual(len(server.requests), 5)
+
+    def test_fee_async(self):
+        with StandInServer(self.raw_txs) as server, self.patch_fetcher(server.url):
+            self.assertEqual(asyncio.run(self.tx.fee_async()), 15001 - 10000)
+            self.assertEqual(len(server.requests), 5)
+
+    def test_timeout(self):
+        with StandInServer(self.raw_txs, delay=0.5) as server, self.patch_fetcher(server.url):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(self.tx.prefetch_inputs(timeout=0.05))
+
+    def test_timeout_abandons_download(self):
+        with StandInServer(self.raw_txs, delay=3) as server, self.patch_fetcher(server.url):
+            start = time.perf_counter()
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(self.tx.fee_async(timeout=0.3))
+            self.assertLess(time.perf_counter() - start, 1.5)
+            # the downloads stopped too, a retry does not join them
+            deadline = time.perf_counter() + 1.5
+            while TxFetcher.in_flight and time.perf_counter() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(TxFetcher.in_flight, {})
+
+    def test_concurrency(self):
+        txs = {}
+        for i in range(20):
+            tx = Tx(1, [TxIn(bytes([i]) * 32, 0)], [TxOut(i, Script([0x51]))], 0)
+            txs[tx.id()] = tx.serialize()
+        with StandInServer(txs, delay=0.5) as server, self.patch_fetcher(server.url):
+            start = time.perf_counter()
+            fetched = asyncio.run(TxFetcher.fetch_many(list(txs), concurrency=20))
+            # all 20 downloads at once, not in rounds of the default executor's size
+            self.assertLess(time.perf_counter() - start, 0.9)
+            self.assertEqual(sorted(fetched), sorted(txs))
+
+
+class ThreadedFetchTest(FetcherTestCase):
+    def test_single_flight(self):
+        tx_id = self.prev_txs[0].id()
+        results = []
+
+        def fetch():
+            results.append(TxFetcher.fetch(tx_id))
+
+        with StandInServer(self.raw_txs, delay=0.2) as server, self.patch_fetcher(server.url):
+            threads = [threading.Thread(target=fetch) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual([tx.id() for tx in results], [tx_id] * 8)
+
+    def test_failure_is_shared(self):
+        calls = []
+        errors = []
+
+        class SlowMissingBackend(TxBackend):
+            def get_raw(self, tx_id, testnet=False, timeout=None):
+                calls.append(tx_id)
+                time.sleep(0.2)
+                return None
+
+        def fetch():
+            try:
+                TxFetcher.fetch(self.prev_txs[0].id())
+            except ValueError as e:
+                errors.append(e)
+
+        with mock.patch.multiple(TxFetcher, backend=SlowMissingBackend(), cache=TxCache()):
+            threads = [threading.Thread(target=fetch) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 8)
+        # every caller got the leader's error
+        self.assertEqual(len({id(e) for e in errors}), 1)
+        self.assertEqual(TxFetcher.in_flight, {})
+
+
+class ConfigureTest(TestCase):
+    def test_configure(self):
+        tx = Tx(1, [TxIn(b'\x01' * 32, 0)], [TxOut(1, Script([0x51]))], 0)
+        fetcher = TxFetcher.configure(backend=MemoryBackend({tx.id(): tx.serialize()}))
+        self.assertEqual(fetcher.fetch(tx.id()).id(), tx.id())
+        self.assertIn(tx.id(), fetcher.cache)
+        self.assertNotIn(tx.id(), TxFetcher.cache)
+        self.assertIsNot(fetcher.backend, TxFetcher.backend)
+        with self.assertRaises(ValueError):
+            fetcher.fetch('00' * 32)
+
+
+class VerifyTest(TestCase):
+    @staticmethod
+    def build_tx(secrets):
+        """Spends one output per secret of a cached previous transaction"""
+        keys = [PrivateKey(secret) for secret in secrets]
+        prev_outs = []
+        for key in keys:
+            script_pubkey = Script([0x76, 0xa9, key.point.hash160(), 0x88, 0xac])
+            prev_outs.append(TxOut(10000, script_pubkey))
+        prev_tx = Tx(1, [TxIn(b'\x00' * 32, 0xffffffff)], prev_outs, 0)
+        TxFetcher.cache[prev_tx.id()] = prev_tx
+
+        tx_ins = [TxIn(prev_tx.hash(), i) for i in range(len(keys))]
+        tx_outs = [TxOut(9000 * len(keys), Script([0x6a]))]
+        tx = Tx(1, tx_ins, tx_outs, 0)
+        for i, key in enumerate(keys):
+            sig = key.sign(tx.sig_hash(i)).der() + SIGHASH_ALL.to_bytes(1, 'big')
+            tx.tx_ins[i].script_sig = Script([sig, key.point.sec()])
+        return tx
+
+    def test_verify_input(self):
+        tx = self.build_tx([101, 102])
+        self.assertTrue(tx.verify_input(0))
+        self.assertTrue(tx.verify_input(1))
+
+    def test_verify(self):
+        tx = self.build_tx([201, 202, 203, 204])
+        self.assertTrue(tx.verify())
+        self.assertTrue(tx.verify(parallel=2))
+
+        tx.tx_ins[1].script_sig, tx.tx_ins[3].script_sig = tx.tx_ins[3].script_sig, tx.tx_ins[1].script_sig
+        self.assertFalse(tx.verify())
+        self.assertFalse(tx.verify(parallel=2))
+        self.assertEqual(first_invalid_input([tx]), (0, 1))
+        self.assertEqual(first_invalid_input([tx], parallel=2), (0, 1))
+
+    def test_verify_transactions(self):
+        tx1 = self.build_tx([301, 302])
+        tx2 = self.build_tx([303, 304, 305])
+        self.assertTrue(verify_transactions([tx1, tx2], parallel=2))
+
+        tx2.tx_ins[2].script_sig = Script([b'\x00', tx2.tx_ins[2].script_sig.cmds[1]])
+        self.assertFalse(verify_transactions([tx1, tx2], parallel=2))
+        self.assertEqual(first_invalid_input([tx1, tx2], parallel=2), (1, 2))
+
+    def test_static_rejection(self):
+        tx = self.build_tx([401, 402, 403])
+        jobs = [tx.verification_job(i) for i in range(3)]
+        script_sig, script_pubkey, z = jobs[1]
+        # the signature is valid but the script ends with OP_RETURN
+        jobs[1] = (script_sig, bytes([script_pubkey[0] + 1]) + script_pubkey[1:] + b'\x6a', z)
+        with mock.patch('pybtc.verify.check_job', wraps=check_job) as checked:
+            self.assertEqual(first_invalid_job(jobs), 1)
+        # only the job before the rejected one ran
+        self.assertEqual(checked.call_count, 1)
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from pybtc.transaction import TxCache, TxFetcher
+from pybtc.txstore import *
+
+RAW_TX = bytes.fromhex(
+    '0100000001813f79011acb80925dfe69b3def355fe914bd1d96a3f5f71bf8303c6a989c7d1000000006b483045022100ed81ff192e75a3fd2304004dcadb746fa5e24c5031ccfcf21320b0277457c98f02207a986d955c6e0cb35d446a89d3f56100f4d7f67801c31967743a9c8e10615bed01210349fc4e631e3624a545de3f89f5d8684c7b8138bd94bdd531d2e213bf016b278afeffffff02a135ef01000000001976a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac99c39800000000001976a9141c4bc762dd5423e332166702cb75f40df79fea1288ac19430600')
+TX_ID = '452c629d67e41baec3ac6f04fe744b4b9617f8f859c63b3002f8684e7a4fee03'
+
+
+class TxStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'txs.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_put_get(self):
+        store = TxStore(self.path)
+        self.assertIsNone(store.get(TX_ID))
+        store.put(TX_ID, RAW_TX)
+        self.assertEqual(store.get(TX_ID), RAW_TX)
+        self.assertIn(TX_ID, store)
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def test_readonly(self):
+        TxStore(self.path).put(TX_ID, RAW_TX)
+        reader = TxStore(self.path, readonly=True)
+        self.assertEqual(reader.get(TX_ID), RAW_TX)
+        with self.assertRaises(PermissionError):
+            reader.put(TX_ID, RAW_TX)
+        reader.close()
+
+    def test_fetch_from_store(self):
+        TxStore(self.path).put(TX_ID, RAW_TX)
+
+        class StoreFetcher(TxFetcher):
+            cache = TxCache()
+            store = TxStore(self.path, readonly=True)
+
+            @classmethod
+            def fetch_raw(cls, tx_id, testnet=False, timeout=None):
+                raise AssertionError('network should not be used')
+
+        tx = StoreFetcher.fetch(TX_ID)
+        self.assertEqual(tx.id(), TX_ID)
+
+    def test_fetch_writes_through(self):
+        downloads = []
+
+        class DownloadFetcher(TxFetcher):
+            cache = TxCache()
+            store = TxStore(self.path)
+
+            @classmethod
+            def fetch_raw(cls, tx_id, testnet=False, timeout=None):
+                downloads.append(tx_id)
+                return RAW_TX
+
+        DownloadFetcher.fetch(TX_ID)
+        self.assertEqual(DownloadFetcher.store.get(TX_ID), RAW_TX)
+
+        DownloadFetcher.cache = TxCache()
+        self.assertEqual(DownloadFetcher.fetch(TX_ID).id(), TX_ID)
+        self.assertEqual(downloads, [TX_ID])
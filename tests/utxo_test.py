@@ -0,0 +1,74 @@
+from unittest import TestCase
+from io import BytesIO
+
+from pybtc.block import Block, BlockHeader
+from pybtc.ecc import PrivateKey
+from pybtc.constants import SIGHASH_ALL
+from pybtc.script import Script
+from pybtc.transaction import Tx, TxIn, TxOut
+from pybtc.utxo import *
+from tests.block_test import GENESIS_BLOCK
+
+
+def p2pkh_script(key):
+    return Script([0x76, 0xa9, key.point.hash160(), 0x88, 0xac])
+
+
+def coinbase(key, amount):
+    return Tx(1, [TxIn(b'\x00' * 32, 0xffffffff, Script([b'\x01\x02']))], [TxOut(amount, p2pkh_script(key))], 0)
+
+
+def block_of(txs):
+    return Block(BlockHeader(1, b'\x00' * 32, b'\x00' * 32, 0, b'\x00' * 4, b'\x00' * 4), txs)
+
+
+class UtxoSetTest(TestCase):
+    def setUp(self):
+        self.key = PrivateKey(8675309)
+        self.coinbase = coinbase(self.key, 50000)
+        self.spend = Tx(1, [TxIn(self.coinbase.hash(), 0)],
+                        [TxOut(30000, p2pkh_script(self.key)), TxOut(0, Script([0x6a, b'memo']))], 0)
+        self.chained = Tx(1, [TxIn(self.spend.hash(), 0)], [TxOut(25000, p2pkh_script(self.key))], 0)
+
+    def test_from_blocks(self):
+        genesis = Block.parse(BytesIO(GENESIS_BLOCK))
+        utxos = UtxoSet.from_blocks([genesis])
+        self.assertEqual(len(utxos), 1)
+        self.assertEqual(utxos.amount(genesis.txs[0].hash(), 0), 5000000000)
+        script_pubkey = utxos.script_pubkey(genesis.txs[0].hash(), 0)
+        self.assertEqual(script_pubkey.cmds, genesis.txs[0].tx_outs[0].script_pubkey.cmds)
+
+    def test_apply_undo_block(self):
+        utxos = UtxoSet()
+        utxos.apply_block(block_of([self.coinbase]))
+        self.assertIn((self.coinbase.hash(), 0), utxos)
+
+        block = block_of([coinbase(self.key, 1), self.spend, self.chained])
+        undo = utxos.apply_block(block)
+        self.assertNotIn((self.coinbase.hash(), 0), utxos)
+        self.assertNotIn((self.spend.hash(), 0), utxos)
+        self.assertNotIn((self.spend.hash(), 1), utxos)
+        self.assertEqual(utxos.amount(self.chained.hash(), 0), 25000)
+        self.assertEqual(len(utxos), 2)
+
+        utxos.undo_block(block, undo)
+        self.assertEqual(len(utxos), 1)
+        self.assertEqual(utxos.amount(self.coinbase.hash(), 0), 50000)
+
+    def test_double_spend(self):
+        utxos = UtxoSet()
+        utxos.apply_tx(self.coinbase)
+        with self.assertRaises(KeyError):
+            utxos.apply_block(block_of([self.spend, self.spend]))
+        self.assertEqual(len(utxos), 1)
+        self.assertIn((self.coinbase.hash(), 0), utxos)
+
+    def test_fee_and_verify(self):
+        utxos = UtxoSet()
+        utxos.apply_tx(self.coinbase)
+        self.assertEqual(self.spend.fee(utxos=utxos), 20000)
+
+        z = self.spend.sig_hash(0, utxos)
+        sig = self.key.sign(z).der() + SIGHASH_ALL.to_bytes(1, 'big')
+        self.spend.tx_ins[0].script_sig = Script([sig, self.key.point.sec()])
+        self.assertTrue(self.spend.verify(utxos=utxos))